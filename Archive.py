@@ -0,0 +1,177 @@
+import gzip
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+import RateLimit
+import Sheets
+import Shards
+from Assignment import course_of
+
+# Rows of finished terms leave the live tabs for gzipped JSON Lines files here, one per term,
+# so reads, conditional formats and filter views only cover the current term
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", ".canvas_sync_archive")
+
+# Days after a term's end before its rows are archived (late grades, regrade requests)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "14"))
+
+# Blank rows left below the data when a tab is compacted after archiving
+GRID_SLACK = 100
+
+# {course_id: term} of every course seen, kept in ARCHIVE_DIR. Canvas stops listing a course once
+# the enrollment concludes (and the GraphQL backend skips ended terms), so its rows are filed from here
+TERMS_FILE = "terms.json"
+
+
+def _parse(timestamp: str) -> datetime:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+
+# A course's end: its term's end_at, else the course's own (None when neither is set)
+def course_end(course: dict) -> str | None:
+    return (course.get("term") or {}).get("end_at") or course.get("end_at")
+
+
+def term_name(course: dict) -> str:
+    return (course.get("term") or {}).get("name") or course["name"]
+
+
+def known_terms(directory: str = ARCHIVE_DIR) -> dict[int, str]:
+    path = os.path.join(directory, TERMS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return {int(course_id): term for course_id, term in json.load(f).items()}
+
+
+# Adds the listed courses' terms to TERMS_FILE
+def remember(course_info: list[dict], directory: str = ARCHIVE_DIR):
+    terms = known_terms(directory)
+    terms.update({course["id"]: term_name(course) for course in course_info})
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, TERMS_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({str(course_id): term for course_id, term in terms.items()}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+# {course_id: term name} of courses whose rows leave the live tabs: those whose term ended more
+# than after_days ago and, given the sheet's rows, Canvas courses on the sheet that course_info
+# no longer lists (named from known_terms, else Shards.NO_TERM_TITLE)
+def finished_courses(course_info: list[dict], sheet_assignments=(), now: datetime = None,
+                     after_days: int = ARCHIVE_AFTER_DAYS, directory: str = ARCHIVE_DIR) -> dict[int, str]:
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=after_days)
+    finished = {}
+    for course in course_info:
+        end = course_end(course)
+        if end and _parse(end) < cutoff:
+            finished[course["id"]] = term_name(course)
+
+    listed = {course["id"] for course in course_info}
+    dropped = {course_of(row["sync_id"]) for row in sheet_assignments
+               if row.get("source") == "canvas" and row.get("sync_id")} - listed - {None}
+    if dropped:
+        terms = known_terms(directory)
+        finished.update({course_id: terms.get(course_id, Shards.NO_TERM_TITLE) for course_id in dropped})
+    return finished
+
+
+# Assignments of courses still in progress
+def live(assignments, finished: dict[int, str]) -> list:
+    return [assignment for assignment in assignments if course_of(assignment.sync_id) not in finished]
+
+
+def archive_path(term: str, directory: str = ARCHIVE_DIR) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", term).strip("-").lower() or "no-term"
+    return os.path.join(directory, f"{slug}.jsonl.gz")
+
+
+# Archived rows of a term, one dict per assignment
+def load(term: str, directory: str = ARCHIVE_DIR) -> list[dict]:
+    path = archive_path(term, directory)
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Merges rows into their terms' archives. Each file is rewritten whole through a temp file,
+# keyed by sync_id, so a run that dies before its sheet deletes land can simply archive again
+def save(rows: list[dict], finished: dict[int, str], directory: str = ARCHIVE_DIR) -> dict[str, int]:
+    by_term = {}
+    for row in rows:
+        by_term.setdefault(finished[course_of(row["sync_id"])], []).append(row)
+
+    os.makedirs(directory, exist_ok=True)
+    archived_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for term, term_rows in by_term.items():
+        merged = {row["sync_id"]: row for row in load(term, directory)}
+        for row in term_rows:
+            merged[row["sync_id"]] = dict({k: v for k, v in row.items() if k != "row"},
+                                          term=term, archived_at=archived_at)
+
+        path = archive_path(term, directory)
+        tmp = f"{path}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for row in merged.values():
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+
+    return {term: len(term_rows) for term, term_rows in by_term.items()}
+
+
+# The delete ops a diff made for rows of finished courses (Canvas assignments of ended
+# courses are dropped with live() before diffing, so their rows come out as deletes)
+def archived_ops(ops: list[dict], finished: dict[int, str]) -> list[dict]:
+    return [op for op in ops if op["op"] == "delete" and course_of(op["sync_id"]) in finished]
+
+
+# Delete ops for the sheet rows of finished courses, for paths that archive ahead of the diff
+def finished_ops(sheet_assignments: list[dict], finished: dict[int, str]) -> list[dict]:
+    return [{"op": "delete", "sync_id": row["sync_id"], "row": row["row"]} for row in sheet_assignments
+            if row.get("source") == "canvas" and course_of(row.get("sync_id") or '') in finished]
+
+
+# Saves the rows behind archived_ops before the write stage deletes them. Rows are read from
+# the sheet in full, since the store may only hold the diff columns. Returns log lines
+def archive(ops: list[dict], finished: dict[int, str], sheet_service=None, spreadsheet_id=Sheets.SPREADSHEET_ID,
+            sheet_title: str = "Assignments", dry_run: bool = False, directory: str = ARCHIVE_DIR) -> list[str]:
+    targets = archived_ops(ops, finished)
+    if not targets:
+        return []
+
+    if dry_run:
+        terms = sorted({finished[course_of(op["sync_id"])] for op in targets})
+        return [f"{sheet_title}: archive {len(targets)} rows ({', '.join(terms)})"]
+
+    rows = Sheets.read_rows([op["row"] for op in targets], sheet_service, spreadsheet_id, sheet_title)
+    expected = {op["row"]: op["sync_id"] for op in targets}
+    mismatched = [row for row, sync_id in expected.items() if rows.get(row, {}).get("sync_id") != sync_id]
+    if mismatched:
+        raise RuntimeError(f"'{sheet_title}' rows {mismatched[:5]} moved since the diff was planned; not archiving")
+
+    counts = save(list(rows.values()), finished, directory)
+    return [f"archive: {count} rows to {archive_path(term, directory)}" for term, count in sorted(counts.items())]
+
+
+# Drops the blank rows more than GRID_SLACK below the data in one deleteDimension.
+# Returns the number of rows removed
+def compact(sheet_service=None, spreadsheet_id=Sheets.SPREADSHEET_ID, sheet_title: str = "Assignments",
+            slack: int = GRID_SLACK) -> int:
+    sheet_service = sheet_service or Sheets.get_sheet_service()
+
+    _, next_row = Sheets.read_sync_index(sheet_service, spreadsheet_id, sheet_title)
+    metadata = Sheets.get_metadata(sheet_service, spreadsheet_id, refresh=True)
+    sheet_id = metadata.sheet_id(sheet_title)
+    keep = next_row - 1 + slack
+    extra = metadata.row_count(sheet_id) - keep
+    if extra <= 0:
+        return 0
+
+    RateLimit.execute(sheet_service.spreadsheets().batchUpdate(
+        spreadsheetId=spreadsheet_id,
+        body={"requests": [{"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS",
+                                                          "startIndex": keep, "endIndex": keep + extra}}}]},
+    ))
+    Sheets.invalidate_metadata(spreadsheet_id)
+    return extra
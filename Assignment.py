@@ -0,0 +1,79 @@
+import hashlib
+from typing import NamedTuple
+
+# Fields that make up content_hash: what the user sees from Canvas (updated_at alone changing is not a visible change)
+HASHED_FIELDS = ("course_name", "assignment_name", "due_date_utc", "submitted", "link")
+
+_SEPARATOR = "\x1f"
+
+
+# One sheet row. Field order is the sheet's column order (Sheets.COLUMNS), so an Assignment
+# is its own row: tuple(assignment) goes straight into a values request and Assignment.from_row
+# wraps a row read back from the sheet. Tuples are immutable and carry no per-instance __dict__
+class Assignment(NamedTuple):
+    # Visible
+    course_name: str = ''
+    assignment_name: str = ''
+    due_date: str = ''
+    days_left: str = ''
+    priority: str = ''
+    status: str = ''
+    submitted: str = ''
+    notes: str = ''
+    link: str = ''
+    # Hidden
+    sync_id: str = ''
+    source: str = ''
+    due_date_utc: str = ''
+    content_hash: str = ''
+    created_at: str = ''
+    updated_at: str = ''
+    last_synced: str = ''
+    urgency: str = ''  # due-date bucket, see Derived
+
+    # Pads short rows (the Sheets API drops trailing blanks)
+    @classmethod
+    def from_row(cls, row: list) -> "Assignment":
+        if len(row) >= len(cls._fields):
+            return cls._make(row[:len(cls._fields)])
+        return cls._make(list(row) + [''] * (len(cls._fields) - len(row)))
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "Assignment":
+        return cls(**{field: values[field] for field in cls._fields if field in values})
+
+    def get(self, field: str, default=''):
+        return getattr(self, field, default)
+
+    # Same record with content_hash filled in
+    def hashed(self) -> "Assignment":
+        return self._replace(content_hash=content_hash(self))
+
+
+# Stable 128-bit hash of the user-visible Canvas fields
+def content_hash(assignment) -> str:
+    payload = _SEPARATOR.join(str(assignment.get(field) or '') for field in HASHED_FIELDS)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+# Row values for the given columns, from an Assignment or a {column: value} dict
+def as_row(values, columns) -> tuple | list:
+    if isinstance(values, Assignment) and tuple(columns) == Assignment._fields:
+        return values
+    return [values.get(col, '') for col in columns]
+
+
+# Course id from a sync_id ("canvas:<course_id>:<assignment_id>"), None for rows not from Canvas
+def course_of(sync_id: str) -> int | None:
+    parts = sync_id.split(":")
+    return int(parts[1]) if len(parts) == 3 and parts[0] == "canvas" and parts[1].isdigit() else None
+
+
+# Column index → A1 letter (0 → A, 26 → AA)
+def column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import RateLimit
+
+# Benchmarks measure the sync code, not the throttle; RateLimit reads these when limiters are created
+RateLimit.CANVAS_RATE = RateLimit.SHEETS_RATE = 1e9
+RateLimit.CANVAS_BURST = RateLimit.SHEETS_BURST = 10 ** 9
+
+import Fakes
+import Load_Info
+import Sheets
+import Store
+import Workflow
+from Metrics import METRICS
+
+SIZES = [10, 1_000, 100_000]
+
+
+# One sync against the stand-ins: wall time, API calls, bytes and peak traced memory
+def measure(name: str, run, canvas: Fakes.FakeCanvas, sheets: Fakes.FakeSheets, n_assignments: int) -> dict:
+    canvas_calls, sheets_calls = dict(canvas.calls), dict(sheets.calls)
+    canvas_bytes, sheets_bytes = canvas.bytes, sheets.bytes
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def delta(after, before):
+        return {k: v - before.get(k, 0) for k, v in after.items() if v - before.get(k, 0)}
+
+    return {
+        "phase": name,
+        "assignments": n_assignments,
+        "seconds": round(seconds, 3),
+        "assignments_per_second": round(n_assignments / seconds, 1) if seconds else None,
+        "canvas_calls": delta(canvas.calls, canvas_calls),
+        "sheets_calls": delta(sheets.calls, sheets_calls),
+        "canvas_bytes": canvas.bytes - canvas_bytes,
+        "sheets_bytes": sheets.bytes - sheets_bytes,
+        "peak_mb": round(peak / 2 ** 20, 2),
+    }
+
+
+# Cold sync into an empty sheet, a warm sync with nothing changed, then one with ~1% changed
+def bench_tenant(n_assignments: int, n_courses: int = 10, canvas_latency: float = 0.0,
+                 sheets_latency: float = 0.0, stream: bool = False, backend: str = "rest") -> list[dict]:
+
+    canvas = Fakes.FakeCanvas(n_assignments, n_courses, latency=canvas_latency)
+    sheets = Fakes.FakeSheets(latency=sheets_latency, spreadsheet_id=f"bench-{n_assignments}-{stream}")
+    sheets._batch_update([{"updateSheetProperties": {
+        "properties": {"sheetId": 1, "title": "Assignments", "gridProperties": {"columnCount": len(Sheets.COLUMNS)}},
+        "fields": "title,gridProperties.columnCount"}}])
+    Sheets.invalidate_metadata(sheets.spreadsheet_id)
+
+    session = Fakes.canvas_session(canvas)
+    store = Store.Store(":memory:")
+    # A fresh incremental cache, so the cold phase really starts cold
+    Load_Info.SYNC_CACHE = os.path.join(tempfile.mkdtemp(), "sync_cache.json")
+    def run():
+        if stream:
+            Workflow.sync_stream("canvas.test", "token", sheets.spreadsheet_id, session=session, sheet_service=sheets,
+                                 store=store)
+        else:
+            Workflow.sync("canvas.test", "token", sheets.spreadsheet_id, session=session, sheet_service=sheets,
+                          store=store, backend=backend)
+
+    results = [measure("cold", run, canvas, sheets, n_assignments),
+               measure("warm", run, canvas, sheets, n_assignments)]
+
+    for course_id, assignments in canvas.assignments.items():
+        for index in range(0, len(assignments), 100):
+            canvas.touch(course_id, index, name=f"{assignments[index]['name']} (edited)")
+    results.append(measure("1% changed", run, canvas, sheets, n_assignments))
+
+    store.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline sync benchmark against local Canvas/Sheets stand-ins")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--canvas-latency", type=float, default=0.0, help="seconds per Canvas request")
+    parser.add_argument("--sheets-latency", type=float, default=0.0, help="seconds per Sheets request")
+    parser.add_argument("--stream", action="store_true", help="benchmark Workflow.sync_stream")
+    parser.add_argument("--backend", choices=["rest", "graphql"], default="rest", help="Canvas fetch backend")
+    parser.add_argument("--json", help="write the full report here")
+    parser.add_argument("--metrics", help="write the instrumentation report here (.prom for Prometheus text)")
+    args = parser.parse_args()
+
+    report = []
+    print(f"{'assignments':>11} {'phase':>10} {'seconds':>8} {'rows/s':>10} {'canvas':>7} {'sheets':>7} {'peak MB':>8}")
+    for size in args.sizes:
+        for result in bench_tenant(size, args.courses, args.canvas_latency, args.sheets_latency, args.stream,
+                                   args.backend):
+            report.append(result)
+            print(f"{size:>11} {result['phase']:>10} {result['seconds']:>8} {result['assignments_per_second']:>10} "
+                  f"{sum(result['canvas_calls'].values()):>7} {sum(result['sheets_calls'].values()):>7} "
+                  f"{result['peak_mb']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.metrics:
+        METRICS.write(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
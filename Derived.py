@@ -0,0 +1,110 @@
+from datetime import date, datetime
+
+# Columns computed from due_date_utc rather than fetched. days_left and urgency are always ours;
+# priority is the user's, and is only filled in (or escalated) while it still holds our default.
+# days_left is only shown while an assignment is due within WEEK_DAYS (see COUNTED)
+DERIVED_FIELDS = ("days_left", "urgency", "priority")
+
+# Urgency buckets by whole days until due: overdue, 0–3 days, 4–7 days, later ('' without a due date).
+# Layout colours rows by this column, so the sheet holds no volatile TODAY() formulas
+SOON_DAYS = 3
+WEEK_DAYS = 7
+
+DEFAULT_PRIORITY = {"overdue": "High", "soon": "High", "week": "Medium", "later": "Low"}
+
+# Buckets whose rows show a day count. The count changes every day, so the daily refresh rewrites
+# these rows (due within the week, a handful) and leaves days_left blank elsewhere; overdue and
+# later rows only change when their bucket does, and their colour says how far off they are
+COUNTED = ("soon", "week")
+
+
+def today() -> date:
+    return datetime.now().astimezone().date()
+
+
+# Whole days from today to the local due date, None without a due date
+def days_until(due_date_utc: str, on: date, _cache: dict) -> int | None:
+    if not due_date_utc:
+        return None
+    due = _cache.get(due_date_utc)
+    if due is None:
+        due = _cache[due_date_utc] = datetime.fromisoformat(due_date_utc.replace("Z", "+00:00")).astimezone().date()
+    return (due - on).days
+
+
+def bucket(days: int | None) -> str:
+    if days is None:
+        return ''
+    if days < 0:
+        return "overdue"
+    if days <= SOON_DAYS:
+        return "soon"
+    if days <= WEEK_DAYS:
+        return "week"
+    return "later"
+
+
+# A row's current value of a field ('' when missing); 0 days left is a value, not a blank
+def _held(row, field: str):
+    value = row.get(field)
+    return '' if value is None else value
+
+
+# Derived values for one row (an Assignment or a sheet row dict) that differ from what it holds
+def derive(row, on: date, _cache: dict) -> dict:
+    days = days_until(row.get("due_date_utc") or '', on, _cache)
+    urgency = bucket(days)
+    values = {"days_left": days if urgency in COUNTED else '', "urgency": urgency}
+
+    # Sheet reads and the Store give text, fresh records may hold ints
+    changed = {field: value for field, value in values.items() if str(_held(row, field)) != str(value)}
+
+    priority = row.get("priority") or ''
+    if row.get("submitted") != "Yes" and priority == DEFAULT_PRIORITY.get(row.get("urgency") or '', ''):
+        default = DEFAULT_PRIORITY.get(urgency, '')
+        if default != priority:
+            changed["priority"] = default
+
+    return changed
+
+
+# Fills derived fields into diff ops: inserts get them outright, updates get whatever
+# their new Canvas values (a moved due date, a submission) change
+def derive_op(op: dict, on_sheet: dict, on: date, _cache: dict) -> dict:
+    if op["op"] == "insert":
+        op["values"] = op["values"]._replace(**derive(op["values"], on, _cache))
+    elif op["op"] == "update":
+        merged = dict(on_sheet.get(op["sync_id"], {}), **op["values"])
+        op["values"].update(derive(merged, on, _cache))
+    return op
+
+
+def derive_ops(ops, sheet_assignments: list[dict], on: date = None):
+    on_sheet = {row["sync_id"]: row for row in sheet_assignments if row.get("sync_id")}
+    on, cache = on or today(), {}
+    return (derive_op(op, on_sheet, on, cache) for op in ops)
+
+
+# Update ops for every row whose derived values moved since it was last written: its urgency
+# bucket or default priority, or the day count of a row due this week. One pass over all rows
+# with the date and due-date parsing shared across them
+def refresh_ops(sheet_assignments: list[dict], on: date = None) -> list[dict]:
+    on, cache = on or today(), {}
+    ops = []
+    for row in sheet_assignments:
+        if not row.get("sync_id"):
+            continue
+        values = derive(row, on, cache)
+        if values:
+            ops.append({"op": "update", "sync_id": row["sync_id"], "row": row["row"], "values": values})
+    return ops
+
+
+if __name__ == '__main__':
+    import Sheets
+    import Store
+    import Workflow
+
+    store = Store.Store()
+    for title in store.sheet_titles(Sheets.SPREADSHEET_ID) or ["Assignments"]:
+        print(title, Workflow.refresh_derived(Sheets.SPREADSHEET_ID, title, store=store))
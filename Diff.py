@@ -0,0 +1,58 @@
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from Assignment import Assignment, content_hash, course_of
+
+# Columns owned by Canvas; priority, status and notes are edited by the user and never overwritten
+CANVAS_FIELDS = ["course_name", "assignment_name", "due_date", "submitted", "link",
+                 "sync_id", "source", "due_date_utc", "updated_at"]
+
+
+# Yields the minimal insert/update/delete ops that turn the sheet into the Canvas state.
+# canvas_assignments are Assignment records in any iterable (e.g. Load_Info.iter_assignments); it is consumed once
+# and ops come out as it is read. Deletes come last, once the stream is exhausted.
+# sheet_assignments are dicts keyed by COLUMNS plus "row" (1-based sheet row).
+# full=False means canvas_assignments is only the changed subset, so nothing is deleted
+def iter_diff(canvas_assignments: Iterable[Assignment], sheet_assignments: list[dict], full: bool = True):
+
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    on_sheet = {row["sync_id"]: row for row in sheet_assignments if row.get("sync_id")}
+
+    for assignment in canvas_assignments:
+        digest = assignment.content_hash or content_hash(assignment)
+        row = on_sheet.pop(assignment.sync_id, None)
+
+        if row is None:
+            values = assignment._replace(content_hash=digest, created_at=now, last_synced=now)
+            yield {"op": "insert", "sync_id": assignment.sync_id, "values": values}
+            continue
+
+        if row.get("content_hash") == digest:
+            continue
+
+        values = {field: getattr(assignment, field) for field in CANVAS_FIELDS
+                  if getattr(assignment, field) != (row.get(field) or '')}
+        values.update({"content_hash": digest, "last_synced": now})
+        yield {"op": "update", "sync_id": assignment.sync_id, "row": row["row"], "values": values}
+
+    if full:
+        # Only rows this tool created are removed; rows the user added by hand stay
+        for sync_id, row in on_sheet.items():
+            if row.get("source") == "canvas":
+                yield {"op": "delete", "sync_id": sync_id, "row": row["row"]}
+
+
+# Deletes for an incremental diff (iter_diff with full=False): Canvas rows of courses not in listed,
+# and rows a course's refetched list no longer has. listed is {course_id: sync_ids}, None for
+# a course whose list was unchanged (see Load_Info.get_changed_assignments)
+def iter_deletes(sheet_assignments: list[dict], listed: dict):
+    for row in sheet_assignments:
+        if row.get("source") != "canvas" or not row.get("sync_id"):
+            continue
+        course_id = course_of(row["sync_id"])
+        if course_id not in listed or (listed[course_id] is not None and row["sync_id"] not in listed[course_id]):
+            yield {"op": "delete", "sync_id": row["sync_id"], "row": row["row"]}
+
+
+def diff_assignments(canvas_assignments, sheet_assignments: list[dict], full: bool = True) -> list[dict]:
+    return list(iter_diff(canvas_assignments, sheet_assignments, full))
@@ -0,0 +1,333 @@
+import hmac
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import Archive
+import Derived
+import Diff
+import Journal
+import Load_Info
+import Sheets
+import Store
+import Workflow
+from Metrics import METRICS
+
+# Where the receiver listens; point Canvas Live Events (via an HTTP forwarder) or a webhook here
+EVENTS_HOST = os.getenv("EVENTS_HOST", "127.0.0.1")
+EVENTS_PORT = int(os.getenv("EVENTS_PORT", "8787"))
+
+# Shared secret senders put in X-Canvas-Sync-Secret (or ?secret=); unset accepts everything
+EVENTS_SECRET = os.getenv("EVENTS_SECRET")
+
+# A burst of events is synced once it has been quiet this long, or this long after its first event
+DEBOUNCE = float(os.getenv("EVENTS_DEBOUNCE", "2"))
+MAX_DELAY = float(os.getenv("EVENTS_MAX_DELAY", "10"))
+
+# Full sync as a safety net for missed or unparseable events, seconds
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "3600"))
+
+# More changed assignments than this in one course → refetch the course's list instead of each one
+COURSE_REFETCH = 10
+
+# Canvas global ids are shard * 10**13 + local id; sync_ids use the local id
+_SHARD = 10 ** 13
+
+# Event names that can change a row: assignment_*, submission_*, grade_change
+EVENT_PREFIXES = ("assignment_", "submission_", "grade_change")
+
+
+def local_id(value) -> int | None:
+    try:
+        return int(str(value).split("~")[-1]) % _SHARD
+    except (TypeError, ValueError):
+        return None
+
+
+# Notification → [(course_id, assignment_id)], assignment_id None meaning "the whole course".
+# Accepts Canvas Live Events ({"metadata": {"event_name", "context_id", ...}, "body": {...}}),
+# flat webhooks ({"course_id", "assignment_id"}) and lists of either. Unrelated events give []
+def parse_event(payload) -> list[tuple[int | None, int | None]]:
+    if isinstance(payload, list):
+        return [key for item in payload for key in parse_event(item)]
+    if not isinstance(payload, dict):
+        return []
+
+    metadata = payload.get("metadata") or {}
+    body = payload.get("body") if isinstance(payload.get("body"), dict) else payload
+
+    name = metadata.get("event_name") or payload.get("event_name") or payload.get("event") or ''
+    if name and not name.startswith(EVENT_PREFIXES):
+        return []
+
+    course_id = body.get("course_id")
+    if course_id is None:
+        for source in (body, metadata):
+            if source.get("context_type") == "Course" and source.get("context_id") is not None:
+                course_id = source["context_id"]
+                break
+
+    assignment_id = body.get("assignment_id")
+    if assignment_id is None and name.startswith("assignment_"):
+        assignment_id = body.get("id")
+
+    course_id, assignment_id = local_id(course_id), local_id(assignment_id)
+    if course_id is None and assignment_id is None:
+        return []
+    return [(course_id, assignment_id)]
+
+
+# Collects keys and hands them out in debounced batches
+class Debouncer:
+    def __init__(self, debounce: float = DEBOUNCE, max_delay: float = MAX_DELAY):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.pending = set()
+        self.first = self.last = None
+        self.cond = threading.Condition()
+
+    def add(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        with self.cond:
+            now = time.monotonic()
+            self.first = self.first or now
+            self.last = now
+            self.pending.update(keys)
+            self.cond.notify_all()
+
+    def __len__(self):
+        with self.cond:
+            return len(self.pending)
+
+    # Blocks until a batch is due and returns it, or returns an empty set after timeout
+    def next_batch(self, timeout: float = None) -> set:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                if self.pending:
+                    due = min(self.last + self.debounce, self.first + self.max_delay)
+                    if now >= due:
+                        batch, self.pending = self.pending, set()
+                        self.first = self.last = None
+                        return batch
+                    wait = due - now
+                else:
+                    wait = None
+                if deadline is not None:
+                    if now >= deadline:
+                        return set()
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self.cond.wait(wait)
+
+
+# Syncs one spreadsheet tab from events: only the assignments named in a batch are fetched and
+# diffed, and a full Workflow.sync runs every reconcile_interval. Everything runs on one worker
+# thread, so event syncs and reconciles never overlap
+class EventSync:
+    def __init__(self, canvas_url: str, canvas_token: str, spreadsheet_id: str, sheet_title: str = "Assignments",
+                 session=None, sheet_service=None, store=None, max_workers: int = Load_Info.MAX_WORKERS,
+                 debounce: float = DEBOUNCE, max_delay: float = MAX_DELAY,
+                 reconcile_interval: float = RECONCILE_INTERVAL, sync=Workflow.sync):
+        self.canvas_url = canvas_url
+        self.canvas_token = canvas_token
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_title = sheet_title
+        self.session = session or Load_Info.build_session(max_workers)
+        self.sheet_service = sheet_service
+        self.store = store or Store.Store()
+        self.max_workers = max_workers
+        self.reconcile_interval = reconcile_interval
+        self.sync = sync
+        self.debouncer = Debouncer(debounce, max_delay)
+        self.courses = {}
+        self.finished = {}
+        self.reconciled = None
+        self.stopped = threading.Event()
+        self.logs = []
+
+    def submit(self, payload) -> int:
+        keys = parse_event(payload)
+        self.debouncer.add(keys)
+        return len(keys)
+
+    # {course_id: name} of active courses whose term hasn't finished; finished ones are archived
+    # by the reconcile, and their events ignored
+    def refresh_courses(self):
+        course_info = Load_Info.get_course_info(self.canvas_url, self.canvas_token, self.session)
+        self.finished = Archive.finished_courses(course_info)
+        self.courses = {course["id"]: course["name"] for course in course_info if course["id"] not in self.finished}
+
+    # Full sync of the tab; also picks up events that never arrived and moves urgency buckets forward
+    def reconcile(self) -> list[str]:
+        with METRICS.stage("reconcile"):
+            state = self.sync(self.canvas_url, self.canvas_token, self.spreadsheet_id, self.sheet_title,
+                              session=self.session, sheet_service=self.sheet_service,
+                              max_workers=self.max_workers, store=self.store)
+            self.refresh_courses()
+            derived = Workflow.refresh_derived(self.spreadsheet_id, self.sheet_title, self.sheet_service, self.store)
+        return ["reconcile: " + "; ".join(state["logs"] + derived)]
+
+    # Syncs only the assignments behind a batch of (course_id, assignment_id) keys
+    def sync_keys(self, keys) -> list[str]:
+        # A journal a crashed run left for this spreadsheet is finished before anything new is planned
+        resumed = Workflow.resume(self.spreadsheet_id, self.sheet_service, self.store)
+
+        with METRICS.stage("read"):
+            rows, next_row = Workflow.read_sheet_state(self.store, self.spreadsheet_id, self.sheet_title,
+                                                       self.sheet_service)
+        on_sheet = {row["sync_id"]: row for row in rows if row.get("sync_id")}
+
+        # Events without a course id are matched to the course through the rows already on the sheet
+        by_assignment = {sync_id.rsplit(":", 1)[1]: int(sync_id.split(":")[1]) for sync_id in on_sheet
+                         if sync_id.startswith("canvas:")}
+        wanted = defaultdict(set)
+        for course_id, assignment_id in keys:
+            if course_id is None:
+                course_id = by_assignment.get(str(assignment_id))
+                if course_id is None:
+                    continue
+            wanted[course_id].add(assignment_id)
+
+        if any(course_id not in self.courses and course_id not in self.finished for course_id in wanted):
+            self.refresh_courses()
+
+        fetched, gone = [], []
+
+        def fetch(course_id):
+            name = self.courses[course_id]
+            ids = wanted[course_id]
+            if None in ids or len(ids) > COURSE_REFETCH:
+                assignments = Load_Info.get_course_assignments(self.canvas_url, name, course_id,
+                                                               self.canvas_token, self.session)
+                present = {a.sync_id for a in assignments}
+                prefix = f"canvas:{course_id}:"
+                return assignments, [s for s in on_sheet if s.startswith(prefix) and s not in present]
+
+            assignments, missing = [], []
+            for assignment_id in sorted(ids):
+                assignment = Load_Info.get_assignment(self.canvas_url, name, course_id, assignment_id,
+                                                      self.canvas_token, self.session)
+                if assignment is None:
+                    missing.append(f"canvas:{course_id}:{assignment_id}")
+                else:
+                    assignments.append(assignment)
+            return assignments, missing
+
+        # Courses that aren't active any more are left to the next reconcile
+        active = [course_id for course_id in wanted if course_id in self.courses]
+        with METRICS.stage("fetch"), ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for assignments, missing in pool.map(fetch, active):
+                fetched.extend(assignments)
+                gone.extend(missing)
+
+        with METRICS.stage("diff"):
+            ops = list(Derived.derive_ops(Diff.iter_diff(fetched, rows, full=False), rows))
+            ops += [{"op": "delete", "sync_id": sync_id, "row": on_sheet[sync_id]["row"]} for sync_id in gone
+                    if sync_id in on_sheet and on_sheet[sync_id].get("source") == "canvas"]
+
+        counts = {kind: sum(op["op"] == kind for op in ops) for kind in ("insert", "update", "delete")}
+        logs = resumed + [f"events: {len(keys)} keys, {len(active)} courses",
+                f"diff: {counts['insert']} insert, {counts['update']} update, {counts['delete']} delete"]
+
+        if ops:
+            with METRICS.stage("write"):
+                sheet_id = Sheets.get_sheet_id(self.sheet_service, self.spreadsheet_id, self.sheet_title)
+                row_count = Sheets.get_row_count(sheet_id, self.sheet_service, self.spreadsheet_id)
+                calls = Journal.write_ops(ops, next_row, row_count, self.sheet_service, self.spreadsheet_id,
+                                          self.sheet_title, self.store)
+            logs.append(f"write: {calls} calls")
+
+        return logs
+
+    # Worker loop: debounced event batches, plus a reconcile whenever one is due (including at start)
+    def run(self):
+        while not self.stopped.is_set():
+            due = 0 if self.reconciled is None else self.reconciled + self.reconcile_interval - time.monotonic()
+            if due <= 0:
+                # Stamped first, so a failing reconcile waits a full interval before trying again
+                self.reconciled = time.monotonic()
+                self.logs += self.run_safely(self.reconcile)
+                continue
+            batch = self.debouncer.next_batch(timeout=min(due, 1.0))
+            if batch:
+                self.logs += self.run_safely(self.sync_keys, batch)
+
+    # A failed batch is logged and left to the next reconcile rather than killing the worker
+    def run_safely(self, fn, *args) -> list[str]:
+        try:
+            return fn(*args)
+        except Exception as error:
+            return [f"error: {type(error).__name__}: {error}"]
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name="event-sync", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stopped.set()
+
+
+# POST any path with a JSON notification → 202; GET /healthz → pending key count
+def make_handler(event_sync: EventSync, secret: str = EVENTS_SECRET):
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self) -> bool:
+            if not secret:
+                return True
+            given = self.headers.get("X-Canvas-Sync-Secret") or ''
+            if not given and "secret=" in self.path:
+                given = self.path.split("secret=", 1)[1].split("&", 1)[0]
+            return hmac.compare_digest(given.encode(), secret.encode())
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] == "/healthz":
+                self._reply(200, {"pending": len(event_sync.debouncer)})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self._authorized():
+                self._reply(401, {"error": "bad secret"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"null")
+            except (ValueError, UnicodeDecodeError):
+                self._reply(400, {"error": "body must be JSON"})
+                return
+            self._reply(202, {"queued": event_sync.submit(payload)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+# Starts the sync worker and serves notifications until interrupted
+def serve(event_sync: EventSync, host: str = EVENTS_HOST, port: int = EVENTS_PORT, secret: str = EVENTS_SECRET):
+    server = ThreadingHTTPServer((host, port), make_handler(event_sync, secret))
+    event_sync.start()
+    try:
+        server.serve_forever()
+    finally:
+        event_sync.stop()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    serve(EventSync(Load_Info.CANVAS_URL, Load_Info.CANVAS_TOKEN, Sheets.SPREADSHEET_ID))
@@ -0,0 +1,449 @@
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, parse_qs, urlencode
+import httplib2
+import requests
+from requests.adapters import BaseAdapter
+from googleapiclient.errors import HttpError
+from Assignment import column_letter
+
+# Local stand-ins for Canvas and Google Sheets/Drive, used by Benchmark.py.
+# FakeCanvas mounts on a requests.Session; FakeSheets replaces the discovery-built service.
+# Both count calls and bytes, add configurable latency and can throttle like the real APIs
+
+
+# Synthetic Canvas tenant: courses × assignments, served over the REST endpoints Load_Info uses
+class FakeCanvas(BaseAdapter):
+    def __init__(self, n_assignments: int, n_courses: int = 10, latency: float = 0.0,
+                 rate_limit: float = None, refill: float = 0.0, max_per_page: int = 100):
+        super().__init__()
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.bytes = 0
+
+        # Canvas-style leaky bucket: each request costs 1, refills per second, 403 when empty
+        self.rate_limit = rate_limit
+        self.refill = refill
+        self.remaining = rate_limit
+        self.refilled = time.monotonic()
+
+        start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        term_end = (start + timedelta(days=120)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.courses = [{"id": 1000 + c, "name": f"Course {c}",
+                         "term": {"id": 1, "name": "Current Term", "end_at": term_end}}
+                        for c in range(n_courses)]
+        self.assignments = {course["id"]: [] for course in self.courses}
+        for i in range(n_assignments):
+            course = self.courses[i % n_courses]
+            due = start + timedelta(hours=7 * i)
+            self.assignments[course["id"]].append({
+                "id": i,
+                "name": f"Assignment {i}",
+                "due_at": due.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "updated_at": "2026-01-05T00:00:00Z",
+                "html_url": f"https://canvas.test/courses/{course['id']}/assignments/{i}",
+                "submission": {"workflow_state": "submitted" if i % 3 == 0 else "unsubmitted",
+                               "submitted_at": None, "graded_at": None},
+            })
+
+    # Changes one assignment the way a teacher edit would
+    def touch(self, course_id: int, index: int = 0, **changes):
+        assignment = self.assignments[course_id][index]
+        assignment.update(changes)
+        assignment["updated_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def _count(self, endpoint: str, size: int):
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            self.bytes += size
+
+    def _throttle(self) -> float | None:
+        if self.rate_limit is None:
+            return None
+        with self.lock:
+            now = time.monotonic()
+            self.remaining = min(self.rate_limit, self.remaining + (now - self.refilled) * self.refill)
+            self.refilled = now
+            if self.remaining < 1:
+                return -1.0
+            self.remaining -= 1
+            return self.remaining
+
+    def _response(self, request, status: int, body, headers=None) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.request = request
+        response.url = request.url
+        response._content = body if isinstance(body, bytes) else json.dumps(body).encode()
+        response.headers.update(headers or {})
+        return response
+
+    def _page(self, request, items: list) -> requests.Response:
+        url = urlparse(request.url)
+        query = parse_qs(url.query)
+        per_page = min(int(query.get("per_page", ["10"])[0]), self.max_per_page)
+        page = int(query.get("page", ["1"])[0])
+        body = json.dumps(items[(page - 1) * per_page:page * per_page]).encode()
+
+        headers = {"ETag": '"' + hashlib.md5(body).hexdigest() + '"'}
+        if page * per_page < len(items):
+            query["page"] = [str(page + 1)]
+            next_url = url._replace(query=urlencode(query, doseq=True)).geturl()
+            headers["Link"] = f'<{next_url}>; rel="next"'
+
+        if request.headers.get("If-None-Match") == headers["ETag"]:
+            return self._response(request, 304, b"", headers)
+        return self._response(request, 200, body, headers)
+
+    # Enough of /api/graphql for Load_GraphQL: AllCourses, then aliased course(id:) follow-up pages
+    def _graphql(self, request) -> requests.Response:
+        payload = json.loads(request.body)
+        query = payload["query"]
+
+        def connection(course_id: int, first: int, after: str | None) -> dict:
+            items = self.assignments[course_id]
+            start = int(base64.b64decode(after)) if after else 0
+            nodes = [{
+                "_id": str(a["id"]), "name": a["name"], "dueAt": a["due_at"], "updatedAt": a["updated_at"],
+                "htmlUrl": a["html_url"],
+                "submissionsConnection": {"nodes": [{"state": a["submission"]["workflow_state"],
+                                                     "submittedAt": a["submission"]["submitted_at"],
+                                                     "gradedAt": a["submission"]["graded_at"]}]},
+            } for a in items[start:start + first]]
+            end = start + len(nodes)
+            return {"nodes": nodes, "pageInfo": {"hasNextPage": end < len(items),
+                                                 "endCursor": base64.b64encode(str(end).encode()).decode()}}
+
+        if "allCourses" in query:
+            first = payload["variables"]["first"]
+            data = {"allCourses": [{
+                "_id": str(c["id"]), "name": c["name"], "state": "available",
+                "term": {"_id": str(c["term"]["id"]), "name": c["term"]["name"], "startAt": None,
+                         "endAt": c["term"]["end_at"]},
+                "assignmentsConnection": connection(c["id"], first, None),
+            } for c in self.courses]}
+        else:
+            data = {alias: {"assignmentsConnection": connection(int(course_id), int(first), after)}
+                    for alias, course_id, first, after in re.findall(
+                        r'(\w+): course\(id: "(\d+)"\) \{\s*assignmentsConnection\(first: (\d+), after: "([^"]*)"\)',
+                        query)}
+
+        return self._response(request, 200, {"data": data})
+
+    def send(self, request, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+
+        remaining = self._throttle()
+        if remaining is not None and remaining < 0:
+            response = self._response(request, 403, b"403 Forbidden (Rate Limit Exceeded)",
+                                      {"X-Rate-Limit-Remaining": "0"})
+            self._count("throttled", 0)
+            return response
+
+        path = urlparse(request.url).path
+        match = re.fullmatch(r"/api/v1/courses/(\d+)/assignments", path)
+        single = re.fullmatch(r"/api/v1/courses/(\d+)/assignments/(\d+)", path)
+        if path == "/api/graphql":
+            endpoint, response = "graphql", self._graphql(request)
+        elif path == "/api/v1/courses":
+            endpoint, response = "courses", self._page(request, self.courses)
+        elif match:
+            endpoint, response = "assignments", self._page(request, self.assignments.get(int(match[1]), []))
+        elif single:
+            found = [a for a in self.assignments.get(int(single[1]), []) if a["id"] == int(single[2])]
+            endpoint, response = "assignment", (self._response(request, 200, found[0]) if found else
+                                                self._response(request, 404, {"errors": [{"message": "not found"}]}))
+        else:
+            endpoint, response = "unknown", self._response(request, 404, {"errors": [{"message": "not found"}]})
+
+        if remaining is not None:
+            response.headers["X-Rate-Limit-Remaining"] = str(remaining)
+        self._count(endpoint, len(response.content))
+        return response
+
+    def close(self):
+        pass
+
+
+# Mounts a FakeCanvas on a pooled session the way Load_Info.build_session does
+def canvas_session(canvas: FakeCanvas, pool_size: int = 8) -> requests.Session:
+    import Load_Info
+    session = Load_Info.build_session(pool_size)
+    session.mount("https://", canvas)
+    return session
+
+
+_A1 = re.compile(r"^(?:'((?:[^']|'')+)'!|([^!]+)!)?([A-Z]+)?(\d+)?(?::([A-Z]+)?(\d+)?)?$")
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+# A request object shaped like googleapiclient's HttpRequest
+class FakeRequest:
+    def __init__(self, sheets: "FakeSheets", endpoint: str, handler, body=None):
+        self.sheets = sheets
+        self.endpoint = endpoint
+        self.handler = handler
+        self.methodId = ("drive." if endpoint.startswith("permissions") else "sheets.spreadsheets.") + endpoint
+        self.body = json.dumps(body) if body is not None else None
+        self.http = None
+
+    def execute(self, http=None, num_retries=0):
+        return self.sheets._execute(self.endpoint, self.handler)
+
+
+class _Values:
+    def __init__(self, sheets):
+        self.sheets = sheets
+
+    def get(self, spreadsheetId, range, majorDimension="ROWS", **kwargs):
+        return FakeRequest(self.sheets, "values.get", lambda: self.sheets._read(range, majorDimension))
+
+    def batchGet(self, spreadsheetId, ranges, majorDimension="ROWS", **kwargs):
+        return FakeRequest(self.sheets, "values.batchGet", lambda: {"valueRanges": [
+            self.sheets._read(r, majorDimension) for r in ranges]})
+
+    def update(self, spreadsheetId, range, body, **kwargs):
+        return FakeRequest(self.sheets, "values.update", lambda: self.sheets._write(range, body["values"]), body)
+
+    def batchUpdate(self, spreadsheetId, body):
+        def handler():
+            for data in body["data"]:
+                self.sheets._write(data["range"], data["values"])
+            return {"totalUpdatedCells": sum(len(row) for data in body["data"] for row in data["values"])}
+        return FakeRequest(self.sheets, "values.batchUpdate", handler, body)
+
+
+class _Spreadsheets:
+    def __init__(self, sheets):
+        self.sheets = sheets
+
+    def values(self):
+        return _Values(self.sheets)
+
+    def get(self, spreadsheetId, fields=None, **kwargs):
+        return FakeRequest(self.sheets, "get", self.sheets._metadata)
+
+    def create(self, body, fields=None):
+        return FakeRequest(self.sheets, "create", lambda: {"spreadsheetId": self.sheets.spreadsheet_id})
+
+    def batchUpdate(self, spreadsheetId, body):
+        return FakeRequest(self.sheets, "batchUpdate", lambda: self.sheets._batch_update(body["requests"]), body)
+
+
+# In-memory spreadsheet behind the subset of the Sheets v4 API that Sheets.py calls.
+# Cell writes outside the grid fail like the real API, so grid sizing is exercised too
+class FakeSheets:
+    def __init__(self, rows: int = 1000, columns: int = 26, latency: float = 0.0,
+                 quota_every: int = 0, spreadsheet_id: str = "fake-spreadsheet"):
+        self.spreadsheet_id = spreadsheet_id
+        self.latency = latency
+        self.quota_every = quota_every
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.bytes = 0
+        self.next_sheet_id = 1
+        self.tabs = {}
+        self._add_sheet("Sheet1", rows, columns)
+
+    def _add_sheet(self, title: str, rows: int = 1000, columns: int = 26, sheet_id: int = None) -> dict:
+        sheet_id = self.next_sheet_id if sheet_id is None else sheet_id
+        self.next_sheet_id = max(self.next_sheet_id, sheet_id) + 1
+        tab = {"properties": {"sheetId": sheet_id, "title": title, "index": len(self.tabs),
+                              "gridProperties": {"rowCount": rows, "columnCount": columns}},
+               "cells": [], "conditionalFormats": [], "filterViews": [], "developerMetadata": []}
+        self.tabs[title] = tab
+        return tab
+
+    def spreadsheets(self):
+        return _Spreadsheets(self)
+
+    def _execute(self, endpoint: str, handler):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            total = sum(self.calls.values())
+            if self.quota_every and total % self.quota_every == 0:
+                raise HttpError(httplib2.Response({"status": 429}),
+                                b'{"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}}')
+            result = handler()
+            self.bytes += len(json.dumps(result))
+            return result
+
+    def _tab(self, title: str | None) -> dict:
+        if title is None:
+            return next(iter(self.tabs.values()))
+        return self.tabs[title.replace("''", "'")]
+
+    def _by_id(self, sheet_id: int) -> dict:
+        return next(tab for tab in self.tabs.values() if tab["properties"]["sheetId"] == sheet_id)
+
+    def _parse(self, a1: str):
+        match = _A1.match(a1)
+        if not match:
+            raise HttpError(httplib2.Response({"status": 400}), f"Unable to parse range: {a1}".encode())
+        quoted, plain, c1, r1, c2, r2 = match.groups()
+        tab = self._tab(quoted or plain)
+        grid = tab["properties"]["gridProperties"]
+        start_col = _column_index(c1) if c1 else 0
+        start_row = int(r1) - 1 if r1 else 0
+        end_col = _column_index(c2) + 1 if c2 else (start_col + 1 if c1 and not r2 and ":" not in a1 else grid["columnCount"])
+        end_row = int(r2) if r2 else (start_row + 1 if ":" not in a1 else grid["rowCount"])
+        return tab, start_row, end_row, start_col, end_col
+
+    def _read(self, a1: str, major="ROWS") -> dict:
+        tab, r0, r1, c0, c1 = self._parse(a1)
+        values = [list(row[c0:c1]) for row in tab["cells"][r0:r1]]
+        for row in values:
+            while row and row[-1] in ('', None):
+                row.pop()
+        while values and not values[-1]:
+            values.pop()
+        if major == "COLUMNS":
+            width = max((len(row) for row in values), default=0)
+            values = [[row[c] if c < len(row) else '' for row in values] for c in range(width)]
+            for column in values:
+                while column and column[-1] == '':
+                    column.pop()
+        result = {"range": a1, "majorDimension": major}
+        if values:
+            result["values"] = values
+        return result
+
+    def _write(self, a1: str, values: list) -> dict:
+        tab, r0, _, c0, _ = self._parse(a1)
+        grid = tab["properties"]["gridProperties"]
+        if r0 + len(values) > grid["rowCount"] or c0 + max((len(v) for v in values), default=0) > grid["columnCount"]:
+            raise HttpError(httplib2.Response({"status": 400}),
+                            f"Range ({a1}) exceeds grid limits. Max rows: {grid['rowCount']}".encode())
+        cells = tab["cells"]
+        while len(cells) < r0 + len(values):
+            cells.append([])
+        for offset, row_values in enumerate(values):
+            row = cells[r0 + offset]
+            if len(row) < c0 + len(row_values):
+                row.extend([''] * (c0 + len(row_values) - len(row)))
+            row[c0:c0 + len(row_values)] = ['' if v is None else str(v) if not isinstance(v, (int, float)) else v
+                                            for v in row_values]
+        return {"updatedRange": a1, "updatedRows": len(values)}
+
+    def _metadata(self) -> dict:
+        return {"spreadsheetId": self.spreadsheet_id,
+                "sheets": [{key: tab[key] for key in ("properties", "conditionalFormats", "filterViews", "developerMetadata")}
+                           for tab in sorted(self.tabs.values(), key=lambda t: t["properties"]["index"])]}
+
+    def _batch_update(self, requests: list[dict]) -> dict:
+        replies = []
+        for request in requests:
+            (kind, body), = request.items()
+            reply = {}
+            if kind == "addSheet":
+                props = body["properties"]
+                grid = props.get("gridProperties", {})
+                tab = self._add_sheet(props["title"], grid.get("rowCount", 1000), grid.get("columnCount", 26),
+                                      props.get("sheetId"))
+                if "frozenRowCount" in grid:
+                    tab["properties"]["gridProperties"]["frozenRowCount"] = grid["frozenRowCount"]
+                reply = {"addSheet": {"properties": tab["properties"]}}
+            elif kind == "deleteSheet":
+                tab = self._by_id(body["sheetId"])
+                del self.tabs[tab["properties"]["title"]]
+            elif kind == "updateSheetProperties":
+                tab = self._by_id(body["properties"]["sheetId"])
+                old_title = tab["properties"]["title"]
+                for key, value in body["properties"].items():
+                    if isinstance(value, dict):
+                        tab["properties"].setdefault(key, {}).update(value)
+                    else:
+                        tab["properties"][key] = value
+                if tab["properties"]["title"] != old_title:
+                    self.tabs[tab["properties"]["title"]] = self.tabs.pop(old_title)
+            elif kind == "appendDimension":
+                grid = self._by_id(body["sheetId"])["properties"]["gridProperties"]
+                key = "rowCount" if body["dimension"] == "ROWS" else "columnCount"
+                grid[key] += body["length"]
+            elif kind == "deleteDimension":
+                span = body["range"]
+                tab = self._by_id(span["sheetId"])
+                grid = tab["properties"]["gridProperties"]
+                start, end = span.get("startIndex", 0), span.get("endIndex")
+                if span["dimension"] == "ROWS":
+                    end = grid["rowCount"] if end is None else end
+                    del tab["cells"][start:end]
+                    grid["rowCount"] -= end - start
+                else:
+                    end = grid["columnCount"] if end is None else end
+                    for row in tab["cells"]:
+                        del row[start:end]
+                    grid["columnCount"] -= end - start
+            elif kind == "addConditionalFormatRule":
+                self._by_id(body["rule"]["ranges"][0]["sheetId"])["conditionalFormats"].insert(
+                    body.get("index", 0), body["rule"])
+            elif kind == "deleteConditionalFormatRule":
+                del self._by_id(body["sheetId"])["conditionalFormats"][body["index"]]
+            elif kind == "addFilterView":
+                view = dict(body["filter"], filterViewId=len(self.calls) * 1000 + len(replies))
+                self._by_id(view["range"]["sheetId"])["filterViews"].append(view)
+                reply = {"addFilterView": {"filter": view}}
+            elif kind == "deleteFilterView":
+                for tab in self.tabs.values():
+                    tab["filterViews"] = [v for v in tab["filterViews"] if v["filterViewId"] != body["filterId"]]
+            elif kind == "createDeveloperMetadata":
+                metadata = body["developerMetadata"]
+                self._by_id(metadata["location"]["sheetId"])["developerMetadata"].append(
+                    dict(metadata, metadataId=len(self.calls) * 1000 + len(replies)))
+            elif kind == "updateDeveloperMetadata":
+                lookup = body["dataFilters"][0]["developerMetadataLookup"]
+                sheet_id = lookup.get("metadataLocation", {}).get("sheetId")
+                for tab in self.tabs.values():
+                    if sheet_id is not None and tab["properties"]["sheetId"] != sheet_id:
+                        continue
+                    for metadata in tab["developerMetadata"]:
+                        if metadata["metadataKey"] == lookup["metadataKey"]:
+                            metadata.update(body["developerMetadata"])
+            elif kind == "updateCells":
+                start = body["start"]
+                tab = self._by_id(start["sheetId"])
+                values = [[cell.get("userEnteredValue", {}).get("stringValue", '') for cell in row.get("values", [])]
+                          for row in body["rows"]]
+                title = tab["properties"]["title"].replace("'", "''")
+                self._write(f"'{title}'!{column_letter(start.get('columnIndex', 0))}{start.get('rowIndex', 0) + 1}", values)
+            # Formatting, validation, borders and sorting don't change what the fakes can observe
+            replies.append(reply)
+        return {"spreadsheetId": self.spreadsheet_id, "replies": replies}
+
+
+class _Permissions:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def create(self, fileId, body, **kwargs):
+        return FakeRequest(self.drive, "permissions.create", lambda: {"id": "permission", "role": body["role"]})
+
+
+# Drive stand-in for create_spreadsheet's permissions().create
+class FakeDrive:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.quota_every = 0
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.bytes = 0
+
+    _execute = FakeSheets._execute
+
+    def permissions(self):
+        return _Permissions(self)
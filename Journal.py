@@ -0,0 +1,241 @@
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from googleapiclient.errors import HttpError
+import RateLimit
+import Sheets
+from Assignment import Assignment
+
+# Write-ahead journal for sheet writes. Before the first call, the planned ops and the exact
+# batches Sheets.build_write_batches made for them go to <key>.plan.json; after each batch lands
+# <key>.done holds how many have. A run that dies part way is finished by replay() from there,
+# without going back to Canvas. Both files are removed once the store has the ops too
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", ".canvas_sync_journal")
+
+
+# A journal that can't be finished: the sheet moved under it, or the API rejects one of its batches.
+# replay() has already dropped it by then; the caller diffs afresh
+class Stale(Exception):
+    pass
+
+
+def _atomic_write(path: str, text: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _encode_op(op: dict) -> dict:
+    if isinstance(op.get("values"), Assignment):
+        return dict(op, values=op["values"]._asdict())
+    return op
+
+
+def _decode_op(op: dict) -> dict:
+    if op["op"] == "insert":
+        return dict(op, values=Assignment.from_dict(op["values"]))
+    return op
+
+
+class Journal:
+    def __init__(self, spreadsheet_id: str, sheet_title: str, directory: str = JOURNAL_DIR):
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_title = sheet_title
+        self.directory = directory
+        key = hashlib.blake2b(f"{spreadsheet_id}\x1f{sheet_title}".encode(), digest_size=8).hexdigest()
+        self.plan_path = os.path.join(directory, f"{key}.plan.json")
+        self.done_path = os.path.join(directory, f"{key}.done")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.plan_path)
+
+    # Refuses to overwrite an unfinished plan (its remaining batches would be lost); replay it first
+    def begin(self, ops: list[dict], next_row: int, batches: list[dict]):
+        if self.exists():
+            raise RuntimeError(f"Unfinished journal for '{self.sheet_title}' at {self.plan_path}; resume it first")
+        os.makedirs(self.directory, exist_ok=True)
+        _atomic_write(self.done_path, "0")
+        _atomic_write(self.plan_path, json.dumps({
+            "spreadsheet_id": self.spreadsheet_id,
+            "sheet_title": self.sheet_title,
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "next_row": next_row,
+            "ops": [_encode_op(op) for op in ops],
+            "batches": batches,
+        }))
+
+    def load(self) -> dict:
+        with open(self.plan_path, "r") as f:
+            entry = json.load(f)
+        entry["ops"] = [_decode_op(op) for op in entry["ops"]]
+        return entry
+
+    def done(self) -> int:
+        if not os.path.exists(self.done_path):
+            return 0
+        with open(self.done_path, "r") as f:
+            return int(f.read().strip() or 0)
+
+    def checkpoint(self, done: int):
+        _atomic_write(self.done_path, str(done))
+
+    def clear(self):
+        for path in (self.plan_path, self.done_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# Journals left behind for a spreadsheet, one per tab
+def pending(spreadsheet_id: str, directory: str = JOURNAL_DIR) -> list[Journal]:
+    journals = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.plan.json"))):
+        with open(path, "r") as f:
+            header = json.load(f)
+        if header["spreadsheet_id"] == spreadsheet_id:
+            journals.append(Journal(spreadsheet_id, header["sheet_title"], directory))
+    return journals
+
+
+# Whether a structure batch that may have been cut off by the crash already landed.
+# Value writes are idempotent and simply rerun; growing or deleting rows twice is not.
+# A batchUpdate is atomic, so the batch landed entirely or not at all
+# sync_ids is the tab's sync_id column (Sheets.read_sync_index), read here when not given
+def _landed(batch: dict, entry: dict, sheet_service, spreadsheet_id: str, sheet_title: str,
+            sync_ids: list[str] = None) -> bool:
+    if batch["kind"] != "structure":
+        return False
+
+    requests = batch["requests"]
+    deletes = [r["deleteDimension"]["range"] for r in requests if "deleteDimension" in r]
+    if deletes:
+        # The first deleted row still holding the sync_id planned for it means the batch didn't run
+        expected = {op["row"]: op["sync_id"] for op in entry["ops"] if op["op"] == "delete"}
+        if sync_ids is None:
+            sync_ids, _ = Sheets.read_sync_index(sheet_service, spreadsheet_id, sheet_title)
+        row = deletes[0]["startIndex"] + 1
+        return not (row - 2 < len(sync_ids) and sync_ids[row - 2] == expected.get(row))
+
+    metadata = Sheets.get_metadata(sheet_service, spreadsheet_id, refresh=True)
+    sheet_id = metadata.sheet_id(sheet_title)
+    # Growth was only planned because the grid was short of what it now needs
+    grown = True
+    for request in requests:
+        append = request.get("appendDimension")
+        if append is None:
+            continue
+        if append["dimension"] == "COLUMNS":
+            grown = grown and metadata.column_count(sheet_id) >= len(Sheets.COLUMNS)
+        else:
+            target = entry["next_row"] + sum(op["op"] == "insert" for op in entry["ops"]) - 1
+            grown = grown and metadata.row_count(sheet_id) >= target
+    return grown
+
+
+# Sheet rows the batches would write or delete that no longer hold the sync_id planned for them.
+# Value batches come before any delete, so while one is left every planned row must still be in
+# place (and the insert rows blank or already holding their inserts); after that only the rows
+# of the remaining deletes matter
+def _moved(entry: dict, batches: list[dict], sync_ids: list[str]) -> list[int]:
+    def at(row: int) -> str:
+        return sync_ids[row - 2] if 0 <= row - 2 < len(sync_ids) else ''
+
+    ops = entry["ops"]
+    if any(batch["kind"] == "values" for batch in batches):
+        expected = {op["row"]: op["sync_id"] for op in ops if op["op"] != "insert" and op.get("sync_id")}
+        inserts = [op for op in ops if op["op"] == "insert"]
+        moved = [entry["next_row"] + i for i, op in enumerate(inserts)
+                 if at(entry["next_row"] + i) not in ('', op["sync_id"])]
+    else:
+        spans = [(r["deleteDimension"]["range"]["startIndex"], r["deleteDimension"]["range"]["endIndex"])
+                 for batch in batches for r in batch.get("requests", []) if "deleteDimension" in r]
+        expected = {op["row"]: op["sync_id"] for op in ops if op["op"] == "delete"
+                    and any(start < op["row"] <= end for start, end in spans)}
+        moved = []
+    return sorted(moved + [row for row, sync_id in expected.items() if at(row) != sync_id])
+
+
+# Drops a journal that can't be finished, and the store's copy of its tab (some of its batches may
+# have landed), so the next read_sheet_state reads the tab afresh
+def _drop(journal: Journal, store, reason: str):
+    journal.clear()
+    if store is not None:
+        store.replace(journal.spreadsheet_id, journal.sheet_title, [])
+    raise Stale(f"'{journal.sheet_title}': {reason}; journal dropped")
+
+
+# Runs the journal's batches from its checkpoint on, mirrors the ops into the store and clears it.
+# When resuming, the tab's sync_id column is read once to skip a batch that landed before the crash
+# and to check the remaining batches still point at their rows. A mismatch, or a batch the API
+# rejects (RateLimit.rejected), drops the journal and raises Stale. Returns the number of calls made
+def replay(journal: Journal, sheet_service=None, store=None, resuming: bool = True) -> int:
+    entry = journal.load()
+    batches = entry["batches"]
+    done = journal.done()
+
+    if resuming and done < len(batches):
+        sync_ids, _ = Sheets.read_sync_index(sheet_service, journal.spreadsheet_id, journal.sheet_title)
+        if _landed(batches[done], entry, sheet_service, journal.spreadsheet_id, journal.sheet_title, sync_ids):
+            done += 1
+            journal.checkpoint(done)
+        moved = _moved(entry, batches[done:], sync_ids)
+        if moved:
+            _drop(journal, store, f"rows {moved[:5]} no longer hold the planned assignments")
+
+    calls = 0
+    for index in range(done, len(batches)):
+        try:
+            Sheets.execute_batches([batches[index]], sheet_service, journal.spreadsheet_id)
+        except HttpError as error:
+            if not RateLimit.rejected(error):
+                raise
+            _drop(journal, store, f"batch {index} rejected ({error.resp.status})")
+        calls += 1
+        journal.checkpoint(index + 1)
+
+    if store is not None:
+        store.apply_ops(journal.spreadsheet_id, journal.sheet_title, entry["ops"], entry["next_row"])
+    journal.clear()
+    return calls
+
+
+# Plans ops into batches (as Sheets.write_ops would) for the given tab
+def plan_batches(ops: list[dict], next_row: int, row_count: int, sheet_service=None,
+                 spreadsheet_id=Sheets.SPREADSHEET_ID, sheet_title="Assignments") -> list[dict]:
+    sheet_id = Sheets.get_sheet_id(sheet_service, spreadsheet_id, sheet_title)
+    column_count = Sheets.get_column_count(sheet_id, sheet_service, spreadsheet_id)
+    return Sheets.build_write_batches(ops, sheet_id, sheet_title, next_row, row_count, column_count=column_count)
+
+
+# Journaled Sheets.write_ops: plan, journal, then execute batch by batch with a checkpoint after each
+def write_ops(ops: list[dict], next_row: int, row_count: int, sheet_service=None,
+              spreadsheet_id=Sheets.SPREADSHEET_ID, sheet_title="Assignments", store=None) -> int:
+    if not ops:
+        return 0
+    journal = Journal(spreadsheet_id, sheet_title)
+    batches = plan_batches(ops, next_row, row_count, sheet_service, spreadsheet_id, sheet_title)
+    journal.begin(ops, next_row, batches)
+    return replay(journal, sheet_service, store, resuming=False)
+
+
+# Human-readable plan: one line per op, then the calls it would take
+def describe(ops: list[dict], batches: list[dict], sheet_title: str = "Assignments") -> list[str]:
+    lines = []
+    for op in ops:
+        if op["op"] == "insert":
+            values = op["values"]
+            lines.append(f"{sheet_title}: insert {op['sync_id']}  {values.get('course_name')} / {values.get('assignment_name')}")
+        elif op["op"] == "update":
+            lines.append(f"{sheet_title}: update row {op['row']} {op['sync_id']}  {', '.join(op['values'])}")
+        else:
+            lines.append(f"{sheet_title}: delete row {op['row']} {op['sync_id']}")
+
+    structure = sum(batch["kind"] == "structure" for batch in batches)
+    cells = sum(len(row) for batch in batches if batch["kind"] == "values" for d in batch["data"] for row in d["values"])
+    lines.append(f"{sheet_title}: {len(ops)} ops in {len(batches)} calls "
+                 f"({structure} structure, {len(batches) - structure} values, {cells} cells)")
+    return lines
@@ -0,0 +1,273 @@
+import hashlib
+import json
+from Assignment import Assignment, column_letter
+
+# The Assignments tab layout as data. plan() compares it with what a tab already has and returns only
+# the batchUpdate requests still needed, so re-initializing a finished sheet sends nothing.
+#
+# What the API can report back (title, frozen rows, grid width, conditional formats, filter views) is
+# compared directly. Cell formats, validation, borders, widths and the header can't be read without
+# grid data, so they're applied as one group and stamped with LAYOUT_KEY developer metadata holding
+# a hash of the group; they're resent only when the hash changes.
+
+COLUMNS = list(Assignment._fields)
+
+DEFAULT_TITLE = "Assignments"
+
+LAYOUT_KEY = "canvas_sync.layout"
+
+# Everything plan() looks at, in one spreadsheets().get
+LAYOUT_FIELDS = ("spreadsheetId,sheets(properties(sheetId,title,index,gridProperties(rowCount,columnCount,frozenRowCount)),"
+                 "conditionalFormats,filterViews,developerMetadata)")
+
+FONT = "Century Gothic"
+HEADER_BACKGROUND = {"red": 0.80, "green": 0.90, "blue": 1.0}
+BLACK = {"red": 0, "green": 0, "blue": 0}
+DATE_PATTERN = "m/d/yyyy h:mm AM/PM"
+
+BASE_WIDTH = 150
+WIDTHS = {"course_name": 250, "assignment_name": 250, "notes": 300, "link": 300}
+
+DROPDOWNS = {
+    "priority": ["High", "Medium", "Low", "Optional"],
+    "status": ["Non Started", "Started", "Near Completion", "Completed"],
+    "submitted": ["Yes", "No"],
+}
+
+# Row colours by Derived urgency bucket. The rules compare a plain cell, so unlike TODAY()
+# they're only re-evaluated when the sync rewrites that cell
+URGENCY_COLORS = [
+    ("soon", {"red": 1.0, "green": 0.85, "blue": 0.85}),
+    ("week", {"red": 1.0, "green": 1.0, "blue": 0.6}),
+    ("later", {"red": 0.85, "green": 1.0, "blue": 0.85}),
+]
+
+# Rules earlier layouts added, removed when found
+LEGACY_FORMULAS = {
+    '=AND($C2<>"", $C2-TODAY()>=0, $C2-TODAY()<=3)',
+    '=AND($C2<>"", $C2-TODAY()>3, $C2-TODAY()<=7)',
+    '=AND($C2<>"", $C2-TODAY()>7)',
+}
+
+# Filter views by title: (sort column, ascending), {column: text that must match}
+FILTER_VIEWS = {
+    "Upcoming": (("due_date", "ASCENDING"), {"submitted": "No"}),
+}
+
+
+def urgency_formula(urgency: str, columns=COLUMNS) -> str:
+    return f'=${column_letter(columns.index("urgency"))}2="{urgency}"'
+
+
+# Conditional formats recognised as ours (current and earlier layouts); anything else on the tab is the user's
+def managed_formulas(columns=COLUMNS) -> set[str]:
+    return LEGACY_FORMULAS | {urgency_formula(urgency, columns) for urgency, _ in URGENCY_COLORS}
+
+
+# Hidden columns start at sync_id
+def visible_count(columns=COLUMNS) -> int:
+    return columns.index("sync_id")
+
+
+# Visible columns get readable labels; hidden ones keep their field names so they stay greppable
+def header_labels(columns=COLUMNS) -> list[str]:
+    visible = visible_count(columns)
+    return [col.replace("_", " ").title() for col in columns[:visible]] + list(columns[visible:])
+
+
+def _border():
+    return {"style": "SOLID", "width": 1, "color": BLACK}
+
+
+def _column_range(sheet_id: int, start: int, end: int = None, start_row: int = None, end_row: int = None) -> dict:
+    span = {"sheetId": sheet_id, "startColumnIndex": start, "endColumnIndex": start + 1 if end is None else end}
+    if start_row is not None:
+        span["startRowIndex"] = start_row
+    if end_row is not None:
+        span["endRowIndex"] = end_row
+    return span
+
+
+def _width(sheet_id: int, start: int, end: int, properties: dict, fields: str) -> dict:
+    return {"updateDimensionProperties": {
+        "range": {"sheetId": sheet_id, "dimension": "COLUMNS", "startIndex": start, "endIndex": end},
+        "properties": properties, "fields": fields,
+    }}
+
+
+# Cell formats, validation, borders, column widths/visibility and the header row. Ranges are open-ended
+# downwards so they cover rows appended later and don't depend on the grid size
+def format_requests(sheet_id: int, columns=COLUMNS) -> list[dict]:
+    visible = visible_count(columns)
+    requests = [
+        {"repeatCell": {
+            "range": {"sheetId": sheet_id},
+            "cell": {"userEnteredFormat": {"textFormat": {"fontFamily": FONT}, "wrapStrategy": "WRAP",
+                                           "horizontalAlignment": "CENTER", "verticalAlignment": "MIDDLE"}},
+            "fields": "userEnteredFormat(textFormat.fontFamily,wrapStrategy,horizontalAlignment,verticalAlignment)",
+        }},
+        {"repeatCell": {
+            "range": {"sheetId": sheet_id, "startRowIndex": 0, "endRowIndex": 1},
+            "cell": {"userEnteredFormat": {"textFormat": {"bold": True}, "backgroundColor": HEADER_BACKGROUND}},
+            "fields": "userEnteredFormat(textFormat.bold,backgroundColor)",
+        }},
+        {"repeatCell": {
+            "range": _column_range(sheet_id, columns.index("due_date"), start_row=1),
+            "cell": {"userEnteredFormat": {"numberFormat": {"type": "DATE_TIME", "pattern": DATE_PATTERN}}},
+            "fields": "userEnteredFormat.numberFormat",
+        }},
+        {"updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+            "rows": [{"values": [{"userEnteredValue": {"stringValue": label}} for label in header_labels(columns)]}],
+            "fields": "userEnteredValue",
+        }},
+        {"updateBorders": {
+            "range": _column_range(sheet_id, 0, visible, 0, 1),
+            "top": _border(), "bottom": _border(), "left": _border(), "right": _border(),
+            "innerHorizontal": _border(), "innerVertical": _border(),
+        }},
+        {"updateBorders": {
+            "range": _column_range(sheet_id, 0, visible, start_row=1),
+            "top": _border(), "bottom": _border(), "left": _border(), "right": _border(),
+            "innerHorizontal": _border(), "innerVertical": {"style": "NONE"},
+        }},
+        _width(sheet_id, 0, visible, {"pixelSize": BASE_WIDTH, "hiddenByUser": False}, "pixelSize,hiddenByUser"),
+        _width(sheet_id, visible, len(columns), {"hiddenByUser": True}, "hiddenByUser"),
+    ]
+
+    for col, width in WIDTHS.items():
+        index = columns.index(col)
+        requests.append(_width(sheet_id, index, index + 1, {"pixelSize": width}, "pixelSize"))
+
+    for col, options in DROPDOWNS.items():
+        requests.append({"setDataValidation": {
+            "range": _column_range(sheet_id, columns.index(col), start_row=1),
+            "rule": {"condition": {"type": "ONE_OF_LIST", "values": [{"userEnteredValue": o} for o in options]},
+                     "strict": True, "showCustomUi": True},
+        }})
+
+    return requests
+
+
+# Hash of the format group, independent of which tab it's for
+def format_hash(columns=COLUMNS) -> str:
+    return hashlib.blake2b(json.dumps(format_requests(0, columns), sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
+def conditional_formats(sheet_id: int, columns=COLUMNS) -> list[dict]:
+    return [{
+        "ranges": [_column_range(sheet_id, 0, visible_count(columns), start_row=1)],
+        "booleanRule": {
+            "condition": {"type": "CUSTOM_FORMULA", "values": [{"userEnteredValue": urgency_formula(urgency, columns)}]},
+            "format": {"backgroundColor": background},
+        },
+    } for urgency, background in URGENCY_COLORS]
+
+
+def filter_views(sheet_id: int, columns=COLUMNS) -> list[dict]:
+    views = []
+    for title, ((sort_col, order), matches) in FILTER_VIEWS.items():
+        views.append({
+            "title": title,
+            "range": _column_range(sheet_id, 0, len(columns), start_row=0),
+            "sortSpecs": [{"dimensionIndex": columns.index(sort_col), "sortOrder": order}],
+            "filterSpecs": [{"columnIndex": columns.index(col),
+                             "filterCriteria": {"condition": {"type": "TEXT_EQ", "values": [{"userEnteredValue": text}]}}}
+                            for col, text in matches.items()],
+        })
+    return views
+
+
+# Comparable forms. The API echoes objects back with defaults filled in or zero fields dropped,
+# so only the parts we set are compared; rows are always open-ended so row bounds are ignored
+def _span_key(span: dict) -> tuple:
+    return (span.get("startRowIndex", 0), span.get("startColumnIndex", 0), span.get("endColumnIndex"))
+
+
+def _color_key(color: dict) -> tuple:
+    return tuple(round(color.get(c, 0), 3) for c in ("red", "green", "blue"))
+
+
+def _formula(rule: dict) -> str | None:
+    values = rule.get("booleanRule", {}).get("condition", {}).get("values") or [{}]
+    return values[0].get("userEnteredValue")
+
+
+def rule_key(rule: dict) -> tuple:
+    return (_formula(rule), tuple(_span_key(s) for s in rule.get("ranges", [])),
+            _color_key(rule.get("booleanRule", {}).get("format", {}).get("backgroundColor", {})))
+
+
+def view_key(view: dict) -> tuple:
+    return (view.get("title"), _span_key(view.get("range", {})),
+            tuple((s.get("dimensionIndex"), s.get("sortOrder", "ASCENDING")) for s in view.get("sortSpecs", [])),
+            tuple((f.get("columnIndex"), json.dumps(f.get("filterCriteria", {}), sort_keys=True))
+                  for f in view.get("filterSpecs", [])))
+
+
+# Requests that bring one tab (a sheets[] entry from LAYOUT_FIELDS) to the layout, titled `title`
+def plan(sheet: dict, title: str = DEFAULT_TITLE, columns=COLUMNS) -> list[dict]:
+    props = sheet["properties"]
+    sheet_id = props["sheetId"]
+    grid = props.get("gridProperties", {})
+    requests = []
+
+    # Grid width: exactly the synced columns. Never cut into them (the hidden ones included)
+    column_count = grid.get("columnCount", 0)
+    if column_count < len(columns):
+        requests.append({"appendDimension": {"sheetId": sheet_id, "dimension": "COLUMNS",
+                                             "length": len(columns) - column_count}})
+    elif column_count > len(columns):
+        requests.append({"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "COLUMNS",
+                                                       "startIndex": len(columns), "endIndex": column_count}}})
+
+    fields = []
+    if props.get("title") != title:
+        fields.append("title")
+    if grid.get("frozenRowCount", 0) != 1:
+        fields.append("gridProperties.frozenRowCount")
+    if fields:
+        requests.append({"updateSheetProperties": {
+            "properties": {"sheetId": sheet_id, "title": title, "gridProperties": {"frozenRowCount": 1}},
+            "fields": ",".join(fields),
+        }})
+
+    # Format group, stamped with its hash
+    stamp = format_hash(columns)
+    stamped = [m for m in sheet.get("developerMetadata", []) if m.get("metadataKey") == LAYOUT_KEY]
+    if not stamped or stamped[0].get("metadataValue") != stamp:
+        requests.extend(format_requests(sheet_id, columns))
+        if stamped:
+            requests.append({"updateDeveloperMetadata": {
+                "dataFilters": [{"developerMetadataLookup": {"metadataKey": LAYOUT_KEY,
+                                                             "metadataLocation": {"sheetId": sheet_id}}}],
+                "developerMetadata": {"metadataValue": stamp},
+                "fields": "metadataValue",
+            }})
+        else:
+            requests.append({"createDeveloperMetadata": {"developerMetadata": {
+                "metadataKey": LAYOUT_KEY, "metadataValue": stamp,
+                "location": {"sheetId": sheet_id}, "visibility": "DOCUMENT",
+            }}})
+
+    # Conditional formats: ours must be exactly the desired rules, in order. Otherwise drop every
+    # managed rule (duplicates from earlier runs included) and add the desired ones back on top
+    existing = sheet.get("conditionalFormats", [])
+    desired = conditional_formats(sheet_id, columns)
+    ours = managed_formulas(columns)
+    managed = [index for index, rule in enumerate(existing) if _formula(rule) in ours]
+    if [rule_key(existing[i]) for i in managed] != [rule_key(rule) for rule in desired]:
+        requests.extend({"deleteConditionalFormatRule": {"sheetId": sheet_id, "index": index}}
+                        for index in reversed(managed))
+        requests.extend({"addConditionalFormatRule": {"rule": rule, "index": index}}
+                        for index, rule in enumerate(desired))
+
+    # Filter views: keep one matching view per title, drop the rest
+    for view in filter_views(sheet_id, columns):
+        same_title = [v for v in sheet.get("filterViews", []) if v.get("title") == view["title"]]
+        keep = next((v for v in same_title if view_key(v) == view_key(view)), None)
+        requests.extend({"deleteFilterView": {"filterId": v["filterViewId"]}} for v in same_title if v is not keep)
+        if keep is None:
+            requests.append({"addFilterView": {"filter": view}})
+
+    return requests
@@ -0,0 +1,135 @@
+import json
+from datetime import datetime, timezone
+import requests
+import RateLimit
+import Load_Info
+from Assignment import Assignment
+
+# Assignments per course per GraphQL page (Canvas caps connections at 100)
+PAGE_SIZE = 100
+
+ASSIGNMENT_FIELDS = """
+      nodes {
+        _id
+        name
+        dueAt
+        updatedAt
+        htmlUrl
+        submissionsConnection(first: 1) { nodes { state submittedAt gradedAt } }
+      }
+      pageInfo { hasNextPage endCursor }
+"""
+
+# Every course with its term and first page of assignments, in one request
+COURSES_QUERY = """
+query AllCourses($first: Int!) {
+  allCourses {
+    _id
+    name
+    state
+    term { _id name startAt endAt }
+    assignmentsConnection(first: $first) {%s    }
+  }
+}
+""" % ASSIGNMENT_FIELDS
+
+
+# Follow-up pages for every course that still has some, batched into one request with aliases
+def next_pages_query(cursors: dict[str, str], first: int = PAGE_SIZE) -> str:
+    selections = "".join(
+        f'  c{course_id}: course(id: "{course_id}") {{\n'
+        f'    assignmentsConnection(first: {first}, after: {json.dumps(cursor)}) {{{ASSIGNMENT_FIELDS}    }}\n'
+        f'  }}\n'
+        for course_id, cursor in cursors.items()
+    )
+    return "query NextPages {\n" + selections + "}\n"
+
+
+def post(session: requests.Session, canvas_url: str, canvas_token: str, query: str, variables: dict = None) -> dict:
+    response = RateLimit.request(
+        session, "POST", f"https://{canvas_url}/api/graphql",
+        headers={"Authorization": f"Bearer {canvas_token}", "Content-Type": "application/json"},
+        json={"query": query, "variables": variables or {}},
+    )
+    response.raise_for_status()
+
+    body = response.json()
+    if body.get("errors"):
+        raise ValueError(f"Canvas GraphQL errors: {body['errors']}")
+    return body["data"]
+
+
+# GraphQL timestamps carry the account's offset; REST returns UTC with a Z
+def utc(stamp: str | None) -> str | None:
+    if not stamp:
+        return stamp
+    return datetime.fromisoformat(stamp.replace("Z", "+00:00")).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# GraphQL assignment node → the REST assignment shape normalize_assignment expects
+def rest_shape(node: dict) -> dict:
+    submissions = (node.get("submissionsConnection") or {}).get("nodes") or []
+    submission = submissions[0] if submissions else {}
+    return {
+        "id": int(node["_id"]),
+        "name": node["name"],
+        "due_at": utc(node.get("dueAt")),
+        "updated_at": utc(node.get("updatedAt")),
+        "html_url": node["htmlUrl"],
+        "submission": {
+            "workflow_state": submission.get("state", "unsubmitted"),
+            "submitted_at": utc(submission.get("submittedAt")),
+            "graded_at": utc(submission.get("gradedAt")),
+        },
+    }
+
+
+# Same courses REST's enrollment_state=active returns: filtered on the course's state only. A course
+# stays listed after its term ends, so Archive.finished_courses gives both backends the same grace period
+def active(course: dict) -> bool:
+    return course.get("state") == "available"
+
+
+# GraphQL course → the REST course shape (with include[]=term)
+def rest_course(course: dict) -> dict:
+    term = course.get("term") or {}
+    return {
+        "id": int(course["_id"]),
+        "name": course["name"],
+        "term": {"id": int(term["_id"]), "name": term.get("name"),
+                 "start_at": utc(term.get("startAt")), "end_at": utc(term.get("endAt"))} if term else None,
+    }
+
+
+# Returns (courses as Load_Info.get_course_info would, assignments) with the same normalized records
+# as the REST backend. One request for every course's first page, then one request per round of further pages
+def get_courses_and_assignments(canvas_url: str, canvas_token: str,
+                                session: requests.Session = None) -> tuple[list[dict], list[Assignment]]:
+
+    session = session or Load_Info.build_session()
+
+    data = post(session, canvas_url, canvas_token, COURSES_QUERY, {"first": PAGE_SIZE})
+    courses = [course for course in data["allCourses"] if active(course)]
+
+    names = {course["_id"]: course["name"] for course in courses}
+    nodes = {course["_id"]: list(course["assignmentsConnection"]["nodes"]) for course in courses}
+    cursors = {course["_id"]: course["assignmentsConnection"]["pageInfo"]["endCursor"] for course in courses
+               if course["assignmentsConnection"]["pageInfo"]["hasNextPage"]}
+
+    while cursors:
+        data = post(session, canvas_url, canvas_token, next_pages_query(cursors))
+        next_cursors = {}
+        for course_id in cursors:
+            connection = data[f"c{course_id}"]["assignmentsConnection"]
+            nodes[course_id].extend(connection["nodes"])
+            if connection["pageInfo"]["hasNextPage"]:
+                next_cursors[course_id] = connection["pageInfo"]["endCursor"]
+        cursors = next_cursors
+
+    assignments = [
+        Load_Info.normalize_assignment(names[course_id], int(course_id), rest_shape(node))
+        for course_id in names
+        for node in sorted(nodes[course_id], key=lambda n: (utc(n.get("dueAt")) is None, utc(n.get("dueAt")) or ''))
+    ]
+
+    return [rest_course(course) for course in courses], assignments
@@ -1,6 +1,15 @@
 import requests
+import hashlib
 import os
+import json
+import queue
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+import RateLimit
+from Assignment import Assignment
 
 load_dotenv()
 
@@ -10,55 +19,357 @@ CANVAS_URL = os.getenv("CANVAS_URL")
 # User's Canvas' Access Token
 CANVAS_TOKEN = os.getenv("CANVAS_TOKEN")
 
+# Max courses fetched at the same time
+MAX_WORKERS = 8
+
+# "rest" (one call per course page) or "graphql" (all courses per call, see Load_GraphQL)
+FETCH_BACKEND = os.getenv("FETCH_BACKEND", "rest")
+
+# Pages buffered between the fetch threads and a streaming consumer
+STREAM_BUFFER = 16
+
+# Per-course ETag/Last-Modified validators and updated_at watermarks, one section per tenant
+SYNC_CACHE = os.getenv("SYNC_CACHE", ".canvas_sync_cache.json")
+
+# Seconds between full fetches. Incremental runs don't see rows removed from the sheet by hand
+# or course renames (neither bumps an assignment's updated_at); a full fetch puts them right
+FULL_SYNC_INTERVAL = int(os.getenv("FULL_SYNC_INTERVAL", "86400"))
+
+_CACHE_LOCK = threading.Lock()
+
+
+# Creates a pooled HTTP session shared by every Canvas request
+def build_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Yields each page of a Canvas list endpoint as it arrives, following Link: rel="next"
+def iter_pages(session: requests.Session, url: str, canvas_token: str):
+
+    while url:
+        response = RateLimit.request(
+        session, "GET", url,
+        headers={"Authorization":f"Bearer {canvas_token}","Accept":"*/*"},
+        )
+        response.raise_for_status()
+
+        yield response.json()
+
+        url = response.links.get("next", {}).get("url")
+
+
+# Returns every item of a Canvas list endpoint
+def get_paginated(session: requests.Session, url: str, canvas_token: str) -> list[dict]:
+
+    items = []
+
+    for page in iter_pages(session, url, canvas_token):
+        items.extend(page)
+
+    return items
+
+
+# Loads the incremental sync cache, empty on first run
+def load_sync_cache(path: str = SYNC_CACHE) -> dict:
+    if not os.path.exists(path):
+        return {"tenants": {}}
+    with open(path, "r") as f:
+        return {"tenants": json.load(f).get("tenants", {})}
+
+def save_sync_cache(cache: dict, path: str = SYNC_CACHE):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+# Cache section key: Canvas host, the token (hashed) and the sheet being synced. Submission state
+# differs per user, and watermarks only say what that one sheet has already been given
+def cache_key(canvas_url: str, canvas_token: str, target: str = '') -> str:
+    token = hashlib.blake2b(canvas_token.encode(), digest_size=8).hexdigest()
+    return f"{canvas_url}|{token}|{target}"
+
+
+def load_tenant_cache(canvas_url: str, canvas_token: str, target: str = '', path: str = SYNC_CACHE) -> dict:
+    return load_sync_cache(path)["tenants"].get(cache_key(canvas_url, canvas_token, target),
+                                                {"courses_list": {}, "courses": {}})
+
+
+# Stores one tenant's section; the file is re-read under a lock so tenants synced side by side keep theirs
+def save_tenant_cache(entry: dict, canvas_url: str, canvas_token: str, target: str = '', path: str = SYNC_CACHE):
+    with _CACHE_LOCK:
+        cache = load_sync_cache(path)
+        cache["tenants"][cache_key(canvas_url, canvas_token, target)] = entry
+        save_sync_cache(cache, path)
+
+
+# Like get_paginated, but sends the validators stored in entry on the first page.
+# Returns None on 304 Not Modified, otherwise every item; entry gets the new validators
+def get_conditional(session: requests.Session, url: str, canvas_token: str, entry: dict) -> list[dict] | None:
+
+    headers = {"Authorization":f"Bearer {canvas_token}","Accept":"*/*"}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = RateLimit.request(session, "GET", url, headers=headers)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+
+    entry["etag"] = response.headers.get("ETag")
+    entry["last_modified"] = response.headers.get("Last-Modified")
+
+    items = response.json()
+    next_url = response.links.get("next", {}).get("url")
+    if next_url:
+        # The first page's validators say nothing about later pages, so multi-page lists are always refetched
+        entry["etag"] = entry["last_modified"] = None
+        items.extend(get_paginated(session, next_url, canvas_token))
+
+    return items
+
+
+# Returns User's Active courses as Canvas returns them, term included
+def get_course_info(canvas_url: str, canvas_token: str, session: requests.Session = None, cache: dict = None) -> list[dict]:
+
+    session = session or build_session()
+    url = f"https://{canvas_url}/api/v1/courses?enrollment_state=active&include[]=term&per_page=100"
+
+    if cache is None:
+        courses = get_paginated(session, url, canvas_token)
+    else:
+        entry = cache.setdefault("courses_list", {})
+        courses = get_conditional(session, url, canvas_token, entry)
+        if courses is None:
+            courses = entry["body"]
+        entry["body"] = courses
+
+    return courses
+
 
 # Returns User's Active course ids
-def get_courses(canvas_url: str, canvas_token: str) -> dict:
+def get_courses(canvas_url: str, canvas_token: str, session: requests.Session = None, cache: dict = None) -> dict:
 
-    courses = requests.get(
-    f"https://{canvas_url}/api/v1/courses?enrollment_state=active&include[]=term",
-    headers={"Authorization":f"Bearer {canvas_token}","Accept":"*/*"},
-    ).json()
+    courses = get_course_info(canvas_url, canvas_token, session, cache)
 
     courses_info = {course["name"]:course['id'] for course in courses}
 
     return courses_info
 
 
-def get_assignments(canvas_url: str, courses: list[int], canvas_token: str) -> dict:
+# Canvas due_at (UTC ISO) → local time string the sheet parses as a DATE_TIME
+def local_due_date(due_at: str | None) -> str:
+    if not due_at:
+        return ''
+    return datetime.fromisoformat(due_at.replace("Z", "+00:00")).astimezone().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Canvas assignment JSON → Assignment record (content_hash filled in)
+def normalize_assignment(course_name: str, course_id: int, info: dict) -> Assignment:
+
+    return Assignment(
+        course_name=course_name,
+        assignment_name=info['name'],
+        due_date=local_due_date(info['due_at']),
+        submitted='Yes' if info['submission']['workflow_state'] in ['graded', 'submitted', 'pending_review'] else 'No',
+        link=info['html_url'],
+        sync_id=f"canvas:{course_id}:{info['id']}",
+        source='canvas',
+        due_date_utc=info['due_at'] or '',
+        updated_at=info['updated_at'] or '',
+        ).hashed()
+
+
+# Latest change to an assignment or to the user's submission of it.
+# Submitting or grading does not bump the assignment's own updated_at
+def changed_at(info: dict) -> str:
+    submission = info.get('submission') or {}
+    stamps = [info.get('updated_at'), submission.get('submitted_at'), submission.get('graded_at')]
+    return max((s for s in stamps if s), default='')
+
+
+# Returns one course's normalized assignments, across every page
+def get_course_assignments(canvas_url: str, course_name: str, course_id: int, canvas_token: str,
+                           session: requests.Session) -> list[Assignment]:
+
+    assigments_info = get_paginated(
+    session,
+    f"https://{canvas_url}/api/v1/courses/{course_id}/assignments?include[]=submission&order_by=due_at&per_page=100",
+    canvas_token,
+    )
+
+    return [normalize_assignment(course_name, course_id, info) for info in assigments_info]
+
+
+# Returns one normalized assignment, or None once Canvas no longer has it (deleted)
+def get_assignment(canvas_url: str, course_name: str, course_id: int, assignment_id: int, canvas_token: str,
+                   session: requests.Session) -> Assignment | None:
+
+    response = RateLimit.request(
+    session, "GET",
+    f"https://{canvas_url}/api/v1/courses/{course_id}/assignments/{assignment_id}?include[]=submission",
+    headers={"Authorization":f"Bearer {canvas_token}","Accept":"*/*"},
+    )
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+
+    return normalize_assignment(course_name, course_id, response.json())
+
+
+# Fetches courses concurrently on one pooled session; results keep the courses' order
+def get_assignments(canvas_url: str, courses: dict, canvas_token: str,
+                    session: requests.Session = None, max_workers: int = MAX_WORKERS) -> list[Assignment]:
+
+    session = session or build_session(max_workers)
 
     assignments = []
 
-    for course_name, course_id in courses.items():
-        
-        assigments_info = requests.get(
-        f"https://{canvas_url}/api/v1/courses/{course_id}/assignments?include[]=submission&order_by=due_at&per_page=100",
-        headers={"Authorization":f"Bearer {canvas_token}","Accept":"*/*"},
-        ).json()
-
-        
-        for info in assigments_info:
-
-
-            # Visible Columns[course_name, assignment_name, due_date, days_left, priority, status, submitted, notes, link,
-            # Hidden Hidden: .sync_id, .source, .due_date_utc, .content_hash, .created_at, .updated_at, .last_synced]
-            assignment = {
-                "course_name":course_name,
-                "assignment":info['name'],
-                "submitted": 'Yes' if info['submission']['workflow_state'] in ['graded', 'submitted', 'pending_review'] else 'No',
-                "link":info['html_url'],
-                "sync_id":f'canvas:{course_id}:{info['id']}', 
-                "source":'canvas',
-                "due_date_utc":info['due_at'],
-                "updated_at":info['updated_at']
-                }
-            
-            assignments.append(assignment)
-    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(get_course_assignments, canvas_url, course_name, course_id, canvas_token, session)
+            for course_name, course_id in courses.items()
+        ]
+
+        for future in futures:
+            assignments.extend(future.result())
+
     return assignments
-        
+
+
+# Courses (as get_course_info returns them) and all their assignments from the chosen backend;
+# both backends return identical records
+def fetch_assignments(canvas_url: str, canvas_token: str, session: requests.Session = None,
+                      max_workers: int = MAX_WORKERS, backend: str = FETCH_BACKEND) -> tuple[list[dict], list[Assignment]]:
+
+    if backend == "graphql":
+        import Load_GraphQL
+        return Load_GraphQL.get_courses_and_assignments(canvas_url, canvas_token, session)
+
+    if backend != "rest":
+        raise ValueError(f"Unknown fetch backend '{backend}'")
+
+    session = session or build_session(max_workers)
+    course_info = get_course_info(canvas_url, canvas_token, session)
+    courses = {course["name"]:course['id'] for course in course_info}
+    return course_info, get_assignments(canvas_url, courses, canvas_token, session, max_workers)
+
+
+# Streaming get_assignments: yields normalized assignments page by page, in arrival order,
+# while courses are still being fetched. The page buffer is bounded, so memory stays flat
+# however many assignments there are and slow consumers hold the fetchers back
+def iter_assignments(canvas_url: str, courses: dict, canvas_token: str,
+                     session: requests.Session = None, max_workers: int = MAX_WORKERS,
+                     buffer: int = STREAM_BUFFER):
+
+    session = session or build_session(max_workers)
+    pages = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def fetch(course_name, course_id):
+        try:
+            for page in iter_pages(
+                session,
+                f"https://{canvas_url}/api/v1/courses/{course_id}/assignments?include[]=submission&order_by=due_at&per_page=100",
+                canvas_token,
+            ):
+                if stop.is_set():
+                    return
+                put([normalize_assignment(course_name, course_id, info) for info in page])
+        except Exception as error:
+            put(error)
+        finally:
+            put(done)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for course_name, course_id in courses.items():
+            pool.submit(fetch, course_name, course_id)
+
+        try:
+            remaining = len(courses)
+            while remaining:
+                item = pages.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            stop.set()
+
+
+# Returns only assignments changed since the course's watermark, and the sync_ids of every assignment
+# the course has (None when the list is unchanged). Unchanged courses cost one 304; the cache entry is updated in place
+def get_changed_course_assignments(canvas_url: str, course_name: str, course_id: int, canvas_token: str,
+                                   session: requests.Session, entry: dict) -> tuple[list[Assignment], set[str] | None]:
+
+    assigments_info = get_conditional(
+    session,
+    f"https://{canvas_url}/api/v1/courses/{course_id}/assignments?include[]=submission&order_by=due_at&per_page=100",
+    canvas_token,
+    entry,
+    )
+
+    if assigments_info is None:
+        return [], None
+
+    # Assignments copied or imported into a course keep their old updated_at, so ids past the
+    # highest one seen (Canvas ids only grow) count as changed too
+    watermark, max_id = entry.get("watermark", ""), entry.get("max_id", -1)
+    changed = [info for info in assigments_info if changed_at(info) > watermark or info["id"] > max_id]
+
+    entry["watermark"] = max([watermark] + [changed_at(info) for info in changed])
+    entry["max_id"] = max([max_id] + [info["id"] for info in assigments_info])
+
+    listed = {f"canvas:{course_id}:{info['id']}" for info in assigments_info}
+    return [normalize_assignment(course_name, course_id, info) for info in changed], listed
+
+
+# Incremental get_assignments over a tenant's cache section (see load_tenant_cache): only changed
+# assignments, plus {course_id: sync_ids or None} from get_changed_course_assignments.
+# The section is updated in memory only; save it once the writes built from these have landed
+def get_changed_assignments(canvas_url: str, courses: dict, canvas_token: str, cache: dict,
+                            session: requests.Session = None,
+                            max_workers: int = MAX_WORKERS) -> tuple[list[Assignment], dict[int, set[str] | None]]:
+
+    session = session or build_session(max_workers)
+    entries = cache.setdefault("courses", {})
+
+    assignments, listed = [], {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            course_id: pool.submit(get_changed_course_assignments, canvas_url, course_name, course_id, canvas_token,
+                                   session, entries.setdefault(str(course_id), {}))
+            for course_name, course_id in courses.items()
+        }
+
+        for course_id, future in futures.items():
+            changed, listed[course_id] = future.result()
+            assignments.extend(changed)
+
+    return assignments, listed
+
 
 if __name__ == "__main__":
-    courses = get_courses(CANVAS_URL, CANVAS_TOKEN)
+    session = build_session()
+    courses = get_courses(CANVAS_URL, CANVAS_TOKEN, session)
 
     print(courses)
-    print(get_assignments(CANVAS_URL, courses, CANVAS_TOKEN))
+    print(get_assignments(CANVAS_URL, courses, CANVAS_TOKEN, session))
@@ -0,0 +1,163 @@
+import json
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Latency histogram bucket bounds, seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Prometheus-style cumulative buckets
+    def cumulative(self) -> list[tuple[str, int]]:
+        total, out = 0, []
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            out.append((str(bound), total))
+        return out
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": dict(self.cumulative())}
+
+
+# Everything one run measured: per-endpoint call counts and latency, bytes, retries,
+# errors, last remaining quota per API and time spent in each pipeline stage
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.latency = {}
+            self.calls = {}
+            self.bytes = {}
+            self.retries = {}
+            self.errors = {}
+            self.quota = {}
+            self.stages = {}
+
+    # One HTTP round trip; status is the HTTP status code
+    def call(self, api: str, endpoint: str, status: int, seconds: float, size: int = 0):
+        key = (api, endpoint)
+        with self.lock:
+            self.latency.setdefault(key, Histogram()).observe(seconds)
+            self.calls[key + (str(status),)] = self.calls.get(key + (str(status),), 0) + 1
+            self.bytes[key] = self.bytes.get(key, 0) + size
+
+    def retry(self, api: str, endpoint: str):
+        with self.lock:
+            self.retries[(api, endpoint)] = self.retries.get((api, endpoint), 0) + 1
+
+    def error(self, api: str, endpoint: str):
+        with self.lock:
+            self.errors[(api, endpoint)] = self.errors.get((api, endpoint), 0) + 1
+
+    def remaining_quota(self, api: str, remaining: float):
+        with self.lock:
+            self.quota[api] = remaining
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stages.setdefault(name, Histogram()).observe(time.perf_counter() - started)
+
+    def report(self) -> dict:
+        with self.lock:
+            return {
+                "started": self.started,
+                "elapsed": round(time.time() - self.started, 3),
+                "calls": [{"api": a, "endpoint": e, "status": s, "count": n} for (a, e, s), n in sorted(self.calls.items())],
+                "latency": [dict(api=a, endpoint=e, **h.as_dict()) for (a, e), h in sorted(self.latency.items())],
+                "bytes": [{"api": a, "endpoint": e, "bytes": n} for (a, e), n in sorted(self.bytes.items())],
+                "retries": [{"api": a, "endpoint": e, "count": n} for (a, e), n in sorted(self.retries.items())],
+                "errors": [{"api": a, "endpoint": e, "count": n} for (a, e), n in sorted(self.errors.items())],
+                "remaining_quota": dict(self.quota),
+                "stages": {name: h.as_dict() for name, h in self.stages.items()},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    # Prometheus text exposition format
+    def to_prometheus(self) -> str:
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP canvas_sync_{name} {help_text}")
+            lines.append(f"# TYPE canvas_sync_{name} {kind}")
+
+        def labels(**values):
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in values.items()) + "}"
+
+        with self.lock:
+            metric("requests_total", "counter", "API requests by endpoint and HTTP status")
+            for (api, endpoint, status), n in sorted(self.calls.items()):
+                lines.append(f"canvas_sync_requests_total{labels(api=api, endpoint=endpoint, status=status)} {n}")
+
+            metric("request_seconds", "histogram", "API request latency")
+            for (api, endpoint), h in sorted(self.latency.items()):
+                for bound, count in h.cumulative():
+                    lines.append(f"canvas_sync_request_seconds_bucket{labels(api=api, endpoint=endpoint, le=bound)} {count}")
+                lines.append(f"canvas_sync_request_seconds_sum{labels(api=api, endpoint=endpoint)} {h.sum}")
+                lines.append(f"canvas_sync_request_seconds_count{labels(api=api, endpoint=endpoint)} {h.count}")
+
+            metric("response_bytes_total", "counter", "Bytes transferred by endpoint")
+            for (api, endpoint), n in sorted(self.bytes.items()):
+                lines.append(f"canvas_sync_response_bytes_total{labels(api=api, endpoint=endpoint)} {n}")
+
+            metric("retries_total", "counter", "Throttled or failed requests that were retried")
+            for (api, endpoint), n in sorted(self.retries.items()):
+                lines.append(f"canvas_sync_retries_total{labels(api=api, endpoint=endpoint)} {n}")
+
+            metric("errors_total", "counter", "Requests that failed for good")
+            for (api, endpoint), n in sorted(self.errors.items()):
+                lines.append(f"canvas_sync_errors_total{labels(api=api, endpoint=endpoint)} {n}")
+
+            metric("remaining_quota", "gauge", "Last remaining quota reported by the API")
+            for api, remaining in sorted(self.quota.items()):
+                lines.append(f"canvas_sync_remaining_quota{labels(api=api)} {remaining}")
+
+            metric("stage_seconds", "histogram", "Time per pipeline stage")
+            for name, h in sorted(self.stages.items()):
+                for bound, count in h.cumulative():
+                    lines.append(f"canvas_sync_stage_seconds_bucket{labels(stage=name, le=bound)} {count}")
+                lines.append(f"canvas_sync_stage_seconds_sum{labels(stage=name)} {h.sum}")
+                lines.append(f"canvas_sync_stage_seconds_count{labels(stage=name)} {h.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Canvas URL path → endpoint label with ids folded, /api/v1/courses/123/assignments → /api/v1/courses/:id/assignments
+def canvas_endpoint(path: str) -> str:
+    return re.sub(r"/\d+(?=/|$)", "/:id", path)
+
+
+# Process-wide recorder every wrapped call reports to
+METRICS = Recorder()
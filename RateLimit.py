@@ -0,0 +1,234 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.errors import HttpError
+from Metrics import METRICS, canvas_endpoint
+
+# Requests/second and burst per API; Sheets allows 60 writes/min per user, Canvas throttles on its own bucket
+CANVAS_RATE = float(os.getenv("CANVAS_RATE", "10"))
+CANVAS_BURST = int(os.getenv("CANVAS_BURST", "20"))
+SHEETS_RATE = float(os.getenv("SHEETS_RATE", "1"))
+SHEETS_BURST = int(os.getenv("SHEETS_BURST", "10"))
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))
+
+MAX_RETRIES = 6
+BACKOFF_BASE = 0.5 # seconds
+BACKOFF_CAP = 32.0
+
+# Canvas' X-Rate-Limit-Remaining starts around 700; below these, concurrency shrinks
+CANVAS_REMAINING_LOW = 100.0
+CANVAS_REMAINING_HIGH = 400.0
+
+
+class RateLimited(Exception):
+    pass
+
+
+# Classic token bucket; acquire() blocks until a token is free
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Token bucket plus a concurrency limit that shrinks on throttling and grows back on success (AIMD)
+class Limiter:
+    def __init__(self, name: str, rate: float, burst: int, max_concurrency: int = MAX_CONCURRENCY):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            with self.cond:
+                self.active -= 1
+                self.cond.notify_all()
+
+    def throttled(self):
+        with self.cond:
+            self.limit = max(1, self.limit // 2)
+
+    def succeeded(self):
+        with self.cond:
+            if self.limit < self.max_concurrency:
+                self.limit += 1
+                self.cond.notify_all()
+
+    # Follows a remaining-quota header: scale concurrency with how much quota is left
+    def remaining(self, remaining: float, low: float, high: float):
+        with self.cond:
+            if remaining <= low:
+                self.limit = 1
+            elif remaining < high:
+                share = (remaining - low) / (high - low)
+                self.limit = max(1, min(self.limit, round(self.max_concurrency * share)))
+            self.cond.notify_all()
+
+
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+# One shared limiter per API host ("sheets" for all Google calls)
+def get_limiter(name: str) -> Limiter:
+    with _LIMITERS_LOCK:
+        if name not in _LIMITERS:
+            if name == "sheets":
+                _LIMITERS[name] = Limiter(name, SHEETS_RATE, SHEETS_BURST)
+            else:
+                _LIMITERS[name] = Limiter(name, CANVAS_RATE, CANVAS_BURST)
+        return _LIMITERS[name]
+
+
+# Exponential backoff with full jitter, or the server's Retry-After when it sends one
+def backoff(attempt: int, retry_after=None) -> float:
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+# Canvas answers throttling with 403 "Rate Limit Exceeded" as well as 429
+def _canvas_throttled(response) -> bool:
+    return response.status_code == 429 or (response.status_code == 403 and "Rate Limit Exceeded" in response.text)
+
+
+# Rate-limited, retried Canvas request on a shared session
+def request(session, method: str, url: str, **kwargs):
+
+    host = urlparse(url).netloc
+    limiter = get_limiter(host)
+    endpoint = f"{method} {canvas_endpoint(urlparse(url).path)}"
+
+    for attempt in range(MAX_RETRIES + 1):
+        with limiter.slot():
+            started = time.perf_counter()
+            response = session.request(method, url, **kwargs)
+            METRICS.call("canvas", endpoint, response.status_code, time.perf_counter() - started, len(response.content))
+
+        remaining = response.headers.get("X-Rate-Limit-Remaining")
+        if remaining is not None:
+            limiter.remaining(float(remaining), CANVAS_REMAINING_LOW, CANVAS_REMAINING_HIGH)
+            METRICS.remaining_quota(f"canvas:{host}", float(remaining))
+
+        if _canvas_throttled(response) or response.status_code >= 500:
+            limiter.throttled()
+            if attempt == MAX_RETRIES:
+                break
+            METRICS.retry("canvas", endpoint)
+            time.sleep(backoff(attempt, response.headers.get("Retry-After")))
+            continue
+
+        limiter.succeeded()
+        return response
+
+    METRICS.error("canvas", endpoint)
+    raise RateLimited(f"{method} {url} still throttled after {MAX_RETRIES} retries ({response.status_code})")
+
+
+# Sheets/Drive quota errors: 429, or 403 with a rate-limit reason
+def _google_throttled(error: HttpError) -> bool:
+    if error.resp.status == 429:
+        return True
+    if error.resp.status == 403:
+        reasons = [d.get("reason", "") for d in (error.error_details or []) if isinstance(d, dict)]
+        return any("RateLimitExceeded" in r or "rateLimitExceeded" in r for r in reasons) or "Quota exceeded" in str(error)
+    return False
+
+
+# Errors the API would give again on a retry: a 4xx that isn't throttling (a range outside the grid, a bad request)
+def rejected(error: HttpError) -> bool:
+    return 400 <= error.resp.status < 500 and not _google_throttled(error)
+
+
+# spreadsheets.batchUpdate requests that change the grid again when applied twice. A 5xx can come back
+# after the server committed the batch, so batches holding these are only retried when throttled
+# (rejected before running); otherwise the error goes up and Journal.replay checks what landed
+NON_IDEMPOTENT = ("deleteDimension", "appendDimension", "insertDimension", "moveDimension", "insertRange",
+                  "deleteRange", "addSheet", "duplicateSheet", "deleteSheet", "addConditionalFormatRule",
+                  "deleteConditionalFormatRule", "addFilterView", "createDeveloperMetadata")
+
+
+def _idempotent(google_request) -> bool:
+    if not google_request.methodId.endswith("spreadsheets.batchUpdate") or not google_request.body:
+        return True
+    body = json.loads(google_request.body)
+    return not any(kind in NON_IDEMPOTENT for request in body.get("requests", []) for kind in request)
+
+
+_LOCAL = threading.local()
+
+# httplib2 connections are not thread-safe, so each thread gets its own per credentials
+def thread_http(http):
+    if not isinstance(http, AuthorizedHttp):
+        return http
+    cache = _LOCAL.__dict__.setdefault("http", {})
+    key = id(http.credentials)
+    if key not in cache:
+        cache[key] = AuthorizedHttp(http.credentials, http=httplib2.Http())
+    return cache[key]
+
+
+# Rate-limited, retried googleapiclient request.execute()
+def execute(google_request, limiter_name: str = "sheets"):
+
+    limiter = get_limiter(limiter_name)
+    http = thread_http(google_request.http)
+    endpoint = google_request.methodId
+    sent = len(google_request.body or '')
+    retry_errors = _idempotent(google_request)
+
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with limiter.slot():
+                started = time.perf_counter()
+                try:
+                    result = google_request.execute(http=http)
+                except HttpError as error:
+                    METRICS.call("google", endpoint, error.resp.status, time.perf_counter() - started, sent)
+                    raise
+                METRICS.call("google", endpoint, 200, time.perf_counter() - started, sent + len(json.dumps(result)))
+        except HttpError as error:
+            if not (_google_throttled(error) or (retry_errors and error.resp.status >= 500)) or attempt == MAX_RETRIES:
+                METRICS.error("google", endpoint)
+                raise
+            limiter.throttled()
+            METRICS.retry("google", endpoint)
+            time.sleep(backoff(attempt, error.resp.get("retry-after")))
+            continue
+
+        limiter.succeeded()
+        return result
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing_extensions import TypedDict
+import Load_Info
+import Store
+import Workflow
+from Metrics import METRICS
+
+# Tenants synced at the same time, overall and per Canvas host
+MAX_TENANTS = int(os.getenv("MAX_TENANTS", "16"))
+MAX_TENANTS_PER_HOST = int(os.getenv("MAX_TENANTS_PER_HOST", "4"))
+
+# Concurrent course fetches inside one tenant's sync
+MAX_WORKERS_PER_TENANT = int(os.getenv("MAX_WORKERS_PER_TENANT", "4"))
+
+ROSTER = os.getenv("ROSTER", "roster.json")
+
+# Run report path; .prom for Prometheus text format, anything else for JSON
+METRICS_REPORT = os.getenv("METRICS_REPORT")
+
+
+class Tenant(TypedDict):
+    name: str
+    canvas_url: str
+    canvas_token: str
+    spreadsheet_id: str
+
+
+# Roster file: JSON list of {"name", "canvas_url", "canvas_token", "spreadsheet_id"}
+def load_roster(path: str = ROSTER) -> list[Tenant]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+# Runs many tenants' syncs on one thread pool.
+# Hosts are served round-robin so one big institution can't starve the rest, and every
+# tenant on a host shares that host's pooled session (the host's rate limiter is shared too)
+class Scheduler:
+    def __init__(self, max_tenants: int = MAX_TENANTS, per_host: int = MAX_TENANTS_PER_HOST,
+                 per_tenant: int = MAX_WORKERS_PER_TENANT, sync=Workflow.sync, store=None):
+        self.max_tenants = max_tenants
+        self.per_host = per_host
+        self.per_tenant = per_tenant
+        self.sync = sync
+        self.store = store or Store.Store()
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def session(self, host: str):
+        with self.lock:
+            if host not in self.sessions:
+                self.sessions[host] = Load_Info.build_session(self.per_host * self.per_tenant)
+            return self.sessions[host]
+
+    def run_tenant(self, tenant: Tenant):
+        return self.sync(tenant["canvas_url"], tenant["canvas_token"], tenant["spreadsheet_id"],
+                         session=self.session(tenant["canvas_url"]), max_workers=self.per_tenant, store=self.store)
+
+    # Returns {tenant name: State or the exception that tenant's sync raised}
+    def run(self, tenants: list[Tenant]) -> dict:
+
+        queues = {}
+        for tenant in tenants:
+            queues.setdefault(tenant["canvas_url"], deque()).append(tenant)
+
+        hosts = deque(queues)
+        running = {host: 0 for host in queues}
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_tenants) as pool:
+            futures = {}
+
+            while any(queues.values()) or futures:
+
+                # Hand out free slots one host at a time, skipping hosts at their limit
+                idle = 0
+                while len(futures) < self.max_tenants and idle < len(hosts):
+                    host = hosts[0]
+                    hosts.rotate(-1)
+                    if queues[host] and running[host] < self.per_host:
+                        tenant = queues[host].popleft()
+                        running[host] += 1
+                        futures[pool.submit(self.run_tenant, tenant)] = tenant
+                        idle = 0
+                    else:
+                        idle += 1
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tenant = futures.pop(future)
+                    running[tenant["canvas_url"]] -= 1
+                    error = future.exception()
+                    results[tenant["name"]] = error if error else future.result()
+
+        return results
+
+
+if __name__ == "__main__":
+    for name, result in Scheduler().run(load_roster()).items():
+        print(name, result if isinstance(result, Exception) else result["logs"])
+
+    if METRICS_REPORT:
+        METRICS.write(METRICS_REPORT)
@@ -0,0 +1,70 @@
+import os
+from collections import defaultdict
+import RateLimit
+import Sheets
+import Layout
+from Assignment import Assignment, course_of
+
+# "term" (one tab per Canvas term), "course" (one tab per course) or "none" (everything in Assignments)
+SHARD_BY = os.getenv("SHARD_BY", "term")
+
+DEFAULT_TITLE = "Assignments"
+NO_TERM_TITLE = "No Term"
+
+# Sheets caps tab titles at 100 characters
+MAX_TITLE = 100
+
+# Grid a new shard tab starts with; write_ops grows it as rows arrive
+NEW_TAB_ROWS = 1000
+
+
+# A1 ranges here are built as '<title>'!..., so titles drop single quotes
+def tab_title(name: str) -> str:
+    return (name or NO_TERM_TITLE).replace("'", "’").strip()[:MAX_TITLE]
+
+
+# {course_id: tab title} from get_course_info-shaped courses (term included)
+def course_tabs(course_info: list[dict], shard_by: str = SHARD_BY) -> dict[int, str]:
+    if shard_by == "term":
+        return {course["id"]: tab_title((course.get("term") or {}).get("name")) for course in course_info}
+    if shard_by == "course":
+        return {course["id"]: tab_title(course["name"]) for course in course_info}
+    if shard_by == "none":
+        return {course["id"]: DEFAULT_TITLE for course in course_info}
+    raise ValueError(f"Unknown shard mode '{shard_by}'")
+
+
+# Groups assignments by the tab they belong in
+def route(assignments, tabs: dict[int, str]) -> dict[str, list[Assignment]]:
+    routed = defaultdict(list)
+    for assignment in assignments:
+        routed[tabs.get(course_of(assignment.sync_id), DEFAULT_TITLE)].append(assignment)
+    return dict(routed)
+
+
+# Adds any missing tabs in one batchUpdate, then lays them out (header included) in one more,
+# planned from the addSheet replies so no re-read is needed. Returns the titles that were created
+def ensure_tabs(titles, sheet_service=None, spreadsheet_id=Sheets.SPREADSHEET_ID, columns=Sheets.COLUMNS) -> list[str]:
+    sheet_service = sheet_service or Sheets.get_sheet_service()
+
+    existing = set(Sheets.get_metadata(sheet_service, spreadsheet_id).titles())
+    missing = sorted(set(titles) - existing)
+    if not missing:
+        return []
+
+    response = RateLimit.execute(sheet_service.spreadsheets().batchUpdate(
+        spreadsheetId=spreadsheet_id,
+        body={"requests": [{"addSheet": {"properties": {
+            "title": title,
+            "gridProperties": {"rowCount": NEW_TAB_ROWS, "columnCount": len(columns), "frozenRowCount": 1},
+        }}} for title in missing]}
+    ))
+    Sheets.invalidate_metadata(spreadsheet_id)
+
+    requests = []
+    for reply in response["replies"]:
+        properties = reply["addSheet"]["properties"]
+        requests += Layout.plan({"properties": properties}, properties["title"], columns)
+    Sheets.apply_layout_requests(requests, sheet_service, spreadsheet_id)
+
+    return missing
@@ -2,11 +2,17 @@ import requests
 from dotenv import load_dotenv
 import os
 import json
-from datetime import datetime, date
+import threading
+from functools import lru_cache
+from datetime import datetime, date, timedelta
 from google.oauth2.service_account import Credentials as SA_Credentials
 from google.oauth2.credentials import Credentials as OAuth_Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
+import RateLimit
+import Layout
+from Assignment import Assignment, as_row, column_letter
 
 
 # --- Global Variables ---
@@ -16,17 +22,30 @@ GOOGLE_CREDS = os.getenv("GOOGLE_CREDS") # Rename to path of service account .js
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 GOOGLE_TOKEN = os.getenv("GOOGLE_TOKEN")
 SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
+DISCOVERY_CACHE = os.getenv("DISCOVERY_CACHE") # optional directory of <name>.<version>.json discovery documents
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets',
           'https://www.googleapis.com/auth/drive.file']
 
-COLUMNS = [
-    "course_name", "assignment_name", "due_date", "days_left", "priority", "status", "submitted", "notes", "link",
-    "sync_id", "source", "due_date_utc", "content_hash", "created_at", "updated_at", "last_synced"
-          ]
+# Visible: course_name .. link, Hidden: sync_id .. urgency (see Assignment)
+COLUMNS = list(Assignment._fields)
 
 
 
+# Discovery document for an API: the copy bundled with googleapiclient, unless the operator put
+# one in DISCOVERY_CACHE. Never fetched over the network; parsed once per process
+@lru_cache(maxsize=None)
+def discovery_document(name: str, version: str) -> str:
+    path = os.path.join(DISCOVERY_CACHE, f"{name}.{version}.json") if DISCOVERY_CACHE else None
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            return f.read()
+
+    doc = get_static_doc(name, version)
+    if doc is None:
+        raise ValueError(f"No discovery document for {name} {version}")
+    return doc
+
 # Creates Sheets & Drive Serivces
 def build_services(credentials=GOOGLE_CREDS, scopes=SCOPES, account="SA"):
     if account == "SA":
@@ -34,12 +53,32 @@ def build_services(credentials=GOOGLE_CREDS, scopes=SCOPES, account="SA"):
     elif account == "OAUTH":
         creds = OAuth_Credentials.from_authorized_user_file(credentials, scopes=scopes)
 
-    sheet_service = build("sheets", "v4", credentials=creds)
-    drive_service = build("drive", "v3", credentials=creds)
+    sheet_service = build_from_document(discovery_document("sheets", "v4"), credentials=creds)
+    drive_service = build_from_document(discovery_document("drive", "v3"), credentials=creds)
 
     return sheet_service, drive_service
 
-SHEET_SERVICE, DRIVE_SERVICE = build_services()
+_SERVICES = {}
+_SERVICES_LOCK = threading.Lock()
+
+# Sheets & Drive services built on first use, memoized per (credentials, scopes, account)
+def get_services(credentials=GOOGLE_CREDS, scopes=SCOPES, account="SA"):
+    key = (credentials, tuple(scopes), account)
+    with _SERVICES_LOCK:
+        if key not in _SERVICES:
+            _SERVICES[key] = build_services(credentials, scopes, account)
+        return _SERVICES[key]
+
+def get_sheet_service():
+    return get_services()[0]
+
+# Keeps Sheets.SHEET_SERVICE / Sheets.DRIVE_SERVICE working without building them at import
+def __getattr__(name):
+    if name == "SHEET_SERVICE":
+        return get_services()[0]
+    if name == "DRIVE_SERVICE":
+        return get_services()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Creates new Spreadsheet
@@ -48,14 +87,13 @@ def create_spreadsheet(title: str):
     scopes = ['https://www.googleapis.com/auth/spreadsheets',
             'https://www.googleapis.com/auth/drive']
 
-    sheet_service, drive_service = build_services(credentials=GOOGLE_TOKEN, scopes=scopes, account="OAUTH")
+    sheet_service, drive_service = get_services(credentials=GOOGLE_TOKEN, scopes=scopes, account="OAUTH")
 
     try:
         spreadsheet = {"properties": {"title": title}}
-        spreadsheet = (
+        spreadsheet = RateLimit.execute(
         sheet_service.spreadsheets()
         .create(body=spreadsheet, fields="spreadsheetId")
-        .execute()
         )
 
         spreadsheet_id = spreadsheet.get('spreadsheetId')
@@ -67,10 +105,10 @@ def create_spreadsheet(title: str):
         with open(GOOGLE_CREDS, "r") as f:
             SA_EMAIL = json.load(f)["client_email"]
 
-        drive_service.permissions().create(
+        RateLimit.execute(drive_service.permissions().create(
             fileId=spreadsheet_id,
             body={"type":"user","role":"writer","emailAddress": SA_EMAIL}, 
-            sendNotificationEmail=False).execute()
+            sendNotificationEmail=False))
         
         return spreadsheet_id
     
@@ -88,384 +126,421 @@ def check_spreadsheet_id(title, spreadsheet_id=SPREADSHEET_ID) -> str:
             f.write(f"SPREADSHEET_ID={spreadsheet_id}\n")
     return spreadsheet_id
 
-# Gets sheet id from sheet title
-def get_sheet_id(sheet_service=SHEET_SERVICE, spreadsheet_id=SPREADSHEET_ID, sheet_title=''):
+# Everything the lookups below need, in one spreadsheets().get
+METADATA_FIELDS = "spreadsheetId,sheets(properties(sheetId,title,index,gridProperties(rowCount,columnCount,frozenRowCount)))"
+
+# Snapshot of a spreadsheet's sheet properties; answers id/size lookups locally
+class SpreadsheetMetadata:
+    def __init__(self, response: dict):
+        self.spreadsheet_id = response.get("spreadsheetId")
+        self.sheets = [s["properties"] for s in response.get("sheets", [])]
+        self._by_id = {p["sheetId"]: p for p in self.sheets}
+        self._raw = {s["properties"]["sheetId"]: s for s in response.get("sheets", [])}
+
+    def sheet_id(self, sheet_title='') -> int:
+        if sheet_title == '':
+            return self.sheets[0]['sheetId']
+        for p in self.sheets:
+            if p["title"] == sheet_title:
+                return p["sheetId"]
+        raise ValueError(f"Sheet '{sheet_title}' not found")
+
+    # The whole sheets[] entry, with whatever else the fetch asked for (see Layout.LAYOUT_FIELDS)
+    def sheet(self, sheet_id: int) -> dict:
+        return self._raw[sheet_id]
+
+    def titles(self) -> list[str]:
+        return [p["title"] for p in self.sheets]
+
+    def row_count(self, sheet_id: int) -> int:
+        return self._by_id[sheet_id].get("gridProperties", {}).get("rowCount", 0)
+
+    def column_count(self, sheet_id: int) -> int:
+        return self._by_id[sheet_id].get("gridProperties", {}).get("columnCount", 0)
+
+_METADATA = {}
+_METADATA_LOCK = threading.Lock()
+
+# Cached metadata snapshot; fetched once per spreadsheet until invalidated.
+# fields may ask for more than METADATA_FIELDS (it must include it); the richer snapshot is cached too
+def get_metadata(sheet_service=None, spreadsheet_id=SPREADSHEET_ID, refresh=False, fields=METADATA_FIELDS) -> SpreadsheetMetadata:
+    metadata = None if refresh else _METADATA.get(spreadsheet_id)
+    if metadata is None:
+        sheet_service = sheet_service or get_sheet_service()
+        metadata = SpreadsheetMetadata(RateLimit.execute(sheet_service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields=fields
+        )))
+        with _METADATA_LOCK:
+            _METADATA[spreadsheet_id] = metadata
+    return metadata
 
-    sheet = sheet_service.spreadsheets().get(
-        spreadsheetId=spreadsheet_id,
-        fields="sheets(properties(sheetId,title))"
-    ).execute()
+# Call after any batchUpdate that adds, removes, renames or resizes sheets
+def invalidate_metadata(spreadsheet_id=SPREADSHEET_ID):
+    with _METADATA_LOCK:
+        _METADATA.pop(spreadsheet_id, None)
 
-    if sheet_title == '':
-        return sheet["sheets"][0]['properties']['sheetId']
-     
-    for s in sheet["sheets"]:
-        p = s["properties"]
-        if p["title"] == sheet_title:
-            return p["sheetId"]
-    raise ValueError(f"Sheet '{sheet_title}' not found")
-
-def get_row_count(sheet_id: int, sheets_service=SHEET_SERVICE, spreadsheet_id=SPREADSHEET_ID) -> int:
-    sheet = sheets_service.spreadsheets().get(
-        spreadsheetId=spreadsheet_id,
-        fields="sheets(properties(sheetId,gridProperties(rowCount)))"
-    ).execute()
+# Gets sheet id from sheet title
+def get_sheet_id(sheet_service=None, spreadsheet_id=SPREADSHEET_ID, sheet_title=''):
+    return get_metadata(sheet_service, spreadsheet_id).sheet_id(sheet_title)
 
-    for sheet in sheet["sheets"]:
-        props = sheet["properties"]
-        if props["sheetId"] == sheet_id:
-            return props["gridProperties"].get("rowCount", 0)
+def get_row_count(sheet_id: int, sheets_service=None, spreadsheet_id=SPREADSHEET_ID) -> int:
+    return get_metadata(sheets_service, spreadsheet_id).row_count(sheet_id)
 
-def get_column_count(sheet_id: int, sheet_service=SHEET_SERVICE, spreadsheet_id=SPREADSHEET_ID):
-    sheet = sheet_service.spreadsheets().get(
-        spreadsheetId=spreadsheet_id,
-        fields="sheets(properties(sheetId,gridProperties(columnCount)))"
-    ).execute()
-    
-    for sheet in sheet["sheets"]:
-        props = sheet["properties"]
-        if props["sheetId"] == sheet_id:
-            return props["gridProperties"].get("columnCount", 0)
+def get_column_count(sheet_id: int, sheet_service=None, spreadsheet_id=SPREADSHEET_ID):
+    return get_metadata(sheet_service, spreadsheet_id).column_count(sheet_id)
 
 # TODO Update Conditional Formatting to be for per course
-# TODO Update add sheets to per term
-def intitialize_sheet(spreadsheet_id=SPREADSHEET_ID, sheet_service=SHEET_SERVICE, header=COLUMNS):
+# Brings the Assignments tab (the first tab, renamed, on a new spreadsheet) to Layout.
+# Only what's missing or changed is sent: a sheet that's already set up costs one read and no writes
+def intitialize_sheet(spreadsheet_id=SPREADSHEET_ID, sheet_service=None, header=COLUMNS, sheet_title=Layout.DEFAULT_TITLE):
+    sheet_service = sheet_service or get_sheet_service()
 
     
-    spreadsheet_id = check_spreadsheet_id(spreadsheet_id, "Canvas Assignment Database")
+    spreadsheet_id = check_spreadsheet_id("Canvas Assignment Database", spreadsheet_id)
 
     try:
-        
-        spreadsheet = sheet_service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        
-        sheet_id = get_sheet_id(sheet_service, spreadsheet_id)
-
-        col_count = get_column_count(sheet_service,spreadsheet_id, sheet_id)
-        row_count = get_row_count(sheet_service, spreadsheet_id, sheet_id)
-
-        # Header row text (A1:G1) via Values API
-
-        header = [col.replace("_"," ").title() for col in header[:9]] + header[9:]
-        
-        sheet_service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range="A1:G1",
-            valueInputOption="USER_ENTERED",
-            body={"values": header}
-        ).execute()
-
-        requests = [
-        # Rename first tab → "Assignements"
-        {
-            "updateSheetProperties": {
-                "properties": {"sheetId": sheet_id, "title": "Assignments"},
-                "fields": "title"
-            }
-        },
-
-        # WHOLE SHEET → Century Gothic
-        {
-            "repeatCell": {
-                "range": {"sheetId": sheet_id},
-                "cell": {"userEnteredFormat": {"textFormat": {"fontFamily": "Century Gothic"}}},
-                "fields": "userEnteredFormat.textFormat.fontFamily"
-            }
-        },
-
-        # Freeze Row 1
-        {
-            "updateSheetProperties": {
-                "properties": {"sheetId": sheet_id, "gridProperties": {"frozenRowCount": 1}},
-                "fields": "gridProperties.frozenRowCount"
-            }
-        },
-
-        # Header bold
-        {
-            "repeatCell": {
-                "range": {"sheetId": sheet_id, "startRowIndex": 0, "endRowIndex": 1},
-                "cell": {"userEnteredFormat": {"textFormat": {"bold": True}}},
-                "fields": "userEnteredFormat.textFormat.bold"
-            }
-        },
-
-        # Base column widths A:G = 150 px
-        {
-            "updateDimensionProperties": {
-                "range": {"sheetId": sheet_id, "dimension": "COLUMNS", "startIndex": 0, "endIndex": 7},
-                "properties": {"pixelSize": 150},
-                "fields": "pixelSize"
-            }
-        },
-
-        # Wrap all cells
-        {
-            "repeatCell": {
-                "range": {"sheetId": sheet_id},
-                "cell": {"userEnteredFormat": {"wrapStrategy": "WRAP"}},
-                "fields": "userEnteredFormat.wrapStrategy"
-            }
-        },
-
-        # Center + middle alignment for entire sheet
-        {
-            "repeatCell": {
-                "range": {"sheetId": sheet_id},
-                "cell": {
-                    "userEnteredFormat": {
-                        "horizontalAlignment": "CENTER",
-                        "verticalAlignment": "MIDDLE"
-                    }
-                },
-                "fields": "userEnteredFormat(horizontalAlignment,verticalAlignment)"
-            }
-        },
-
-        # Column C (rows 2+) → DateTime format
-        {
-            "repeatCell": {
-                "range": {"sheetId": sheet_id, "startRowIndex": 1, "startColumnIndex": 2, "endColumnIndex": 3},
-                "cell": {"userEnteredFormat": {"numberFormat": {
-                    "type": "DATE_TIME", "pattern": "m/d/yyyy h:mm AM/PM"}}},
-                "fields": "userEnteredFormat.numberFormat"
-            }
-        },
-
-        # Column D (rows 2+) → Priority dropdown
-        {
-            "setDataValidation": {
-                "range": {"sheetId": sheet_id, "startRowIndex": 1, "startColumnIndex": 3, "endColumnIndex": 4},
-                "rule": {
-                    "condition": {"type": "ONE_OF_LIST", "values": [
-                        {"userEnteredValue": "High"},
-                        {"userEnteredValue": "Medium"},
-                        {"userEnteredValue": "Low"},
-                        {"userEnteredValue": "Optional"},
-                    ]},
-                    "strict": True, "showCustomUi": True
-                }
-            }
-        },
-
-        # Column E (rows 2+) → Status dropdown
-        {
-            "setDataValidation": {
-                "range": {"sheetId": sheet_id, "startRowIndex": 1, "startColumnIndex": 4, "endColumnIndex": 5},
-                "rule": {
-                    "condition": {"type": "ONE_OF_LIST", "values": [
-                        {"userEnteredValue": "Non Started"},
-                        {"userEnteredValue": "Started"},
-                        {"userEnteredValue": "Near Completion"},
-                        {"userEnteredValue": "Completed"},
-                    ]},
-                    "strict": True, "showCustomUi": True
-                }
-            }
-        },
-
-        # Column F (rows 2+) → Yes/No dropdown
-        {
-            "setDataValidation": {
-                "range": {"sheetId": sheet_id, "startRowIndex": 1, "startColumnIndex": 5, "endColumnIndex": 6},
-                "rule": {
-                    "condition": {"type": "ONE_OF_LIST", "values": [
-                        {"userEnteredValue": "Yes"},
-                        {"userEnteredValue": "No"},
-                    ]},
-                    "strict": True, "showCustomUi": True
-                }
-            }
-        },
-
-        # Delete columns H+ (H = index 7)
-        {
-            "deleteDimension": {
-                "range": {"sheetId": sheet_id, "dimension": "COLUMNS",
-                          "startIndex": 7, "endIndex": col_count}
-            }
-        },
-
-        # Column A width = 250 px
-        {
-            "updateDimensionProperties": {
-                "range": {"sheetId": sheet_id, "dimension": "COLUMNS", "startIndex": 0, "endIndex": 1},
-                "properties": {"pixelSize": 250},
-                "fields": "pixelSize"
-            }
-        },
-
-        # Column G width = 300 px
-        {
-            "updateDimensionProperties": {
-                "range": {"sheetId": sheet_id, "dimension": "COLUMNS", "startIndex": 6, "endIndex": 7},
-                "properties": {"pixelSize": 300},
-                "fields": "pixelSize"
-            }
-        },
-
-        # Header background = light blue
-        {
-            "repeatCell": {
-                "range": {"sheetId": sheet_id, "startRowIndex": 0, "endRowIndex": 1},
-                "cell": {"userEnteredFormat": {"backgroundColor": {"red": 0.80, "green": 0.90, "blue": 1.0}}},
-                "fields": "userEnteredFormat.backgroundColor"
-            }
-        },
-
-        # Borders: all borders on header A1:G1
-        {
-            "updateBorders": {
-                "range": {"sheetId": sheet_id, "startRowIndex": 0, "endRowIndex": 1,
-                          "startColumnIndex": 0, "endColumnIndex": 7},
-                "top":    {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "bottom": {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "left":   {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "right":  {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "innerHorizontal": {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "innerVertical":   {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-            }
-        },
-
-        # Borders: outer per-row A2:G(last) (no inner verticals)
-        {
-            "updateBorders": {
-                "range": {"sheetId": sheet_id, "startRowIndex": 1, "endRowIndex": row_count,
-                          "startColumnIndex": 0, "endColumnIndex": 7},
-                "top":    {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "bottom": {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "left":   {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "right":  {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "innerHorizontal": {"style": "SOLID", "width": 1, "color": {"red":0,"green":0,"blue":0}},
-                "innerVertical":   {"style": "NONE"}
-            }
-        },
-
-        # 0–3 days => light red
-            {
-                "addConditionalFormatRule": {
-                    "rule": {
-                        "ranges": [{
-                            "sheetId": sheet_id,
-                            "startRowIndex": 1, "endRowIndex": row_count,
-                            "startColumnIndex": 0, "endColumnIndex": 7
-                        }],
-                        "booleanRule": {
-                            "condition": {
-                                "type": "CUSTOM_FORMULA",
-                                "values": [{"userEnteredValue": "=AND($C2<>\"\", $C2-TODAY()>=0, $C2-TODAY()<=3)"}]
-                            },
-                            "format": {"backgroundColor": {"red": 1.0, "green": 0.85, "blue": 0.85}}
-                        }
-                    },
-                    "index": 0
-                }
-            },
-            # 4–7 days => yellow
-            {
-                "addConditionalFormatRule": {
-                    "rule": {
-                        "ranges": [{
-                            "sheetId": sheet_id,
-                            "startRowIndex": 1, "endRowIndex": row_count,
-                            "startColumnIndex": 0, "endColumnIndex": 7
-                        }],
-                        "booleanRule": {
-                            "condition": {
-                                "type": "CUSTOM_FORMULA",
-                                "values": [{"userEnteredValue": "=AND($C2<>\"\", $C2-TODAY()>3, $C2-TODAY()<=7)"}]
-                            },
-                            "format": {"backgroundColor": {"red": 1.0, "green": 1.0, "blue": 0.6}}
-                        }
-                    },
-                    "index": 1
-                }
-            },
-            # >7 days => green
-            {
-                "addConditionalFormatRule": {
-                    "rule": {
-                        "ranges": [{
-                            "sheetId": sheet_id,
-                            "startRowIndex": 1, "endRowIndex": row_count,
-                            "startColumnIndex": 0, "endColumnIndex": 7
-                        }],
-                        "booleanRule": {
-                            "condition": {
-                                "type": "CUSTOM_FORMULA",
-                                "values": [{"userEnteredValue": "=AND($C2<>\"\", $C2-TODAY()>7)"}]
-                            },
-                            "format": {"backgroundColor": {"red": 0.85, "green": 1.0, "blue": 0.85}}
-                        }
-                    },
-                    "index": 2
-                }
-            },
-            # 15) Add Filter View "Upcoming" on Assignments (Submitted = No; sort by Due Date asc)
-            {
-                "addFilterView": {
-                    "filter": {
-                        "title": "Upcoming",
-                        "range": {
-                            "sheetId": sheet_id,
-                            "startRowIndex": 0,                 # include header
-                            "endRowIndex": row_count,      # future-proof buffer
-                            "startColumnIndex": 0,              # A
-                            "endColumnIndex": col_count                 # G (exclusive)
-                        },
-                        "sortSpecs": [{
-                            "dimensionIndex": 2,                # C = Due Date
-                            "sortOrder": "ASCENDING"
-                        }],
-                        "filterSpecs": [{
-                            "columnIndex": 5,                   # F = Submitted
-                            "filterCriteria": {
-                                "condition": {
-                                    "type": "TEXT_EQ",
-                                    "values": [{"userEnteredValue": "No"}]
-                                }
-                            }
-                        }]
-                    }
-                }
-            }
-
-        ]
-
-        # Execute pre-CF batch
-        sheet_service.spreadsheets().batchUpdate(
-            spreadsheetId=spreadsheet_id,
-            body={"requests": requests}
-        ).execute()
-
-
-        return
+        return apply_layout([sheet_title], sheet_service, spreadsheet_id, header)
 
     except HttpError as error:
         print(f"An error occurred: {error}")
         return error
 
-# TODO Returns sheet
-def read_sheet(sheet_service=SHEET_SERVICE):
-    ...
+# Lays out tabs by title in one read and at most one batchUpdate. A missing DEFAULT_TITLE tab
+# takes over the first tab. Returns the number of requests sent
+def apply_layout(titles, sheet_service=None, spreadsheet_id=SPREADSHEET_ID, columns=COLUMNS) -> int:
+    sheet_service = sheet_service or get_sheet_service()
 
-# TODO adds assignment to sheet, sorts by due date
-def add_row(sheet_service=SHEET_SERVICE):
-    ...
+    metadata = get_metadata(sheet_service, spreadsheet_id, refresh=True, fields=Layout.LAYOUT_FIELDS)
+    existing = metadata.titles()
 
-def update_row(sheet_service=SHEET_SERVICE):
-    ...
+    requests = []
+    for title in titles:
+        sheet_id = metadata.sheet_id('' if title == Layout.DEFAULT_TITLE and title not in existing else title)
+        requests += Layout.plan(metadata.sheet(sheet_id), title, columns)
+
+    return apply_layout_requests(requests, sheet_service, spreadsheet_id)
+
+def apply_layout_requests(requests: list[dict], sheet_service=None, spreadsheet_id=SPREADSHEET_ID) -> int:
+    if requests:
+        RateLimit.execute((sheet_service or get_sheet_service()).spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={"requests": requests}
+        ))
+        invalidate_metadata(spreadsheet_id)
+    return len(requests)
+
+# What change detection needs from a row: identity, the hash, derived-column inputs and the
+# user-edited columns. Leaves out the bulky Canvas text (names, links), which diffs rewrite anyway
+DIFF_FIELDS = ["sync_id", "source", "content_hash", "updated_at", "due_date_utc", "submitted",
+               "days_left", "urgency", "priority", "status", "notes", "created_at"]
+
+# Rows per read call; bounds response size on big sheets
+READ_PAGE_ROWS = 5000
+
+# Columns the sheet formats as dates; read back as serial numbers
+DATE_COLUMNS = {"due_date"}
+SERIAL_EPOCH = datetime(1899, 12, 30)
+
+# Unformatted cell value → the text the rest of the sync compares against (what was written)
+def _cell(value, column: str) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if column in DATE_COLUMNS:
+        return (SERIAL_EPOCH + timedelta(seconds=round(value * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+    if float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+# Date text as written by Load_Info.local_due_date → serial number, the inverse of _cell.
+# Values are written RAW, so dates go in as serials; anything else is left as text
+def _serial(value):
+    try:
+        return (datetime.strptime(value, "%Y-%m-%d %H:%M:%S") - SERIAL_EPOCH).total_seconds() / 86400
+    except (TypeError, ValueError):
+        return value
+
+# Row values as they are sent to the sheet
+def _sheet_row(values, columns) -> list:
+    row = list(values)
+    for col, column in enumerate(columns):
+        if column in DATE_COLUMNS:
+            row[col] = _serial(row[col])
+    return row
+
+# Returns the sheet's data rows as dicts keyed by fields (all COLUMNS by default), plus "row" (1-based sheet row).
+# Only the projected columns are fetched, as adjacent-column ranges in one values.batchGet per
+# page of page_rows rows, unformatted. Paging stops at the grid's end or at the first empty page
+def read_sheet(sheet_service=None, spreadsheet_id=SPREADSHEET_ID, sheet_title="Assignments",
+               columns=COLUMNS, fields=None, page_rows: int = READ_PAGE_ROWS) -> list[dict]:
+    sheet_service = sheet_service or get_sheet_service()
+
+    fields = list(fields or columns)
+    spans = _column_runs(sorted(columns.index(field) for field in fields))
+    row_count = get_row_count(get_sheet_id(sheet_service, spreadsheet_id, sheet_title), sheet_service, spreadsheet_id)
+
+    rows = {}
+    for first in range(2, max(row_count, 2) + 1, page_rows):
+        # The last page is open-ended in case the cached grid size is behind
+        last = first + page_rows - 1 if first + page_rows - 1 < row_count else ''
+        result = RateLimit.execute(sheet_service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f"'{sheet_title}'!{column_letter(start)}{first}:{column_letter(end)}{last}" for start, end in spans],
+            majorDimension="ROWS",
+            valueRenderOption="UNFORMATTED_VALUE",
+            dateTimeRenderOption="SERIAL_NUMBER",
+        ))
+
+        empty = True
+        for (start, end), value_range in zip(spans, result.get("valueRanges", [])):
+            for offset, values in enumerate(value_range.get("values", [])):
+                for col, value in zip(range(start, end + 1), values):
+                    if value == '':
+                        continue
+                    empty = False
+                    rows.setdefault(first + offset, {})[columns[col]] = _cell(value, columns[col])
+        if empty:
+            break
+
+    return [dict({field: '' for field in fields}, **rows[row], row=row) for row in sorted(rows)]
+
+# {sync_id: row} for every synced row, each row holding fields plus "row" (its sheet row)
+def read_index(sheet_service=None, spreadsheet_id=SPREADSHEET_ID, sheet_title="Assignments",
+               columns=COLUMNS, fields=DIFF_FIELDS, page_rows: int = READ_PAGE_ROWS) -> dict[str, dict]:
+    return {row["sync_id"]: row
+            for row in read_sheet(sheet_service, spreadsheet_id, sheet_title, columns, fields, page_rows)
+            if row.get("sync_id")}
+
+# Full rows (all columns, as read_sheet gives them) for the given sheet rows, keyed by row.
+# Adjacent rows share a range; one values.batchGet per MAX_BATCH_REQUESTS ranges
+def read_rows(rows: list[int], sheet_service=None, spreadsheet_id=SPREADSHEET_ID, sheet_title="Assignments",
+              columns=COLUMNS) -> dict[int, dict]:
+    sheet_service = sheet_service or get_sheet_service()
+
+    last_col = column_letter(len(columns) - 1)
+    runs = _row_runs(rows)
+    found = {}
+    for chunk in (runs[i:i + MAX_BATCH_REQUESTS] for i in range(0, len(runs), MAX_BATCH_REQUESTS)):
+        result = RateLimit.execute(sheet_service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f"'{sheet_title}'!A{first}:{last_col}{last}" for first, last in chunk],
+            majorDimension="ROWS",
+            valueRenderOption="UNFORMATTED_VALUE",
+            dateTimeRenderOption="SERIAL_NUMBER",
+        ))
+        for (first, _), value_range in zip(chunk, result.get("valueRanges", [])):
+            for offset, values in enumerate(value_range.get("values", [])):
+                row = dict(zip(columns, ('' for _ in columns)))
+                row.update({col: _cell(value, col) for col, value in zip(columns, values) if value != ''})
+                found[first + offset] = dict(row, row=first + offset)
+    return found
+
+# The sync_id column in row order from row 2 ('' for blank rows), plus the first empty row
+# (column A counts too, so hand-typed rows without a sync_id aren't overwritten).
+# A cheap drift check against Store
+def read_sync_index(sheet_service=None, spreadsheet_id=SPREADSHEET_ID, sheet_title="Assignments",
+                    columns=COLUMNS) -> tuple[list[str], int]:
+    sheet_service = sheet_service or get_sheet_service()
+
+    col = column_letter(columns.index("sync_id"))
+    result = RateLimit.execute(sheet_service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=[f"'{sheet_title}'!A2:A", f"'{sheet_title}'!{col}2:{col}"],
+        majorDimension="COLUMNS",
+    ))
+
+    first, sync_ids = [r.get("values", [[]])[0] for r in result.get("valueRanges", [{}, {}])]
+    return sync_ids, max(len(first), len(sync_ids)) + 2
+
+# Soft limits per write call; the API rejects payloads over ~10MB and slows well before that
+MAX_BATCH_CELLS = 40000
+MAX_BATCH_BYTES = 2_000_000
+MAX_BATCH_REQUESTS = 500
+
+# Splits ops rows into runs of consecutive row numbers
+def _row_runs(rows: list[int]) -> list[tuple[int, int]]:
+    runs = []
+    for row in sorted(rows):
+        if runs and runs[-1][1] == row - 1:
+            runs[-1] = (runs[-1][0], row)
+        else:
+            runs.append((row, row))
+    return runs
+
+# Splits column indices into runs of adjacent columns
+def _column_runs(columns: list[int]) -> list[tuple[int, int]]:
+    return _row_runs(columns)
+
+# Chunks a list of items into lists bounded by cell count, byte size and item count
+def _chunk(items: list, cells, limit_requests=MAX_BATCH_REQUESTS) -> list[list]:
+    chunks, chunk, chunk_cells, chunk_bytes = [], [], 0, 0
+    for item in items:
+        n_cells, n_bytes = cells(item), len(json.dumps(item))
+        if chunk and (chunk_cells + n_cells > MAX_BATCH_CELLS or chunk_bytes + n_bytes > MAX_BATCH_BYTES
+                      or len(chunk) >= limit_requests):
+            chunks.append(chunk)
+            chunk, chunk_cells, chunk_bytes = [], 0, 0
+        chunk.append(item)
+        chunk_cells += n_cells
+        chunk_bytes += n_bytes
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+# Plans the API calls for a list of diff ops (see Diff.diff_assignments).
+# next_row is the first empty sheet row (inserts go there), row_count the sheet's grid size,
+# column_count its width when known (a sheet from before a column was added gets widened).
+# Returns batches in execution order: grid growth, value writes on pre-delete row numbers, then deletes
+def build_write_batches(ops: list[dict], sheet_id: int, sheet_title: str, next_row: int, row_count: int,
+                        columns=COLUMNS, column_count: int = None) -> list[dict]:
+
+    index = {col: i for i, col in enumerate(columns)}
+    last_col = column_letter(len(columns) - 1)
+
+    # Updates: rows that change the same columns and sit next to each other share one range
+    by_span = {}
+    for op in ops:
+        if op["op"] != "update":
+            continue
+        for start, end in _column_runs([index[col] for col in op["values"]]):
+            by_span.setdefault((start, end), {})[op["row"]] = op["values"]
+
+    data = []
+    for (start, end), rows in by_span.items():
+        for first, last in _row_runs(list(rows)):
+            data.append({
+                "range": f"'{sheet_title}'!{column_letter(start)}{first}:{column_letter(end)}{last}",
+                "values": [_sheet_row((rows[row].get(col, '') for col in columns[start:end + 1]), columns[start:end + 1])
+                           for row in range(first, last + 1)],
+            })
+
+    # Inserts: one contiguous block after the last data row
+    inserts = [op["values"] for op in ops if op["op"] == "insert"]
+    if inserts:
+        data.append({
+            "range": f"'{sheet_title}'!A{next_row}:{last_col}{next_row + len(inserts) - 1}",
+            "values": [_sheet_row(as_row(values, columns), columns) for values in inserts],
+        })
+
+    batches = []
+
+    growth = []
+    missing = next_row + len(inserts) - 1 - row_count
+    if missing > 0:
+        growth.append({"appendDimension": {"sheetId": sheet_id, "dimension": "ROWS", "length": missing}})
+    if column_count is not None and column_count < len(columns) and data:
+        growth.append({"appendDimension": {"sheetId": sheet_id, "dimension": "COLUMNS",
+                                           "length": len(columns) - column_count}})
+    if growth:
+        batches.append({"kind": "structure", "requests": growth})
+
+    # Canvas text is written RAW, so a name starting with "=" stays text and "1/2" isn't made a date
+    for chunk in _chunk(data, lambda d: sum(len(v) for v in d["values"])):
+        batches.append({"kind": "values", "input": "RAW", "data": chunk})
+
+    # Deletes: adjacent rows become one range, bottom-up so earlier deletes don't shift later ones
+    deletes = [
+        {"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS",
+                                       "startIndex": first - 1, "endIndex": last}}}
+        for first, last in reversed(_row_runs([op["row"] for op in ops if op["op"] == "delete"]))
+    ]
+    for chunk in _chunk(deletes, lambda r: 1):
+        batches.append({"kind": "structure", "requests": chunk})
+
+    return batches
+
+# Sends planned batches; each batch is one API call
+def execute_batches(batches: list[dict], sheet_service=None, spreadsheet_id=SPREADSHEET_ID):
+    sheet_service = sheet_service or get_sheet_service()
+    for batch in batches:
+        if batch["kind"] == "values":
+            RateLimit.execute(sheet_service.spreadsheets().values().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={"valueInputOption": batch["input"], "data": batch["data"]}
+            ))
+        else:
+            RateLimit.execute(sheet_service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={"requests": batch["requests"]}
+            ))
+            invalidate_metadata(spreadsheet_id)
+
+# Applies diff ops to the sheet in a handful of batched calls
+def write_ops(ops: list[dict], next_row: int, row_count: int, sheet_service=None,
+              spreadsheet_id=SPREADSHEET_ID, sheet_title="Assignments") -> int:
+
+    sheet_id = get_sheet_id(sheet_service, spreadsheet_id, sheet_title)
+    column_count = get_column_count(sheet_id, sheet_service, spreadsheet_id)
+    batches = build_write_batches(ops, sheet_id, sheet_title, next_row, row_count, column_count=column_count)
+    execute_batches(batches, sheet_service, spreadsheet_id)
+
+    return len(batches)
+
+# Ops buffered before a streaming flush
+STREAM_FLUSH_OPS = 1000
+
+# Streaming write_ops: consumes an op stream (e.g. Diff.iter_diff) and flushes every flush_ops
+# inserts/updates, so writes start before the stream ends. Deletes shift rows, so they are held
+# and sent last. Each flush goes through write(ops, next_row, row_count) -> calls (write_ops by
+# default; Workflow.sync_stream journals them). on_flush(ops, next_row) runs after each flush lands.
+# Returns (calls, next_row)
+def write_stream(ops, next_row: int, row_count: int, sheet_service=None, spreadsheet_id=SPREADSHEET_ID,
+                 sheet_title="Assignments", flush_ops: int = STREAM_FLUSH_OPS, on_flush=None,
+                 write=None) -> tuple[int, int]:
+
+    write = write or (lambda chunk, first_row, rows: write_ops(chunk, first_row, rows, sheet_service,
+                                                               spreadsheet_id, sheet_title))
+    calls = 0
+    pending, deletes = [], []
+
+    def flush(chunk):
+        nonlocal calls, next_row, row_count
+        calls += write(chunk, next_row, row_count)
+        if on_flush:
+            on_flush(chunk, next_row)
+        inserted = sum(op["op"] == "insert" for op in chunk)
+        row_count = max(row_count, next_row + inserted - 1)
+        next_row += inserted
+
+    for op in ops:
+        if op["op"] == "delete":
+            deletes.append(op)
+            continue
+        pending.append(op)
+        if len(pending) >= flush_ops:
+            flush(pending)
+            pending = []
+
+    if pending or deletes:
+        flush(pending + deletes)
+
+    return calls, next_row - len(deletes)
+
+# Adds assignments (dicts keyed by COLUMNS) after the last data row
+def add_row(assignments: list[dict], next_row: int, row_count: int, sheet_service=None,
+            spreadsheet_id=SPREADSHEET_ID, sheet_title="Assignments") -> int:
+    ops = [{"op": "insert", "values": assignment} for assignment in assignments]
+    return write_ops(ops, next_row, row_count, sheet_service, spreadsheet_id, sheet_title)
+
+# Overwrites the given columns of existing rows, {row: {column: value}}
+def update_row(updates: dict[int, dict], sheet_service=None,
+               spreadsheet_id=SPREADSHEET_ID, sheet_title="Assignments") -> int:
+    ops = [{"op": "update", "row": row, "values": values} for row, values in updates.items()]
+    return write_ops(ops, 0, 0, sheet_service, spreadsheet_id, sheet_title)
 
 
 if __name__ == '__main__':
     """
-    sheet = SHEET_SERVICE.spreadsheets().get(
+    sheet = get_sheet_service().spreadsheets().get(
         spreadsheetId=SPREADSHEET_ID,
         fields="sheets(properties(sheetId,title))"
     ).execute()
 
     print([s["properties"]["title"] for s in sheet["sheets"]])
 
-    intitialize_sheet(SHEET_SERVICE, spreadsheet_id=SPREADSHEET_ID)
+    intitialize_sheet(spreadsheet_id=SPREADSHEET_ID)
 
     print([s["properties"]["title"] for s in sheet["sheets"]])
     """
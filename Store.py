@@ -0,0 +1,128 @@
+import bisect
+import os
+import sqlite3
+import threading
+from Sheets import COLUMNS
+from Assignment import as_row
+
+# Local mirror of every synced sheet, keyed by sync_id
+SYNC_STORE = os.getenv("SYNC_STORE", ".canvas_sync.db")
+
+
+# Columns the user edits on the sheet. Those edits never reach the mirror, so its copy only
+# holds what the sync last wrote; Workflow.read_sheet_state reads them from the sheet every time
+USER_FIELDS = ("priority", "status", "notes")
+
+
+# SQLite mirror of sheet rows so diffing doesn't need a full-range sheet read.
+# Rows are shaped like Sheets.read_sheet output (COLUMNS plus "row"). The mirror can be trusted for
+# the sync_id column's order (checked by drifted) and for the columns only the sync writes;
+# USER_FIELDS are as last written by the sync, not as the user left them
+class Store:
+    def __init__(self, path: str = SYNC_STORE, columns=COLUMNS):
+        self.columns = columns
+        self.quoted = ", ".join(f'"{col}"' for col in columns)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+
+        column_defs = ", ".join(f'"{col}" TEXT' for col in columns)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS assignments (
+                spreadsheet_id TEXT NOT NULL,
+                sheet_title TEXT NOT NULL,
+                "row" INTEGER NOT NULL,
+                {column_defs},
+                PRIMARY KEY (spreadsheet_id, sheet_title, sync_id)
+            );
+            CREATE INDEX IF NOT EXISTS assignments_row ON assignments (spreadsheet_id, sheet_title, "row");
+        """)
+
+        # Columns added to COLUMNS since the table was created
+        existing = {name for _, name, *_ in self.conn.execute("PRAGMA table_info(assignments)")}
+        for col in columns:
+            if col not in existing:
+                self.conn.execute(f"""ALTER TABLE assignments ADD COLUMN "{col}" TEXT DEFAULT ''""")
+
+    def close(self):
+        self.conn.close()
+
+    def rows(self, spreadsheet_id: str, sheet_title: str) -> list[dict]:
+        with self.lock:
+            cursor = self.conn.execute(
+                f'SELECT "row", {self.quoted} FROM assignments '
+                'WHERE spreadsheet_id = ? AND sheet_title = ? ORDER BY "row"',
+                (spreadsheet_id, sheet_title))
+            return [dict(zip(self.columns, values[1:]), row=values[0]) for values in cursor]
+
+    # Tabs of a spreadsheet that have mirrored rows
+    def sheet_titles(self, spreadsheet_id: str) -> list[str]:
+        with self.lock:
+            return [title for (title,) in self.conn.execute(
+                "SELECT DISTINCT sheet_title FROM assignments WHERE spreadsheet_id = ?", (spreadsheet_id,))]
+
+    # {row: sync_id}, for comparing against the sheet's sync_id column
+    def sync_ids(self, spreadsheet_id: str, sheet_title: str) -> dict[int, str]:
+        with self.lock:
+            return dict(self.conn.execute(
+                'SELECT "row", sync_id FROM assignments WHERE spreadsheet_id = ? AND sheet_title = ?',
+                (spreadsheet_id, sheet_title)))
+
+    # True when the sheet's sync_id column (row order, from row 2) no longer matches the mirror
+    def drifted(self, spreadsheet_id: str, sheet_title: str, sheet_sync_ids: list[str]) -> bool:
+        on_sheet = {offset + 2: sync_id for offset, sync_id in enumerate(sheet_sync_ids) if sync_id}
+        return on_sheet != self.sync_ids(spreadsheet_id, sheet_title)
+
+    def _insert(self, spreadsheet_id: str, sheet_title: str, row: int, values: dict):
+        marks = ", ".join("?" for _ in self.columns)
+        self.conn.execute(
+            f'INSERT OR REPLACE INTO assignments (spreadsheet_id, sheet_title, "row", {self.quoted}) VALUES (?, ?, ?, {marks})',
+            (spreadsheet_id, sheet_title, row, *as_row(values, self.columns)))
+
+    # Replaces the mirror of one sheet with rows from a full read
+    def replace(self, spreadsheet_id: str, sheet_title: str, rows: list[dict]):
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute("DELETE FROM assignments WHERE spreadsheet_id = ? AND sheet_title = ?",
+                                  (spreadsheet_id, sheet_title))
+                for row in rows:
+                    if row.get("sync_id"):
+                        self._insert(spreadsheet_id, sheet_title, row["row"], row)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    # Applies diff ops exactly as Sheets.build_write_batches lays them out:
+    # updates and inserts on the pre-delete row numbers, then deletes shift the rows below up
+    def apply_ops(self, spreadsheet_id: str, sheet_title: str, ops: list[dict], next_row: int):
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                key = (spreadsheet_id, sheet_title)
+                inserted = 0
+                for op in ops:
+                    if op["op"] == "update":
+                        sets = ", ".join(f'"{col}" = ?' for col in op["values"])
+                        self.conn.execute(
+                            f'UPDATE assignments SET {sets} WHERE spreadsheet_id = ? AND sheet_title = ? AND sync_id = ?',
+                            (*op["values"].values(), *key, op["sync_id"]))
+                    elif op["op"] == "insert":
+                        self._insert(*key, next_row + inserted, op["values"])
+                        inserted += 1
+
+                deleted = sorted(op["row"] for op in ops if op["op"] == "delete")
+                if deleted:
+                    self.conn.executemany('DELETE FROM assignments WHERE spreadsheet_id = ? AND sheet_title = ? AND "row" = ?',
+                                          [(*key, row) for row in deleted])
+                    # Each remaining row moves up by the number of deleted rows above it, in one pass
+                    below = self.conn.execute('SELECT sync_id, "row" FROM assignments '
+                                              'WHERE spreadsheet_id = ? AND sheet_title = ? AND "row" > ?',
+                                              (*key, deleted[0])).fetchall()
+                    self.conn.executemany('UPDATE assignments SET "row" = ? WHERE spreadsheet_id = ? AND sheet_title = ? AND sync_id = ?',
+                                          [(row - bisect.bisect_left(deleted, row), *key, sync_id) for sync_id, row in below])
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
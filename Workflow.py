@@ -1,14 +1,405 @@
+import operator
+import time
+from itertools import chain
 import langgraph
+from langgraph.graph import StateGraph, START, END
+from langchain_core.runnables import RunnableConfig
 import Load_Info
 import Sheets
-from typing_extensions import TypedDict
+import Diff
+import Derived
+import Store
+import Shards
+import Journal
+import Archive
+from concurrent.futures import ThreadPoolExecutor
+from Metrics import METRICS
+from Assignment import Assignment
+from typing import Annotated
+from typing_extensions import TypedDict, NotRequired
 
+# logs and ops are appended to by every node that returns them (parallel branches included)
 class State(TypedDict):
-    canvas_assignments: list[dict]
+    canvas_assignments: list[Assignment]
     sheet_assignments: list[dict]
-    logs: list[str]
-    ops: list[dict]
-    
+    next_row: NotRequired[int]
+    course_info: NotRequired[list[dict]]
+    finished: NotRequired[dict[int, str]]
+    # Incremental fetches only: {course_id: sync_ids or None}, and the tenant's cache section to save after the write
+    listed: NotRequired[dict[int, set[str] | None]]
+    cache: NotRequired[dict]
+    logs: Annotated[list[str], operator.add]
+    ops: Annotated[list[dict], operator.add]
 
 
+# Ops needed to bring the sheet in line with Canvas, and a log line (new entries only)
+def diff(state: State, config: RunnableConfig = None) -> dict:
+    if "listed" in state:
+        ops = chain(Diff.iter_diff(state["canvas_assignments"], state["sheet_assignments"], full=False),
+                    Diff.iter_deletes(state["sheet_assignments"], state["listed"]))
+    else:
+        ops = Diff.iter_diff(state["canvas_assignments"], state["sheet_assignments"])
+    ops = list(Derived.derive_ops(ops, state["sheet_assignments"]))
 
+    counts = {kind: sum(op["op"] == kind for op in ops) for kind in ("insert", "update", "delete")}
+    update = {"ops": ops, "logs": [f"diff: {counts['insert']} insert, {counts['update']} update, {counts['delete']} delete"]}
+
+    if "cache" in state:
+        # Watermarks can't bring back rows removed outside the sync (or a wiped store); write leaves the
+        # expected count of Canvas rows in the cache, and a mismatch makes the next run fetch everything
+        on_sheet = sum(row.get("source") == "canvas" for row in state["sheet_assignments"])
+        cache = dict(state["cache"], rows=on_sheet + counts["insert"] - counts["delete"])
+        if state["cache"].get("rows", on_sheet) != on_sheet:
+            cache["full_at"] = 0
+            update["logs"].append("diff: sheet changed outside the sync, next run fetches everything")
+        update["cache"] = cache
+
+    return update
+
+
+# Sheet rows from the local store, and the first empty row. The user-edited columns (Store.USER_FIELDS)
+# always come from one projected sheet read, since the store never sees edits made on the sheet.
+# Falls back to reading the sheet (the Sheets.DIFF_FIELDS columns) when the sync_id column has drifted from the store
+def read_sheet_state(store, spreadsheet_id: str, sheet_title: str, sheet_service=None) -> tuple[list[dict], int]:
+    sync_ids, next_row = Sheets.read_sync_index(sheet_service, spreadsheet_id, sheet_title)
+    if not store.drifted(spreadsheet_id, sheet_title, sync_ids):
+        rows = store.rows(spreadsheet_id, sheet_title)
+        if rows:
+            edited = Sheets.read_index(sheet_service, spreadsheet_id, sheet_title, fields=["sync_id", *Store.USER_FIELDS])
+            for row in rows:
+                on_sheet = edited.get(row["sync_id"], {})
+                row.update({field: on_sheet.get(field, '') for field in Store.USER_FIELDS})
+        return rows, next_row
+
+    rows = list(Sheets.read_index(sheet_service, spreadsheet_id, sheet_title).values())
+    store.replace(spreadsheet_id, sheet_title, rows)
+    return rows, next_row
+
+
+# Finishes writes a crashed run journaled for this spreadsheet; returns their logs ([] if none).
+# A journal that no longer fits the sheet is dropped (see Journal.Stale) and the tab is diffed afresh.
+# With dry_run the unfinished journals are only reported
+def resume(spreadsheet_id: str, sheet_service=None, store=None, dry_run: bool = False) -> list[str]:
+    logs = []
+    for journal in Journal.pending(spreadsheet_id):
+        done = journal.done()
+        if dry_run:
+            logs.append(f"pending: {journal.sheet_title}, {done} of {len(journal.load()['batches'])} batches done")
+            continue
+        try:
+            calls = Journal.replay(journal, sheet_service, store)
+        except Journal.Stale as error:
+            logs.append(f"dropped: {error}")
+            continue
+        logs.append(f"resume: {journal.sheet_title} from batch {done}, {calls} calls")
+    return logs
+
+
+# Whether resume() finished a journal; a run that did returns without fetching
+def replayed(logs: list[str]) -> bool:
+    return any(line.startswith("resume: ") for line in logs)
+
+
+# Graph nodes. Per-run settings come in through config["configurable"] (see sync)
+def fetch_canvas(state: State, config: RunnableConfig) -> dict:
+    c = config["configurable"]
+    if not c["incremental"] or c["backend"] != "rest":
+        course_info, canvas_assignments = Load_Info.fetch_assignments(c["canvas_url"], c["canvas_token"], c["session"],
+                                                                      c["max_workers"], c["backend"])
+        # Assignments of finished terms are left out, so their rows diff as deletes and get archived
+        finished = Archive.finished_courses(course_info)
+        return {"canvas_assignments": Archive.live(canvas_assignments, finished), "course_info": course_info}
+
+    # Incremental: ETags and watermarks from this tenant's cache section; every FULL_SYNC_INTERVAL
+    # they are dropped so everything is fetched. Finished courses aren't fetched at all
+    cache = Load_Info.load_tenant_cache(c["canvas_url"], c["canvas_token"], c["cache_target"], c["cache_path"])
+    if time.time() - cache.get("full_at", 0) >= Load_Info.FULL_SYNC_INTERVAL:
+        cache.update(courses={}, full_at=time.time())
+    course_info = Load_Info.get_course_info(c["canvas_url"], c["canvas_token"], c["session"], cache)
+    finished = Archive.finished_courses(course_info)
+    courses = {course["name"]: course["id"] for course in course_info if course["id"] not in finished}
+    changed, listed = Load_Info.get_changed_assignments(c["canvas_url"], courses, c["canvas_token"], cache,
+                                                        c["session"], c["max_workers"])
+    return {"canvas_assignments": changed, "course_info": course_info, "listed": listed, "cache": cache}
+
+
+def read_sheet(state: State, config: RunnableConfig) -> dict:
+    c = config["configurable"]
+    sheet_assignments, next_row = read_sheet_state(c["store"], c["spreadsheet_id"], c["sheet_title"], c["sheet_service"])
+    return {"sheet_assignments": sheet_assignments, "next_row": next_row}
+
+
+def archive(state: State, config: RunnableConfig) -> dict:
+    c = config["configurable"]
+    finished = Archive.finished_courses(state["course_info"], state["sheet_assignments"])
+    if not c["dry_run"]:
+        Archive.remember(state["course_info"])
+    return {"finished": finished,
+            "logs": Archive.archive(state["ops"], finished, c["sheet_service"], c["spreadsheet_id"],
+                                    c["sheet_title"], c["dry_run"])}
+
+
+def write(state: State, config: RunnableConfig) -> dict:
+    c = config["configurable"]
+    sheet_id = Sheets.get_sheet_id(c["sheet_service"], c["spreadsheet_id"], c["sheet_title"])
+    row_count = Sheets.get_row_count(sheet_id, c["sheet_service"], c["spreadsheet_id"])
+
+    if c["dry_run"]:
+        batches = Journal.plan_batches(state["ops"], state["next_row"], row_count, c["sheet_service"],
+                                       c["spreadsheet_id"], c["sheet_title"])
+        return {"logs": Journal.describe(state["ops"], batches, c["sheet_title"])}
+
+    calls = Journal.write_ops(state["ops"], state["next_row"], row_count, c["sheet_service"],
+                              c["spreadsheet_id"], c["sheet_title"], c["store"])
+    logs = [f"write: {calls} calls"]
+    # The new watermarks only go to disk once the writes they cover have landed
+    if "cache" in state:
+        Load_Info.save_tenant_cache(state["cache"], c["canvas_url"], c["canvas_token"], c["cache_target"],
+                                    c["cache_path"])
+    # Archiving leaves the grid sized for last term; shrink it back to the live rows
+    if Archive.archived_ops(state["ops"], state.get("finished", {})):
+        removed = Archive.compact(c["sheet_service"], c["spreadsheet_id"], c["sheet_title"])
+        logs.append(f"compact: {removed} blank rows removed")
+    return {"logs": logs}
+
+
+# Wraps a node so its wall time goes to METRICS (as a stage) and to logs
+def timed(name: str, node):
+    def run(state: State, config: RunnableConfig) -> dict:
+        started = time.perf_counter()
+        with METRICS.stage(name):
+            update = dict(node(state, config))
+        update["logs"] = update.get("logs", []) + [f"{name}: {time.perf_counter() - started:.3f}s"]
+        return update
+    return run
+
+
+# fetch_canvas and read_sheet are independent I/O, so they run as parallel branches from START;
+# diff waits for both, then archive (saves rows of finished terms before their deletes) and write
+def build_graph():
+    graph = StateGraph(State)
+    graph.add_node("fetch_canvas", timed("fetch", fetch_canvas))
+    graph.add_node("read_sheet", timed("read", read_sheet))
+    graph.add_node("diff", timed("diff", diff))
+    graph.add_node("archive", timed("archive", archive))
+    graph.add_node("write", timed("write", write))
+
+    graph.add_edge(START, "fetch_canvas")
+    graph.add_edge(START, "read_sheet")
+    graph.add_edge(["fetch_canvas", "read_sheet"], "diff")
+    graph.add_edge("diff", "archive")
+    graph.add_edge("archive", "write")
+    graph.add_edge("write", END)
+    return graph.compile()
+
+
+SYNC_GRAPH = build_graph()
+
+
+# Runs one sync of a Canvas account into a spreadsheet through SYNC_GRAPH.
+# Writes are journaled (see Journal); an unfinished journal is completed first, and that run
+# returns without fetching. dry_run plans and prints the ops without writing anything.
+# incremental (REST only) fetches just what changed since the last run, see Load_Info.SYNC_CACHE
+def sync(canvas_url: str, canvas_token: str, spreadsheet_id: str, sheet_title: str = "Assignments",
+         session=None, sheet_service=None, max_workers: int = Load_Info.MAX_WORKERS, store=None,
+         backend: str = Load_Info.FETCH_BACKEND, dry_run: bool = False, incremental: bool = True) -> State:
+
+    session = session or Load_Info.build_session(max_workers)
+    store = store or Store.Store()
+
+    resumed = resume(spreadsheet_id, sheet_service, store, dry_run)
+    if replayed(resumed) and not dry_run:
+        return {"canvas_assignments": [], "sheet_assignments": [], "logs": resumed, "ops": []}
+
+    return SYNC_GRAPH.invoke(
+        {"canvas_assignments": [], "sheet_assignments": [], "logs": resumed, "ops": []},
+        config={"configurable": {
+            "canvas_url": canvas_url, "canvas_token": canvas_token, "spreadsheet_id": spreadsheet_id,
+            "sheet_title": sheet_title, "session": session, "sheet_service": sheet_service,
+            "max_workers": max_workers, "store": store, "backend": backend, "dry_run": dry_run,
+            "incremental": incremental, "cache_path": Load_Info.SYNC_CACHE,
+            "cache_target": f"{spreadsheet_id}/{sheet_title}",
+        }},
+    )
+
+
+# Streaming sync: assignments flow from Canvas through the diff into batched writes as pages
+# arrive, so memory stays flat and the first writes land before the last course is fetched.
+# Rows of finished courses are archived up front (the stream's deletes come last) and those
+# courses aren't fetched. Like sync, it finishes an unfinished journal first, and each flush is
+# journaled, so a crash part way through the stream is resumed by the next run of either
+def sync_stream(canvas_url: str, canvas_token: str, spreadsheet_id: str, sheet_title: str = "Assignments",
+                session=None, sheet_service=None, max_workers: int = Load_Info.MAX_WORKERS, store=None) -> list[str]:
+
+    session = session or Load_Info.build_session(max_workers)
+    store = store or Store.Store()
+
+    resumed = resume(spreadsheet_id, sheet_service, store)
+    if replayed(resumed):
+        return resumed
+
+    with METRICS.stage("fetch"):
+        course_info = Load_Info.get_course_info(canvas_url, canvas_token, session)
+
+    with METRICS.stage("read"):
+        sheet_assignments, next_row = read_sheet_state(store, spreadsheet_id, sheet_title, sheet_service)
+
+    finished = Archive.finished_courses(course_info, sheet_assignments)
+    courses = {course["name"]: course["id"] for course in course_info if course["id"] not in finished}
+    archived = Archive.finished_ops(sheet_assignments, finished)
+    with METRICS.stage("archive"):
+        logs = resumed + Archive.archive(archived, finished, sheet_service, spreadsheet_id, sheet_title)
+        Archive.remember(course_info)
+
+    sheet_id = Sheets.get_sheet_id(sheet_service, spreadsheet_id, sheet_title)
+    row_count = Sheets.get_row_count(sheet_id, sheet_service, spreadsheet_id)
+
+    counts = {"insert": 0, "update": 0, "delete": 0}
+
+    # Journal.write_ops mirrors each flush into the store once it lands
+    def write(ops, flush_next_row, flush_row_count):
+        return Journal.write_ops(ops, flush_next_row, flush_row_count, sheet_service, spreadsheet_id, sheet_title, store)
+
+    def on_flush(ops, flushed_next_row):
+        for op in ops:
+            counts[op["op"]] += 1
+
+    # Fetch, diff and write overlap here, so they are timed as one stage
+    canvas_assignments = Load_Info.iter_assignments(canvas_url, courses, canvas_token, session, max_workers)
+    with METRICS.stage("stream"):
+        ops = Derived.derive_ops(Diff.iter_diff(canvas_assignments, sheet_assignments), sheet_assignments)
+        calls, _ = Sheets.write_stream(ops, next_row, row_count,
+                                       sheet_service, spreadsheet_id, sheet_title, on_flush=on_flush, write=write)
+
+    logs += [f"diff: {counts['insert']} insert, {counts['update']} update, {counts['delete']} delete",
+             f"write: {calls} calls"]
+    if archived:
+        logs.append(f"compact: {Archive.compact(sheet_service, spreadsheet_id, sheet_title)} blank rows removed")
+    return logs
+
+
+# Daily job: recomputes the derived columns for every row and rewrites only the rows whose bucket
+# moved or that are due this week (coalesced by Sheets.write_ops); see Derived.refresh_ops
+def refresh_derived(spreadsheet_id: str = Sheets.SPREADSHEET_ID, sheet_title: str = "Assignments",
+                    sheet_service=None, store=None, on=None) -> list[str]:
+    store = store or Store.Store()
+    resumed = resume(spreadsheet_id, sheet_service, store)
+
+    with METRICS.stage("read"):
+        rows, next_row = read_sheet_state(store, spreadsheet_id, sheet_title, sheet_service)
+
+    with METRICS.stage("derive"):
+        ops = Derived.refresh_ops(rows, on)
+
+    calls = 0
+    if ops:
+        with METRICS.stage("write"):
+            sheet_id = Sheets.get_sheet_id(sheet_service, spreadsheet_id, sheet_title)
+            row_count = Sheets.get_row_count(sheet_id, sheet_service, spreadsheet_id)
+            calls = Journal.write_ops(ops, next_row, row_count, sheet_service, spreadsheet_id, sheet_title, store)
+
+    return resumed + [f"derive: {len(ops)} rows changed", f"write: {calls} calls"]
+
+
+# Columns that follow an assignment when it moves to another tab: the user's (read from the sheet
+# by read_sheet_state, never from the store) and when the sync first saw it
+CARRIED_FIELDS = [*Store.USER_FIELDS, "created_at"]
+
+# Sharded sync: each assignment goes to its term's (or course's) tab, missing tabs are created
+# on demand, and tabs are read and written in parallel. An assignment whose tab changed is
+# deleted from the old tab and inserted in the new one with its user-edited columns
+def sync_sharded(canvas_url: str, canvas_token: str, spreadsheet_id: str, shard_by: str = Shards.SHARD_BY,
+                 session=None, sheet_service=None, max_workers: int = Load_Info.MAX_WORKERS, store=None,
+                 backend: str = Load_Info.FETCH_BACKEND, dry_run: bool = False) -> dict[str, State]:
+
+    session = session or Load_Info.build_session(max_workers)
+    store = store or Store.Store()
+
+    resumed = resume(spreadsheet_id, sheet_service, store, dry_run)
+    if replayed(resumed) and not dry_run:
+        return {"resume": {"canvas_assignments": [], "sheet_assignments": [], "logs": resumed, "ops": []}}
+
+    with METRICS.stage("fetch"):
+        course_info, canvas_assignments = Load_Info.fetch_assignments(canvas_url, canvas_token, session,
+                                                                      max_workers, backend)
+
+    routed = Shards.route(Archive.live(canvas_assignments, Archive.finished_courses(course_info)),
+                          Shards.course_tabs(course_info, shard_by))
+    new_tabs = {}
+    if dry_run:
+        # Tabs aren't created in a dry run; their assignments are only counted
+        existing = set(Sheets.get_metadata(sheet_service, spreadsheet_id).titles())
+        new_tabs = {title: routed.pop(title) for title in sorted(set(routed) - existing)}
+    else:
+        Shards.ensure_tabs(routed, sheet_service, spreadsheet_id)
+    # Every tab is read, not just those the store knows: rows an unsharded sync (or another store)
+    # left in Assignments still have to move to their term's tab. Tabs without Canvas rows diff to nothing
+    titles = sorted(set(routed) | set(Sheets.get_metadata(sheet_service, spreadsheet_id).titles()))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        with METRICS.stage("read"):
+            sheet_states = dict(zip(titles, pool.map(
+                lambda title: read_sheet_state(store, spreadsheet_id, title, sheet_service), titles)))
+
+        with METRICS.stage("diff"):
+            previous = {row["sync_id"]: row for rows, _ in sheet_states.values() for row in rows}
+            finished = Archive.finished_courses(course_info, previous.values())
+            if not dry_run:
+                Archive.remember(course_info)
+            states = {}
+            for title in titles:
+                state: State = {"canvas_assignments": routed.get(title, []),
+                                "sheet_assignments": sheet_states[title][0], "logs": [], "ops": []}
+                state.update(diff(state))
+                for op in state["ops"]:
+                    if op["op"] == "insert" and op["sync_id"] in previous:
+                        moved = previous[op["sync_id"]]
+                        op["values"] = op["values"]._replace(**{f: moved.get(f, '') for f in CARRIED_FIELDS if moved.get(f)})
+                states[title] = state
+
+        def write(title):
+            state = states[title]
+            if not state["ops"]:
+                return
+            next_row = sheet_states[title][1]
+            sheet_id = Sheets.get_sheet_id(sheet_service, spreadsheet_id, title)
+            row_count = Sheets.get_row_count(sheet_id, sheet_service, spreadsheet_id)
+            state["logs"] += Archive.archive(state["ops"], finished, sheet_service, spreadsheet_id, title, dry_run)
+            if dry_run:
+                batches = Journal.plan_batches(state["ops"], next_row, row_count, sheet_service, spreadsheet_id, title)
+                state["logs"] += Journal.describe(state["ops"], batches, title)
+                return
+            calls = Journal.write_ops(state["ops"], next_row, row_count, sheet_service, spreadsheet_id, title, store)
+            state["logs"].append(f"write: {calls} calls")
+            if Archive.archived_ops(state["ops"], finished):
+                state["logs"].append(f"compact: {Archive.compact(sheet_service, spreadsheet_id, title)} blank rows removed")
+
+        with METRICS.stage("write"):
+            list(pool.map(write, titles))
+
+    for title, assignments in new_tabs.items():
+        states[title] = {"canvas_assignments": assignments, "sheet_assignments": [], "ops": [],
+                         "logs": [f"{title}: new tab, {len(assignments)} inserts"]}
+
+    return states
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sync Canvas assignments into the spreadsheet")
+    parser.add_argument("--dry-run", action="store_true", help="print the planned ops without writing")
+    parser.add_argument("--shard-by", choices=["term", "course", "none"], help="one tab per term or course")
+    parser.add_argument("--full", action="store_true", help="fetch every assignment, ignoring the incremental cache")
+    args = parser.parse_args()
+
+    if args.shard_by:
+        states = sync_sharded(Load_Info.CANVAS_URL, Load_Info.CANVAS_TOKEN, Sheets.SPREADSHEET_ID,
+                              args.shard_by, dry_run=args.dry_run)
+        logs = [line for state in states.values() for line in state["logs"]]
+    else:
+        logs = sync(Load_Info.CANVAS_URL, Load_Info.CANVAS_TOKEN, Sheets.SPREADSHEET_ID, dry_run=args.dry_run,
+                    incremental=not args.full)["logs"]
+
+    print("\n".join(logs))
@@ -0,0 +1,86 @@
+import itertools
+import os
+import sys
+import tempfile
+
+# Journals, archives and the incremental cache go to a scratch directory for the whole run;
+# these are read when the modules are imported, so they are set first
+_SCRATCH = tempfile.mkdtemp(prefix="canvas_sync_tests_")
+os.environ["JOURNAL_DIR"] = os.path.join(_SCRATCH, "journal")
+os.environ["ARCHIVE_DIR"] = os.path.join(_SCRATCH, "archive")
+os.environ["SYNC_CACHE"] = os.path.join(_SCRATCH, "sync_cache.json")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import RateLimit
+
+# Tests check behaviour, not the throttle
+RateLimit.CANVAS_RATE = RateLimit.SHEETS_RATE = 1e9
+RateLimit.CANVAS_BURST = RateLimit.SHEETS_BURST = 10 ** 9
+RateLimit.backoff = lambda attempt, retry_after=None: 0
+
+import Fakes
+import Sheets
+import Store
+import Workflow
+
+_IDS = itertools.count()
+
+
+# One Canvas account syncing into its own fake spreadsheet. Each tenant gets a fresh spreadsheet id,
+# so journals, cache sections and cached metadata never carry over between tests
+class Tenant:
+    def __init__(self, n_assignments: int = 30, n_courses: int = 3, rows: int = 100):
+        self.canvas = Fakes.FakeCanvas(n_assignments, n_courses)
+        self.sheets = Fakes.FakeSheets(rows=rows, spreadsheet_id=f"test-{next(_IDS)}")
+        self.spreadsheet_id = self.sheets.spreadsheet_id
+        self.session = Fakes.canvas_session(self.canvas)
+        self.store = Store.Store(":memory:")
+        self.token = "token"
+        Sheets.intitialize_sheet(self.spreadsheet_id, self.sheets)
+
+    def sync(self, **kwargs) -> list[str]:
+        return Workflow.sync("canvas.test", self.token, self.spreadsheet_id, session=self.session,
+                             sheet_service=self.sheets, store=self.store, **kwargs)["logs"]
+
+    def sync_sharded(self, **kwargs) -> dict:
+        return Workflow.sync_sharded("canvas.test", self.token, self.spreadsheet_id, "term", session=self.session,
+                                     sheet_service=self.sheets, store=self.store, **kwargs)
+
+    def sync_stream(self) -> list[str]:
+        return Workflow.sync_stream("canvas.test", self.token, self.spreadsheet_id, session=self.session,
+                                    sheet_service=self.sheets, store=self.store)
+
+    # New assignments copied from the course's first, keeping its old updated_at
+    def add(self, course_id: int, count: int = 1):
+        infos = self.canvas.assignments[course_id]
+        for _ in range(count):
+            next_id = max(info["id"] for infos in self.canvas.assignments.values() for info in infos) + 1
+            infos.append(dict(infos[0], id=next_id, name=f"Assignment {next_id}"))
+
+    def rows(self, title: str = "Assignments") -> list[dict]:
+        return Sheets.read_sheet(self.sheets, self.spreadsheet_id, title)
+
+    def sheet_ids(self, title: str = "Assignments") -> list[str]:
+        return [row["sync_id"] for row in self.rows(title)]
+
+    def canvas_ids(self) -> set[str]:
+        return {f"canvas:{course_id}:{info['id']}"
+                for course_id, infos in self.canvas.assignments.items() for info in infos}
+
+    # The sheet holds exactly Canvas' assignments, each once, and the store mirrors it
+    def assert_in_sync(self, title: str = "Assignments"):
+        ids = self.sheet_ids(title)
+        assert sorted(ids) == sorted(self.canvas_ids())
+        sync_ids, _ = Sheets.read_sync_index(self.sheets, self.spreadsheet_id, title)
+        assert not self.store.drifted(self.spreadsheet_id, title, sync_ids)
+
+
+@pytest.fixture
+def tenant() -> Tenant:
+    return Tenant()
+
+
+@pytest.fixture
+def make_tenant():
+    return Tenant
@@ -0,0 +1,120 @@
+import itertools
+import pytest
+import Archive
+import Sheets
+
+# Archives and terms.json are shared by the whole run, so each test gives its course a term of its own
+_TERMS = itertools.count()
+ENDED = "2026-05-01T00:00:00Z"
+
+
+# Puts the tenant's first course (1000) in a new, still running term; setting its end_at to ENDED finishes it
+def new_term(tenant, name: str) -> dict:
+    n = next(_TERMS)
+    term = tenant.canvas.courses[0]["term"] = {"id": 100 + n, "name": f"{name} {n}", "end_at": "2099-01-01T00:00:00Z"}
+    return term
+
+
+def live_ids(tenant) -> list[str]:
+    return sorted(sync_id for sync_id in tenant.canvas_ids() if not sync_id.startswith("canvas:1000:"))
+
+
+def course_ids(tenant) -> set[str]:
+    return {f"canvas:1000:{info['id']}" for info in tenant.canvas.assignments[1000]}
+
+
+# Both backends still list the course with its ended term; the grace period has passed
+@pytest.mark.parametrize("backend", ["rest", "graphql"])
+def test_ended_term_is_archived(tenant, backend):
+    term = new_term(tenant, "Spring")
+    tenant.sync(backend=backend)
+    term["end_at"] = ENDED
+
+    logs = tenant.sync(backend=backend)
+
+    assert any(line.startswith("archive: 10 rows") for line in logs)
+    assert sorted(tenant.sheet_ids()) == live_ids(tenant)
+    assert {row["sync_id"] for row in Archive.load(term["name"])} == course_ids(tenant)
+    assert "diff: 0 insert, 0 update, 0 delete" in tenant.sync(backend=backend)
+
+
+# Canvas stops listing a course once the enrollment concludes; its rows go to the term it was last seen in
+def test_dropped_course_is_archived_under_its_last_term(tenant):
+    term = new_term(tenant, "Summer")
+    tenant.sync()
+    expected = course_ids(tenant)
+    tenant.canvas.courses.pop(0)
+
+    tenant.sync()
+
+    assert sorted(tenant.sheet_ids()) == live_ids(tenant)
+    assert {row["sync_id"] for row in Archive.load(term["name"])} == expected
+
+
+def test_archived_rows_keep_user_columns(tenant):
+    term = new_term(tenant, "Spring")
+    tenant.sync()
+    row = next(row for row in tenant.rows() if row["sync_id"].startswith("canvas:1000:"))
+    Sheets.update_row({row["row"]: {"notes": "ask about extension"}}, tenant.sheets, tenant.spreadsheet_id)
+    term["end_at"] = ENDED
+
+    tenant.sync()
+
+    archived = {row["sync_id"]: row for row in Archive.load(term["name"])}
+    assert archived[row["sync_id"]]["notes"] == "ask about extension"
+    assert archived[row["sync_id"]]["term"] == term["name"]
+
+
+def test_stream_sync_archives_and_does_not_reinsert(tenant):
+    term = new_term(tenant, "Fall")
+    tenant.sync_stream()
+    term["end_at"] = ENDED
+
+    logs = tenant.sync_stream()
+    assert any(line.startswith("archive: 10 rows") for line in logs)
+    assert "diff: 0 insert, 0 update, 10 delete" in logs
+
+    assert "diff: 0 insert, 0 update, 0 delete" in tenant.sync_stream()
+    assert "diff: 0 insert, 0 update, 0 delete" in tenant.sync()
+    assert sorted(tenant.sheet_ids()) == live_ids(tenant)
+    assert len(Archive.load(term["name"])) == 10
+
+
+def test_sharded_sync_archives_ended_terms(tenant):
+    term = new_term(tenant, "Winter")
+    tenant.sync_sharded()
+    assert len(tenant.sheet_ids(term["name"])) == 10
+    term["end_at"] = ENDED
+
+    tenant.sync_sharded()
+
+    assert tenant.sheet_ids(term["name"]) == []
+    assert sorted(tenant.sheet_ids("Current Term")) == live_ids(tenant)
+    assert len(Archive.load(term["name"])) == 10
+
+
+def test_grid_is_compacted_after_archiving(make_tenant):
+    tenant = make_tenant(rows=400)
+    term = new_term(tenant, "Spring")
+    tenant.sync()
+    term["end_at"] = ENDED
+
+    logs = tenant.sync()
+
+    metadata = Sheets.get_metadata(tenant.sheets, tenant.spreadsheet_id, refresh=True)
+    rows = metadata.row_count(metadata.sheet_id("Assignments"))
+    assert rows == 1 + 20 + Archive.GRID_SLACK
+    # The archived rows' deletes already shrank the grid by 10
+    assert f"compact: {400 - 10 - rows} blank rows removed" in logs
+
+
+def test_dry_run_archives_nothing(tenant):
+    term = new_term(tenant, "Spring")
+    tenant.sync()
+    term["end_at"] = ENDED
+
+    logs = tenant.sync(dry_run=True)
+
+    assert f"Assignments: archive 10 rows ({term['name']})" in logs
+    assert Archive.load(term["name"]) == []
+    assert len(tenant.sheet_ids()) == 30
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+import Derived
+import Sheets
+import Workflow
+
+ON = date(2026, 10, 1)
+
+
+def rows(count: int = 10) -> list[dict]:
+    return [{"sync_id": f"canvas:1:{i}", "row": i + 2, "submitted": "No",
+             "due_date_utc": f"{ON + timedelta(days=2 * i)}T12:00:00Z"} for i in range(count)]
+
+
+def applied(sheet_rows: list[dict], on: date) -> list[dict]:
+    ops = Derived.refresh_ops(sheet_rows, on)
+    for op in ops:
+        sheet_rows[op["row"] - 2].update(op["values"])
+    return ops
+
+
+def test_first_refresh_fills_every_row():
+    sheet_rows = rows()
+    assert len(applied(sheet_rows, ON)) == 10
+    assert [row["urgency"] for row in sheet_rows[:5]] == ["soon", "soon", "week", "week", "later"]
+    assert Derived.refresh_ops(sheet_rows, ON) == []
+
+
+# Only rows due this week show a day count; the rest are left blank rather than going stale
+def test_days_left_is_only_shown_within_the_week():
+    sheet_rows = rows()
+    applied(sheet_rows, ON)
+    assert [row.get("days_left", '') for row in sheet_rows] == [0, 2, 4, 6, '', '', '', '', '', '']
+
+
+# A day later the counted rows and those that crossed a bucket boundary are rewritten, nothing else
+def test_next_day_rewrites_only_counted_rows_and_bucket_moves():
+    sheet_rows = rows()
+    applied(sheet_rows, ON)
+
+    ops = Derived.refresh_ops(sheet_rows, ON + timedelta(days=1))
+
+    assert [op["sync_id"] for op in ops] == [f"canvas:1:{i}" for i in range(5)]
+    assert ops[0]["values"] == {"days_left": '', "urgency": "overdue"}
+    assert ops[1]["values"] == {"days_left": 1}
+    assert ops[2]["values"] == {"days_left": 3, "urgency": "soon", "priority": "High"}
+    assert ops[4]["values"] == {"days_left": 7, "urgency": "week", "priority": "Medium"}
+
+
+def test_user_priority_is_left_alone():
+    sheet_rows = rows(3)
+    applied(sheet_rows, ON)
+    sheet_rows[2]["priority"] = "Low"
+
+    ops = Derived.refresh_ops(sheet_rows, ON + timedelta(days=1))
+
+    assert {op["sync_id"]: op["values"] for op in ops}["canvas:1:2"] == {"days_left": 3, "urgency": "soon"}
+
+
+# The priority the user typed is on the sheet only; the store still holds the default the sync wrote
+def test_refresh_keeps_a_priority_set_on_the_sheet(tenant):
+    tenant.sync()
+    row = next(row for row in tenant.rows() if row["urgency"] == "week")
+    Sheets.update_row({row["row"]: {"priority": "Optional"}}, tenant.sheets, tenant.spreadsheet_id)
+
+    Workflow.refresh_derived(tenant.spreadsheet_id, sheet_service=tenant.sheets, store=tenant.store,
+                             on=Derived.today() + timedelta(days=2))
+
+    refreshed = next(r for r in tenant.rows() if r["sync_id"] == row["sync_id"])
+    assert refreshed["priority"] == "Optional"
+    assert refreshed["urgency"] in ("soon", "overdue")
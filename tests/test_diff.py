@@ -0,0 +1,63 @@
+import Diff
+from Assignment import Assignment
+
+
+def assignment(n: int, course_id: int = 1, **changes) -> Assignment:
+    return Assignment(course_name=f"Course {course_id}", assignment_name=f"Assignment {n}",
+                      due_date="2026-10-20 09:00:00", submitted="No", link=f"https://canvas.test/{n}",
+                      sync_id=f"canvas:{course_id}:{n}", source="canvas", due_date_utc="2026-10-20T09:00:00Z",
+                      updated_at="2026-01-05T00:00:00Z")._replace(**changes).hashed()
+
+
+# Sheet rows as the store holds them after a diff's inserts landed
+def on_sheet(assignments, first_row: int = 2) -> list[dict]:
+    return [dict(a._asdict(), row=first_row + i) for i, a in enumerate(assignments)]
+
+
+def test_empty_sheet_gets_every_assignment_inserted():
+    ops = Diff.diff_assignments([assignment(n) for n in range(3)], [])
+    assert [op["op"] for op in ops] == ["insert"] * 3
+    assert all(op["values"].created_at and op["values"].content_hash for op in ops)
+
+
+def test_unchanged_assignments_give_no_ops():
+    canvas = [assignment(n) for n in range(3)]
+    assert Diff.diff_assignments(canvas, on_sheet(canvas)) == []
+
+
+def test_update_carries_only_changed_canvas_fields():
+    canvas = [assignment(n) for n in range(3)]
+    rows = on_sheet(canvas)
+    rows[1].update(priority="High", notes="bring calculator")
+
+    ops = Diff.diff_assignments([canvas[0], assignment(1, assignment_name="Renamed"), canvas[2]], rows)
+
+    assert len(ops) == 1
+    op = ops[0]
+    assert (op["op"], op["row"], op["sync_id"]) == ("update", 3, "canvas:1:1")
+    assert op["values"]["assignment_name"] == "Renamed"
+    assert not {"priority", "status", "notes"} & set(op["values"])
+
+
+def test_only_canvas_rows_are_deleted():
+    canvas = [assignment(n) for n in range(3)]
+    rows = on_sheet(canvas) + [{"course_name": "Typed by hand", "sync_id": "mine:1", "source": "", "row": 5}]
+
+    ops = Diff.diff_assignments(canvas[:2], rows)
+
+    assert ops == [{"op": "delete", "sync_id": "canvas:1:2", "row": 4}]
+
+
+def test_partial_diff_never_deletes():
+    canvas = [assignment(n) for n in range(3)]
+    assert Diff.diff_assignments(canvas[:1], on_sheet(canvas), full=False) == []
+
+
+def test_incremental_deletes_follow_the_listed_courses():
+    rows = on_sheet([assignment(0, 1), assignment(1, 1), assignment(2, 2), assignment(3, 3)])
+    listed = {1: {"canvas:1:0"}, 2: None}
+
+    deletes = list(Diff.iter_deletes(rows, listed))
+
+    # 1:1 left course 1's refetched list, course 3 isn't synced any more; course 2 was a 304
+    assert [op["sync_id"] for op in deletes] == ["canvas:1:1", "canvas:3:3"]
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import pytest
+import Events
+
+
+def test_live_event_uses_local_ids():
+    payload = {"metadata": {"event_name": "assignment_updated", "context_type": "Course",
+                            "context_id": "21070000000001000"},
+               "body": {"assignment_id": "21070000000000004", "title": "Essay"}}
+    assert Events.parse_event(payload) == [(1000, 4)]
+
+
+def test_assignment_event_falls_back_to_its_id():
+    payload = {"metadata": {"event_name": "assignment_created"},
+               "body": {"id": "7", "context_type": "Course", "context_id": "1001"}}
+    assert Events.parse_event(payload) == [(1001, 7)]
+
+
+def test_webhooks_lists_and_unrelated_events():
+    assert Events.parse_event({"course_id": 1002}) == [(1002, None)]
+    assert Events.parse_event({"event_name": "submission_created", "assignment_id": "~12"}) == [(None, 12)]
+    assert Events.parse_event([{"course_id": 1000, "assignment_id": 3}, {"event": "user_login"}, "junk"]) == [(1000, 3)]
+    assert Events.parse_event({"metadata": {"event_name": "enrollment_created"}, "body": {"course_id": 1}}) == []
+    assert Events.parse_event({"body": {"title": "no ids"}}) == []
+
+
+def test_debouncer_waits_for_a_quiet_spell():
+    debouncer = Events.Debouncer(debounce=0.1, max_delay=10)
+    debouncer.add([(1000, 1), (1000, 2)])
+    debouncer.add([(1000, 1)])
+    assert len(debouncer) == 2
+
+    assert debouncer.next_batch(timeout=0) == set()
+    assert debouncer.next_batch(timeout=1) == {(1000, 1), (1000, 2)}
+    assert len(debouncer) == 0
+
+
+# A steady stream of events never goes quiet; the batch is still handed out max_delay after the first
+def test_debouncer_caps_the_delay():
+    debouncer = Events.Debouncer(debounce=0.2, max_delay=0.3)
+    started = time.monotonic()
+    for n in range(4):
+        debouncer.add([(1000, n)])
+        time.sleep(0.1)
+
+    assert debouncer.next_batch(timeout=1) == {(1000, n) for n in range(4)}
+    assert time.monotonic() - started < 0.5
+
+
+def event_sync(tenant) -> Events.EventSync:
+    return Events.EventSync("canvas.test", tenant.token, tenant.spreadsheet_id, session=tenant.session,
+                            sheet_service=tenant.sheets, store=tenant.store, max_workers=2)
+
+
+def test_sync_keys_fetches_only_the_named_assignments(tenant):
+    tenant.sync()
+    sync = event_sync(tenant)
+    touched = tenant.canvas.assignments[1000][1]
+    tenant.canvas.touch(1000, 1, name="Renamed")
+    gone = tenant.canvas.assignments[1001].pop(0)
+    tenant.canvas.calls.clear()
+
+    # The second key has no course id; it is found through the row already on the sheet
+    logs = sync.sync_keys({(1000, touched["id"]), (None, gone["id"])})
+
+    assert "diff: 0 insert, 1 update, 1 delete" in logs
+    assert tenant.canvas.calls == {"courses": 1, "assignment": 2}
+    names = {row["sync_id"]: row["assignment_name"] for row in tenant.rows()}
+    assert names[f"canvas:1000:{touched['id']}"] == "Renamed"
+    tenant.assert_in_sync()
+
+
+def test_course_key_refetches_the_course(tenant):
+    tenant.sync()
+    sync = event_sync(tenant)
+    tenant.add(1002, 2)
+    tenant.canvas.calls.clear()
+
+    logs = sync.sync_keys({(1002, None)})
+
+    assert "diff: 2 insert, 0 update, 0 delete" in logs
+    assert "assignment" not in tenant.canvas.calls
+    tenant.assert_in_sync()
+
+
+@pytest.fixture
+def server(tenant):
+    sync = event_sync(tenant)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Events.make_handler(sync, secret="s3cret"))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield sync, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def call(url: str, body: bytes = None, headers: dict = None) -> tuple[int, dict]:
+    request = urllib.request.Request(url, data=body, headers=headers or {}, method="POST" if body else "GET")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_handler_queues_events_with_the_secret(server):
+    sync, url = server
+    body = json.dumps([{"course_id": 1000, "assignment_id": 1}, {"course_id": 1001}]).encode()
+
+    assert call(url + "/events", body, {"X-Canvas-Sync-Secret": "s3cret"}) == (202, {"queued": 2})
+    assert call(url + "/events?secret=s3cret", json.dumps({"course_id": 1002}).encode()) == (202, {"queued": 1})
+    assert call(url + "/healthz") == (200, {"pending": 3})
+    assert sync.debouncer.next_batch(timeout=5) == {(1000, 1), (1001, None), (1002, None)}
+
+
+def test_handler_rejects_a_bad_secret_and_bad_json(server):
+    sync, url = server
+
+    assert call(url + "/events", b'{"course_id": 1000}', {"X-Canvas-Sync-Secret": "wrong"})[0] == 401
+    assert call(url + "/events", b'{"course_id": 1000}')[0] == 401
+    assert call(url + "/events", b"not json", {"X-Canvas-Sync-Secret": "s3cret"})[0] == 400
+    assert call(url + "/elsewhere")[0] == 404
+    assert len(sync.debouncer) == 0
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+import Load_Info
+
+
+def fetch(tenant, backend: str):
+    course_info, assignments = Load_Info.fetch_assignments("canvas.test", tenant.token, tenant.session, backend=backend)
+    courses = sorted((course["id"], course["name"], course["term"]["name"], course["term"]["end_at"])
+                     for course in course_info)
+    return courses, sorted(assignments)
+
+
+def ended(days_ago: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# Same courses, terms and records from either backend, a term that ended days ago included
+def test_backends_return_the_same_records(tenant):
+    tenant.canvas.courses[1]["term"] = {"id": 7, "name": "Summer", "end_at": ended(2)}
+    tenant.canvas.touch(1000, 2, name="Renamed", due_at=None)
+
+    rest, graphql = fetch(tenant, "rest"), fetch(tenant, "graphql")
+
+    assert graphql == rest
+    assert len(rest[0]) == 3 and len(rest[1]) == 30
+
+
+# Within the grace period neither backend archives a course whose term just ended
+@pytest.mark.parametrize("backend", ["rest", "graphql"])
+def test_recently_ended_term_stays_live(tenant, backend):
+    tenant.sync(backend=backend)
+    tenant.canvas.courses[1]["term"] = {"id": 7, "name": "Summer", "end_at": ended(2)}
+
+    logs = tenant.sync(backend=backend)
+
+    assert "diff: 0 insert, 0 update, 0 delete" in logs
+    assert not any(" rows to " in line for line in logs)
+    tenant.assert_in_sync()
@@ -0,0 +1,47 @@
+import pytest
+import Journal
+import Sheets
+
+
+def test_warm_incremental_run_moves_no_canvas_bytes(tenant):
+    tenant.sync()
+    tenant.canvas.bytes = 0
+    tenant.sync()
+    assert tenant.canvas.bytes == 0
+
+
+def test_failed_write_keeps_changes_for_the_next_run(tenant, monkeypatch):
+    tenant.sync()
+    tenant.canvas.touch(1000, 1, name="Renamed")
+
+    def failing(*args, **kwargs):
+        raise RuntimeError("503")
+    monkeypatch.setattr(Journal, "write_ops", failing)
+    with pytest.raises(RuntimeError):
+        tenant.sync()
+    monkeypatch.undo()
+
+    assert "diff: 0 insert, 1 update, 0 delete" in tenant.sync()
+    assert "Renamed" in {row["assignment_name"] for row in tenant.rows()}
+
+
+# A second spreadsheet on the same Canvas host starts from its own (empty) cache, not the first's ETags
+def test_tenants_keep_separate_caches(tenant, make_tenant):
+    tenant.sync()
+    other = make_tenant()
+    other.canvas, other.session = tenant.canvas, tenant.session
+
+    assert "diff: 30 insert, 0 update, 0 delete" in other.sync()
+    other.assert_in_sync()
+
+
+def test_rows_removed_by_hand_come_back(tenant):
+    tenant.sync()
+    sheet_id = Sheets.get_sheet_id(tenant.sheets, tenant.spreadsheet_id, "Assignments")
+    tenant.sheets._batch_update([{"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS",
+                                                                "startIndex": 1, "endIndex": 4}}}])
+    Sheets.invalidate_metadata(tenant.spreadsheet_id)
+
+    tenant.sync()
+    tenant.sync()
+    tenant.assert_in_sync()
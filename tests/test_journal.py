@@ -0,0 +1,173 @@
+from datetime import timedelta
+import pytest
+import Derived
+import Journal
+import Sheets
+import Workflow
+
+
+# A run that needs every kind of batch: grid growth for the inserts, value writes, then deletes
+def pending_changes(tenant):
+    tenant.sync()
+    tenant.add(1001, 30)
+    for infos in tenant.canvas.assignments.values():
+        del infos[1:6:2]
+    tenant.canvas.touch(1002, 0, name="Renamed")
+
+
+# Stands in for Sheets.execute_batches and dies after `after` calls, with that call's batch landed or not
+def crash_after(monkeypatch, after: int, landed: bool):
+    real = Sheets.execute_batches
+    calls = []
+
+    def crashing(batches, sheet_service=None, spreadsheet_id=Sheets.SPREADSHEET_ID):
+        calls.append(batches)
+        if len(calls) == after and not landed:
+            raise KeyboardInterrupt("killed")
+        real(batches, sheet_service, spreadsheet_id)
+        if len(calls) == after:
+            raise KeyboardInterrupt("killed")
+
+    monkeypatch.setattr(Sheets, "execute_batches", crashing)
+    return calls
+
+
+@pytest.mark.parametrize("landed", [True, False])
+@pytest.mark.parametrize("after", [1, 2, 3])
+def test_crashed_write_is_finished_from_the_journal(make_tenant, monkeypatch, after, landed):
+    tenant = make_tenant(rows=40)
+    pending_changes(tenant)
+    crash_after(monkeypatch, after, landed)
+    with pytest.raises(KeyboardInterrupt):
+        tenant.sync()
+    monkeypatch.undo()
+    journal, = Journal.pending(tenant.spreadsheet_id)
+    assert [batch["kind"] for batch in journal.load()["batches"]] == ["structure", "values", "structure"]
+
+    tenant.canvas.calls.clear()
+    logs = tenant.sync()
+
+    assert logs[0].startswith("resume: Assignments")
+    assert tenant.canvas.calls == {}
+    assert not Journal.pending(tenant.spreadsheet_id)
+    tenant.assert_in_sync()
+    assert "diff: 0 insert, 0 update, 0 delete" in tenant.sync()
+
+
+def test_landed_reads_whether_deletes_ran(tenant):
+    tenant.sync()
+    sync_ids, next_row = Sheets.read_sync_index(tenant.sheets, tenant.spreadsheet_id)
+    ops = [{"op": "delete", "sync_id": sync_ids[3], "row": 5}]
+    batches = Journal.plan_batches(ops, next_row, 100, tenant.sheets, tenant.spreadsheet_id)
+    entry = {"ops": ops, "next_row": next_row, "batches": batches}
+
+    assert not Journal._landed(batches[0], entry, tenant.sheets, tenant.spreadsheet_id, "Assignments")
+    Sheets.execute_batches(batches, tenant.sheets, tenant.spreadsheet_id)
+    assert Journal._landed(batches[0], entry, tenant.sheets, tenant.spreadsheet_id, "Assignments")
+
+
+def test_landed_reads_whether_the_grid_grew(make_tenant):
+    tenant = make_tenant(rows=10)
+    ops = [{"op": "insert", "sync_id": f"canvas:1:{n}", "values": None} for n in range(20)]
+    batch = {"kind": "structure", "requests": [{"appendDimension": {
+        "sheetId": Sheets.get_sheet_id(tenant.sheets, tenant.spreadsheet_id, "Assignments"),
+        "dimension": "ROWS", "length": 11}}]}
+    entry = {"ops": ops, "next_row": 2, "batches": [batch]}
+
+    assert not Journal._landed(batch, entry, tenant.sheets, tenant.spreadsheet_id, "Assignments")
+    Sheets.execute_batches([batch], tenant.sheets, tenant.spreadsheet_id)
+    assert Journal._landed(batch, entry, tenant.sheets, tenant.spreadsheet_id, "Assignments")
+
+
+def test_value_batches_always_rerun(tenant):
+    assert not Journal._landed({"kind": "values", "data": []}, {}, tenant.sheets, tenant.spreadsheet_id, "Assignments")
+
+
+def test_begin_refuses_an_unfinished_plan(tenant):
+    journal = Journal.Journal(tenant.spreadsheet_id, "Assignments")
+    journal.begin([], 2, [])
+    with pytest.raises(RuntimeError, match="resume it first"):
+        journal.begin([], 2, [])
+    journal.clear()
+
+
+def test_refresh_derived_resumes_first(tenant, monkeypatch):
+    pending_changes(tenant)
+    crash_after(monkeypatch, 2, True)
+    with pytest.raises(KeyboardInterrupt):
+        tenant.sync()
+    monkeypatch.undo()
+
+    logs = Workflow.refresh_derived(tenant.spreadsheet_id, sheet_service=tenant.sheets, store=tenant.store,
+                                    on=Derived.today() + timedelta(days=6))
+
+    assert logs[0].startswith("resume: Assignments")
+    assert not Journal.pending(tenant.spreadsheet_id)
+    tenant.assert_in_sync()
+
+
+# A batch the API will never take (here a range past the grid) must not block every later run
+def test_rejected_batch_drops_the_journal(tenant):
+    tenant.sync()
+    tenant.canvas.touch(1000, 1, name="Renamed")
+    journal = Journal.Journal(tenant.spreadsheet_id, "Assignments")
+    journal.begin([], 2, [{"kind": "values", "input": "RAW",
+                           "data": [{"range": "'Assignments'!A5000:B5000", "values": [["x", "y"]]}]}])
+
+    logs = tenant.sync()
+
+    assert logs[0].startswith("dropped: 'Assignments': batch 0 rejected (400)")
+    assert "diff: 0 insert, 1 update, 0 delete" in logs
+    assert not Journal.pending(tenant.spreadsheet_id)
+    tenant.assert_in_sync()
+
+
+# Rows shifted under an unfinished journal: replaying its value batches would overwrite other assignments
+def test_journal_for_moved_rows_is_dropped(make_tenant, monkeypatch):
+    tenant = make_tenant(rows=40)
+    pending_changes(tenant)
+    crash_after(monkeypatch, 2, True)
+    with pytest.raises(KeyboardInterrupt):
+        tenant.sync()
+    monkeypatch.undo()
+    sheet_id = Sheets.get_sheet_id(tenant.sheets, tenant.spreadsheet_id, "Assignments")
+    tenant.sheets._batch_update([{"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS",
+                                                                "startIndex": 1, "endIndex": 2}}}])
+    Sheets.invalidate_metadata(tenant.spreadsheet_id)
+
+    logs = tenant.sync()
+
+    assert logs[0].startswith("dropped: 'Assignments': rows [")
+    assert not Journal.pending(tenant.spreadsheet_id)
+    tenant.sync()
+    tenant.assert_in_sync()
+
+
+def test_stream_sync_resumes_a_crashed_sync(make_tenant, monkeypatch):
+    tenant = make_tenant(rows=40)
+    pending_changes(tenant)
+    crash_after(monkeypatch, 2, True)
+    with pytest.raises(KeyboardInterrupt):
+        tenant.sync()
+    monkeypatch.undo()
+
+    assert tenant.sync_stream()[0].startswith("resume: Assignments")
+    assert not Journal.pending(tenant.spreadsheet_id)
+    assert "diff: 0 insert, 0 update, 0 delete" in tenant.sync_stream()
+    tenant.assert_in_sync()
+
+
+# Each flush of the stream is journaled, so sync finishes one that died part way
+def test_crashed_stream_flush_is_resumed(make_tenant, monkeypatch):
+    tenant = make_tenant(rows=40)
+    tenant.sync_stream()
+    pending_changes(tenant)
+    crash_after(monkeypatch, 2, True)
+    with pytest.raises(KeyboardInterrupt):
+        tenant.sync_stream()
+    monkeypatch.undo()
+    assert Journal.pending(tenant.spreadsheet_id)
+
+    assert tenant.sync()[0].startswith("resume: Assignments")
+    assert "diff: 0 insert, 0 update, 0 delete" in tenant.sync()
+    tenant.assert_in_sync()
@@ -0,0 +1,16 @@
+import Layout
+import Sheets
+from Assignment import column_letter
+
+
+def test_column_letter():
+    assert [column_letter(i) for i in (0, 25, 26, 27, 701, 702)] == ["A", "Z", "AA", "AB", "ZZ", "AAA"]
+
+
+def test_second_layout_pass_writes_nothing(tenant):
+    metadata = Sheets.get_metadata(tenant.sheets, tenant.spreadsheet_id, refresh=True, fields=Layout.LAYOUT_FIELDS)
+    assert Layout.plan(metadata.sheet(metadata.sheet_id("Assignments")), "Assignments") == []
+
+    before = tenant.sheets.calls.get("batchUpdate", 0)
+    assert Sheets.apply_layout(["Assignments"], tenant.sheets, tenant.spreadsheet_id) == 0
+    assert tenant.sheets.calls.get("batchUpdate", 0) == before
@@ -0,0 +1,83 @@
+import json
+import Metrics
+from Metrics import METRICS
+
+
+def recorded() -> Metrics.Recorder:
+    recorder = Metrics.Recorder()
+    recorder.call("canvas", "GET /api/v1/courses/:id/assignments", 200, 0.02, 1500)
+    recorder.call("canvas", "GET /api/v1/courses/:id/assignments", 200, 0.3, 500)
+    recorder.call("canvas", "GET /api/v1/courses/:id/assignments", 429, 0.001)
+    recorder.retry("canvas", "GET /api/v1/courses/:id/assignments")
+    recorder.error("google", "sheets.spreadsheets.batchUpdate")
+    recorder.remaining_quota("canvas:canvas.test", 612.5)
+    with recorder.stage("diff"):
+        pass
+    return recorder
+
+
+def test_json_report():
+    report = json.loads(recorded().to_json())
+
+    endpoint = "GET /api/v1/courses/:id/assignments"
+    assert report["calls"] == [{"api": "canvas", "endpoint": endpoint, "status": "200", "count": 2},
+                               {"api": "canvas", "endpoint": endpoint, "status": "429", "count": 1}]
+    latency, = report["latency"]
+    assert (latency["count"], latency["sum"]) == (3, 0.321)
+    assert (latency["buckets"]["0.005"], latency["buckets"]["0.025"], latency["buckets"]["+Inf"]) == (1, 2, 3)
+    assert report["bytes"] == [{"api": "canvas", "endpoint": endpoint, "bytes": 2000}]
+    assert report["retries"] == [{"api": "canvas", "endpoint": endpoint, "count": 1}]
+    assert report["errors"] == [{"api": "google", "endpoint": "sheets.spreadsheets.batchUpdate", "count": 1}]
+    assert report["remaining_quota"] == {"canvas:canvas.test": 612.5}
+    assert report["stages"]["diff"]["count"] == 1
+
+
+def test_prometheus_text():
+    lines = recorded().to_prometheus().splitlines()
+
+    labels = 'api="canvas",endpoint="GET /api/v1/courses/:id/assignments"'
+    assert "# TYPE canvas_sync_requests_total counter" in lines
+    assert f'canvas_sync_requests_total{{{labels},status="429"}} 1' in lines
+    assert f'canvas_sync_request_seconds_bucket{{{labels},le="0.025"}} 2' in lines
+    assert f'canvas_sync_request_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f"canvas_sync_request_seconds_count{{{labels}}} 3" in lines
+    assert f"canvas_sync_response_bytes_total{{{labels}}} 2000" in lines
+    assert f"canvas_sync_retries_total{{{labels}}} 1" in lines
+    assert 'canvas_sync_remaining_quota{api="canvas:canvas.test"} 612.5' in lines
+    assert 'canvas_sync_stage_seconds_count{stage="diff"} 1' in lines
+    # Every sample belongs to a declared metric family
+    declared = {line.split()[2] for line in lines if line.startswith("# TYPE")}
+    assert all(any(line.startswith(name) for name in declared) for line in lines if not line.startswith("#"))
+
+
+def test_label_values_are_escaped():
+    recorder = Metrics.Recorder()
+    recorder.retry("google", 'odd "name"\\with\nnewline')
+    assert 'endpoint="odd \\"name\\"\\\\with\\nnewline"' in recorder.to_prometheus()
+
+
+def test_write_picks_the_format_from_the_path(tmp_path):
+    recorder = recorded()
+    recorder.write(str(tmp_path / "run.prom"))
+    recorder.write(str(tmp_path / "run.json"))
+
+    assert (tmp_path / "run.prom").read_text().startswith("# HELP canvas_sync_requests_total")
+    assert json.loads((tmp_path / "run.json").read_text())["retries"][0]["count"] == 1
+
+
+def test_canvas_endpoint_folds_ids():
+    assert Metrics.canvas_endpoint("/api/v1/courses/1000/assignments/7") == "/api/v1/courses/:id/assignments/:id"
+    assert Metrics.canvas_endpoint("/api/v1/courses") == "/api/v1/courses"
+
+
+# A real sync reports both APIs and its stages to the process-wide recorder
+def test_sync_is_recorded(tenant):
+    METRICS.reset()
+    tenant.sync()
+
+    report = METRICS.report()
+    endpoints = {(call["api"], call["endpoint"]) for call in report["calls"]}
+    assert ("canvas", "GET /api/v1/courses") in endpoints
+    assert ("canvas", "GET /api/v1/courses/:id/assignments") in endpoints
+    assert ("google", "sheets.spreadsheets.values.batchUpdate") in endpoints
+    assert {"fetch", "diff", "write"} <= set(report["stages"])
@@ -0,0 +1,44 @@
+import json
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+import RateLimit
+
+
+# A googleapiclient request that fails with the given statuses, then succeeds
+class Request:
+    def __init__(self, method: str, body: dict, statuses: list[int]):
+        self.methodId = method
+        self.body = json.dumps(body)
+        self.http = None
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def execute(self, http=None):
+        self.calls += 1
+        if self.statuses:
+            raise HttpError(httplib2.Response({"status": self.statuses.pop(0)}), b'{"error": {"message": "failed"}}')
+        return {}
+
+
+DELETE = {"requests": [{"deleteDimension": {"range": {"sheetId": 0, "dimension": "ROWS"}}}]}
+FORMAT = {"requests": [{"updateSheetProperties": {"properties": {"sheetId": 0}, "fields": "title"}}]}
+
+
+# A 5xx may come back after the server applied the batch; deleting rows twice would lose data
+def test_structural_batch_is_not_retried_on_5xx():
+    request = Request("sheets.spreadsheets.batchUpdate", DELETE, [503])
+    with pytest.raises(HttpError):
+        RateLimit.execute(request)
+    assert request.calls == 1
+
+
+@pytest.mark.parametrize("method, body, status", [
+    ("sheets.spreadsheets.batchUpdate", DELETE, 429),
+    ("sheets.spreadsheets.batchUpdate", FORMAT, 503),
+    ("sheets.spreadsheets.values.batchUpdate", {"data": []}, 503),
+])
+def test_throttling_and_idempotent_calls_are_retried(method, body, status):
+    request = Request(method, body, [status])
+    assert RateLimit.execute(request) == {}
+    assert request.calls == 2
@@ -0,0 +1,64 @@
+import Fakes
+import Sheets
+from Assignment import column_letter
+
+
+# Records the ranges of every values.batchGet
+def batch_gets(monkeypatch) -> list[list[str]]:
+    real = Fakes._Values.batchGet
+    calls = []
+
+    def recording(self, spreadsheetId, ranges, **kwargs):
+        calls.append(list(ranges))
+        return real(self, spreadsheetId, ranges, **kwargs)
+
+    monkeypatch.setattr(Fakes._Values, "batchGet", recording)
+    return calls
+
+
+def test_pages_give_the_same_rows(tenant, monkeypatch):
+    tenant.sync()
+    whole = tenant.rows()
+    ranges = batch_gets(monkeypatch)
+
+    paged = Sheets.read_sheet(tenant.sheets, tenant.spreadsheet_id, page_rows=7)
+
+    assert paged == whole
+    assert [row["row"] for row in paged] == list(range(2, 32))
+    # Rows 2-31 fill five pages; the sixth comes back empty and ends the read
+    last_col = column_letter(len(Sheets.COLUMNS) - 1)
+    assert [page[0].split("!")[1] for page in ranges] == [f"A{first}:{last_col}{first + 6}" for first in range(2, 44, 7)]
+
+
+def test_fields_are_read_as_column_runs(tenant, monkeypatch):
+    tenant.sync()
+    ranges = batch_gets(monkeypatch)
+    fields = ["sync_id", "notes", "status"]
+
+    rows = Sheets.read_sheet(tenant.sheets, tenant.spreadsheet_id, fields=fields)
+
+    assert all(set(row) == {*fields, "row"} for row in rows)
+    assert len(ranges) == 1
+    assert len(ranges[0]) == len(Sheets._column_runs(sorted(Sheets.COLUMNS.index(field) for field in fields)))
+
+
+# The cached grid size says 40 rows; the sheet has grown since, and the open-ended last page still finds row 50
+def test_last_page_reads_past_a_stale_grid_size(make_tenant, monkeypatch):
+    tenant = make_tenant(rows=40)
+    tenant.sync()
+    sheet_id = Sheets.get_sheet_id(tenant.sheets, tenant.spreadsheet_id, "Assignments")
+    tenant.sheets._batch_update([{"appendDimension": {"sheetId": sheet_id, "dimension": "ROWS", "length": 20}}])
+    col = column_letter(Sheets.COLUMNS.index("sync_id"))
+    tenant.sheets._write(f"'Assignments'!{col}50", [["canvas:9:9"]])
+    ranges = batch_gets(monkeypatch)
+
+    rows = Sheets.read_sheet(tenant.sheets, tenant.spreadsheet_id, page_rows=30)
+
+    assert rows[-1]["row"] == 50 and rows[-1]["sync_id"] == "canvas:9:9"
+    assert ranges[-1][0].endswith("32:" + column_letter(len(Sheets.COLUMNS) - 1))
+
+
+def test_blank_sheet_costs_one_read(tenant, monkeypatch):
+    ranges = batch_gets(monkeypatch)
+    assert Sheets.read_sheet(tenant.sheets, tenant.spreadsheet_id, page_rows=10) == []
+    assert len(ranges) == 1
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import Counter
+import Scheduler
+import Store
+
+
+# Stands in for Workflow.sync: records start order and how many syncs run at once, overall and per host
+class Recorder:
+    def __init__(self, duration: float = 0.05, fail: set = ()):
+        self.duration = duration
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.started = []
+        self.running = Counter()
+        self.peak = Counter()
+        self.sessions = {}
+
+    def __call__(self, canvas_url, canvas_token, spreadsheet_id, session=None, max_workers=None, store=None):
+        with self.lock:
+            self.started.append(spreadsheet_id)
+            self.sessions.setdefault(canvas_url, set()).add(id(session))
+            self.running[canvas_url] += 1
+            self.running["all"] += 1
+            for key in (canvas_url, "all"):
+                self.peak[key] = max(self.peak[key], self.running[key])
+        time.sleep(self.duration)
+        with self.lock:
+            self.running[canvas_url] -= 1
+            self.running["all"] -= 1
+        if spreadsheet_id in self.fail:
+            raise RuntimeError(f"{spreadsheet_id} failed")
+        return {"logs": [spreadsheet_id], "workers": max_workers}
+
+
+def tenants(host: str, count: int) -> list[dict]:
+    return [{"name": f"{host}-{n}", "canvas_url": host, "canvas_token": "t", "spreadsheet_id": f"{host}-{n}"}
+            for n in range(count)]
+
+
+def scheduler(recorder, **kwargs) -> Scheduler.Scheduler:
+    return Scheduler.Scheduler(sync=recorder, store=Store.Store(":memory:"), **kwargs)
+
+
+# A host with a long roster listed first still takes turns with the others
+def test_hosts_are_served_round_robin():
+    recorder = Recorder()
+    roster = tenants("big.test", 6) + tenants("small.test", 2)
+
+    results = scheduler(recorder, max_tenants=2, per_host=2).run(roster)
+
+    assert len(results) == 8
+    hosts = [sync_id.split("-")[0] for sync_id in recorder.started]
+    assert set(hosts[:2]) == set(hosts[2:4]) == {"big.test", "small.test"}
+
+
+def test_limits_hold_overall_and_per_host():
+    recorder = Recorder()
+    roster = tenants("a.test", 6) + tenants("b.test", 6) + tenants("c.test", 1)
+
+    scheduler(recorder, max_tenants=5, per_host=2, per_tenant=3).run(roster)
+
+    assert recorder.peak["a.test"] == recorder.peak["b.test"] == 2
+    assert recorder.peak["all"] == 5
+    assert sorted(recorder.started) == sorted(tenant["name"] for tenant in roster)
+
+
+def test_tenants_on_a_host_share_a_session():
+    recorder = Recorder(duration=0)
+    scheduler(recorder, max_tenants=4).run(tenants("a.test", 3) + tenants("b.test", 2))
+
+    assert {host: len(ids) for host, ids in recorder.sessions.items()} == {"a.test": 1, "b.test": 1}
+    assert recorder.sessions["a.test"] != recorder.sessions["b.test"]
+
+
+def test_a_failed_tenant_does_not_stop_the_rest():
+    recorder = Recorder(duration=0, fail={"a.test-1"})
+
+    results = scheduler(recorder, max_tenants=2, per_tenant=3).run(tenants("a.test", 3))
+
+    assert isinstance(results["a.test-1"], RuntimeError)
+    assert results["a.test-0"] == {"logs": ["a.test-0"], "workers": 3}
+    assert results["a.test-2"]["logs"] == ["a.test-2"]
@@ -0,0 +1,24 @@
+import json
+import Sheets
+
+
+def test_discovery_document_is_the_bundled_copy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Sheets, "DISCOVERY_CACHE", None)
+    Sheets.discovery_document.cache_clear()
+
+    doc = json.loads(Sheets.discovery_document("sheets", "v4"))
+
+    assert (doc["name"], doc["version"]) == ("sheets", "v4")
+    assert list(tmp_path.iterdir()) == []
+
+
+# A document the operator placed in DISCOVERY_CACHE wins over the bundled one
+def test_discovery_document_from_the_operators_directory(tmp_path, monkeypatch):
+    (tmp_path / "sheets.v4.json").write_text('{"name": "sheets", "version": "v4", "revision": "pinned"}')
+    monkeypatch.setattr(Sheets, "DISCOVERY_CACHE", str(tmp_path))
+    Sheets.discovery_document.cache_clear()
+
+    assert json.loads(Sheets.discovery_document("sheets", "v4"))["revision"] == "pinned"
+    assert json.loads(Sheets.discovery_document("drive", "v3"))["name"] == "drive"
+    Sheets.discovery_document.cache_clear()
@@ -0,0 +1,28 @@
+import Sheets
+import Store
+
+
+# Rows an unsharded sync left in Assignments move to their term's tab, even with a store that never saw them
+def test_sharded_sync_moves_rows_out_of_assignments(tenant):
+    tenant.sync()
+    tenant.store = Store.Store(":memory:")
+
+    tenant.sync_sharded()
+
+    assert tenant.sheet_ids("Assignments") == []
+    tenant.assert_in_sync("Current Term")
+    states = tenant.sync_sharded()
+    assert all(not state["ops"] for state in states.values())
+
+
+# What the user typed on the sheet moves with the row, even though the store never saw it
+def test_moved_rows_keep_the_users_columns(tenant):
+    tenant.sync()
+    row = tenant.rows()[0]
+    Sheets.update_row({row["row"]: {"status": "Started", "notes": "my note"}}, tenant.sheets, tenant.spreadsheet_id)
+
+    tenant.sync_sharded()
+
+    moved = next(r for r in tenant.rows("Current Term") if r["sync_id"] == row["sync_id"])
+    assert (moved["status"], moved["notes"]) == ("Started", "my note")
+    assert moved["created_at"] == row["created_at"]
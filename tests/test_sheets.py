@@ -0,0 +1,26 @@
+import Sheets
+from Assignment import Assignment
+
+
+# Canvas text goes in RAW (a name starting with "=" stays text), due dates as serial numbers
+def test_value_batches_are_raw_with_serial_dates():
+    values = Assignment(course_name="Course", assignment_name="=HYPERLINK(\"x\")", due_date="2026-10-20 12:00:00",
+                        sync_id="canvas:1:1", source="canvas")
+    batches = Sheets.build_write_batches([{"op": "insert", "sync_id": "canvas:1:1", "values": values}],
+                                         0, "Assignments", next_row=2, row_count=100)
+
+    (batch,) = batches
+    assert batch["input"] == "RAW"
+    row = dict(zip(Sheets.COLUMNS, batch["data"][0]["values"][0]))
+    assert row["assignment_name"] == "=HYPERLINK(\"x\")"
+    assert row["due_date"] == 46315.5
+    assert Sheets._cell(row["due_date"], "due_date") == "2026-10-20 12:00:00"
+
+
+def test_formula_like_names_read_back_as_written(tenant):
+    tenant.sync()
+    tenant.canvas.touch(1000, 1, name="=1+1")
+    tenant.sync()
+
+    assert "=1+1" in {row["assignment_name"] for row in tenant.rows()}
+    assert "diff: 0 insert, 0 update, 0 delete" in tenant.sync()
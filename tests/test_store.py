@@ -0,0 +1,62 @@
+import random
+import Sheets
+import Store
+import Workflow
+from Assignment import Assignment
+
+
+def store_with(n: int) -> Store.Store:
+    store = Store.Store(":memory:")
+    store.replace("s", "Tab", [{"sync_id": f"canvas:1:{i}", "source": "canvas", "notes": str(i), "row": i + 2}
+                               for i in range(n)])
+    return store
+
+
+def test_deletes_shift_the_rows_below_up():
+    store = store_with(50)
+    deleted = sorted(random.Random(7).sample(range(2, 52), 20))
+
+    store.apply_ops("s", "Tab", [{"op": "delete", "sync_id": f"canvas:1:{row - 2}", "row": row} for row in deleted], 52)
+
+    # What deleteDimension does to the sheet: the survivors close up, in order, from row 2
+    survivors = [f"canvas:1:{row - 2}" for row in range(2, 52) if row not in deleted]
+    rows = store.rows("s", "Tab")
+    assert [row["sync_id"] for row in rows] == survivors
+    assert [row["row"] for row in rows] == list(range(2, 2 + len(survivors)))
+
+
+def test_updates_and_inserts_use_pre_delete_rows():
+    store = store_with(5)
+    ops = [
+        {"op": "update", "sync_id": "canvas:1:3", "row": 5, "values": {"notes": "edited"}},
+        {"op": "insert", "sync_id": "canvas:1:9", "values": Assignment(sync_id="canvas:1:9", source="canvas")},
+        {"op": "delete", "sync_id": "canvas:1:1", "row": 3},
+    ]
+
+    store.apply_ops("s", "Tab", ops, next_row=7)
+
+    rows = {row["sync_id"]: row for row in store.rows("s", "Tab")}
+    assert {sync_id: row["row"] for sync_id, row in rows.items()} == {
+        "canvas:1:0": 2, "canvas:1:2": 3, "canvas:1:3": 4, "canvas:1:4": 5, "canvas:1:9": 6}
+    assert rows["canvas:1:3"]["notes"] == "edited"
+
+
+def test_drifted_compares_the_sync_id_column():
+    store = store_with(3)
+    assert not store.drifted("s", "Tab", ["canvas:1:0", "canvas:1:1", "canvas:1:2"])
+    assert store.drifted("s", "Tab", ["canvas:1:0", "canvas:1:2"])
+    assert store.drifted("s", "Other", ["canvas:1:0"])
+
+
+# The mirror never sees edits made on the sheet; read_sheet_state takes the user's columns from the sheet
+def test_sheet_state_has_the_users_edits(tenant):
+    tenant.sync()
+    row = tenant.rows()[4]
+    Sheets.update_row({row["row"]: {"priority": "Optional", "status": "Started", "notes": "my note"}},
+                      tenant.sheets, tenant.spreadsheet_id)
+
+    rows, _ = Workflow.read_sheet_state(tenant.store, tenant.spreadsheet_id, "Assignments", tenant.sheets)
+
+    edited = next(r for r in rows if r["sync_id"] == row["sync_id"])
+    assert (edited["priority"], edited["status"], edited["notes"]) == ("Optional", "Started", "my note")
+    assert len(rows) == 30
@@ -0,0 +1,38 @@
+import pytest
+
+# Both fetch paths: the incremental one (ETags, watermarks) and a full fetch every run
+MODES = [True, False]
+
+
+@pytest.mark.parametrize("incremental", MODES)
+def test_sheet_matches_canvas_cold_warm_and_changed(tenant, incremental):
+    assert "diff: 30 insert, 0 update, 0 delete" in tenant.sync(incremental=incremental)
+    tenant.assert_in_sync()
+
+    assert "diff: 0 insert, 0 update, 0 delete" in tenant.sync(incremental=incremental)
+    tenant.assert_in_sync()
+
+    tenant.canvas.touch(1000, 1, name="Renamed")
+    tenant.canvas.touch(1001, 2, due_at="2027-01-01T12:00:00Z")
+    tenant.add(1002, 2)
+    tenant.canvas.assignments[1001].pop(0)
+    assert "diff: 2 insert, 2 update, 1 delete" in tenant.sync(incremental=incremental)
+    tenant.assert_in_sync()
+    names = {row["sync_id"]: row["assignment_name"] for row in tenant.rows()}
+    assert names[f"canvas:1000:{tenant.canvas.assignments[1000][1]['id']}"] == "Renamed"
+
+    assert "diff: 0 insert, 0 update, 0 delete" in tenant.sync(incremental=incremental)
+
+
+def test_dry_run_writes_nothing(tenant):
+    tenant.sync()
+    tenant.canvas.touch(1000, 1, name="Renamed")
+    tenant.add(1002)
+    before = dict(tenant.sheets.calls)
+
+    logs = tenant.sync(dry_run=True)
+
+    assert any(line.startswith("Assignments: update row") for line in logs)
+    writes = ("batchUpdate", "values.batchUpdate", "values.update")
+    assert {k: v for k, v in tenant.sheets.calls.items() if k in writes} == {k: v for k, v in before.items() if k in writes}
+    assert "diff: 1 insert, 1 update, 0 delete" in tenant.sync()